@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+#
+# MatGest
+
+"""
+Compares the JSON and the binary formats of the saves: encoding, decoding, size and full load
+
+Run it on a save written by generate_save.py:
+
+    python benchmarks/generate_save.py big_save.json
+    python benchmarks/binary_format.py big_save.json
+"""
+
+import os
+import json
+import gzip
+import time
+import tempfile
+
+from common import parse_args
+
+
+def _timed(function) -> tuple[float, object]:
+    start = time.perf_counter()
+    result = function()
+    return time.perf_counter() - start, result
+
+
+def _decode(data: bytes) -> None:
+    from gestmat.item import binary
+
+    for _, entries in binary.iter_sections(data):
+        for _ in entries:
+            pass
+
+
+def _build(sections) -> None:
+    from gestmat.item.loader import SnapshotBuilder
+
+    builder = SnapshotBuilder()
+    for section, entries in sections:
+        builder.feed(section, entries)
+    builder.finish()
+
+
+def main():
+    def configure(parser):
+        parser.add_argument("filename", help="save in the JSON format")
+
+    args = parse_args(__doc__, configure)
+    from gestmat.item import binary
+    from gestmat.item.stream import iter_sections
+
+    with gzip.open(args.filename, "rt", encoding="utf-8") as file:
+        mega_dict = json.load(file)
+
+    text = json.dumps(mega_dict).encode("utf-8")
+    for level in (9, 6):
+        duration, data = _timed(lambda: gzip.compress(text, compresslevel=level))
+        print(f"JSON + gzip {level}          encode {duration:5.1f}s  {len(data) >> 20:4d}MB")
+    duration, _ = _timed(lambda: json.loads(gzip.decompress(data)))
+    print(f"JSON + gzip 6          decode {duration:5.1f}s")
+
+    codecs = [("uncompressed", binary.CODEC_NONE), ("+ gzip 1", binary.CODEC_GZIP)]
+    if binary.default_codec() == binary.CODEC_ZSTD:
+        codecs.append(("+ zstd", binary.CODEC_ZSTD))
+    for label, codec in codecs:
+        encoding, data = _timed(lambda: binary.encode(mega_dict, codec))
+        decoding, _ = _timed(lambda: _decode(data))
+        print(
+            f"binary {label:15s} encode {encoding:5.1f}s  {len(data) >> 20:4d}MB  "
+            f"decode {decoding:5.1f}s"
+        )
+    del mega_dict, text
+
+    with tempfile.TemporaryDirectory() as directory:
+        binary_file = os.path.join(directory, "save.gms")
+        with open(binary_file, "wb") as file:
+            file.write(data)
+        with gzip.open(args.filename, "rt", encoding="utf-8") as file:
+            duration, _ = _timed(lambda: _build(iter_sections(file)))
+        print(f"full load, JSON        {duration:5.1f}s")
+        duration, _ = _timed(lambda: _build(binary.read_file(binary_file)))
+        print(f"full load, binary      {duration:5.1f}s")
+
+
+if __name__ == "__main__":
+    main()
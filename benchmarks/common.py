@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+#
+# MatGest
+
+"""Command line shared by the benchmarks"""
+
+import os
+import sys
+import argparse
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "src")
+
+
+def parse_args(description: str, configure=None) -> argparse.Namespace:
+    """
+    Parses the arguments of a benchmark and puts the sources to measure in sys.path
+
+    Arguments
+    ---------
+    description: description of the benchmark (its docstring)
+    configure: function adding the arguments of the benchmark to the parser
+    """
+    parser = argparse.ArgumentParser(
+        description=description, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--src",
+        default=SRC,
+        help="sources of gestmat to measure, e.g. those of an older checkout to compare with",
+    )
+    if configure is not None:
+        configure(parser)
+    args = parser.parse_args()
+    sys.path.insert(0, os.path.abspath(args.src))
+    return args
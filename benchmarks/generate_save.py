@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+#
+# MatGest
+
+"""
+Writes a synthetic save (gzip JSON) for the load benchmarks
+
+With the default sizes (100k items, 1M loans, 50k persons), the file is about 38MB (216MB of
+JSON). The first 10k loans are ongoing, the others are given back.
+"""
+
+import json
+import gzip
+import uuid
+import random
+
+from common import parse_args
+
+
+def _uuid(rng: random.Random) -> str:
+    return str(uuid.UUID(int=rng.getrandbits(128)))
+
+
+def generate(items: int, loans: int, persons: int, seed: int = 1) -> dict:
+    """Returns the content of the save (see Workspace._prepare)"""
+    rng = random.Random(seed)
+    names = ["ID", "largeur", "hauteur", "cote"]
+    properties = {
+        name: {
+            "name": name,
+            "unit": "",
+            "special_name": name,
+            "select": [],
+            "no_edit": False,
+            "mandatory": False,
+        }
+        for name in names
+    }
+    categories = {
+        f"C{i}": {
+            "registered_items": [],
+            "properties": names,
+            "properties_order": names,
+            "description": f"Cat {i}",
+        }
+        for i in range(5)
+    }
+    all_items = dict()
+    for i in range(items):
+        all_items[_uuid(rng)] = {
+            "properties": [
+                {"ID": f"X {i}"},
+                {"largeur": str(rng.randint(30, 60))},
+                {"hauteur": str(rng.randint(30, 60))},
+                {"cote": "gauche"},
+            ],
+            "notes": {},
+            "category": f"C{i % 5}",
+        }
+    item_uuids = list(all_items)
+
+    all_persons = dict()
+    for i in range(persons):
+        all_persons[_uuid(rng)] = {
+            "name": f"N{i}",
+            "surname": f"S{i}",
+            "birthday": "1970/01/02",
+            "place": "A1",
+            "note": "",
+            "loans": [],
+        }
+    person_uuids = list(all_persons)
+    active_count = min(5000, persons)
+
+    active_loans = dict()
+    retired_loans = dict()
+    for j in range(loans):
+        loan = {
+            "uuid": _uuid(rng),
+            "person": person_uuids[j % persons],
+            "date": "2020/01/01",
+            "loan_back": "2020/02/01",
+            "note": "",
+            "timestamp": 1600000000.0 + j,
+        }
+        item = item_uuids[j % items]
+        if j < 2 * active_count:
+            loan["person"] = person_uuids[j % active_count]
+            loan["loan_back"] = ""
+            active_loans.setdefault(item, []).append(loan)
+        else:
+            retired_loans.setdefault(item, []).append(loan)
+
+    return {
+        "properties": properties,
+        "categories": categories,
+        "items": all_items,
+        "retired_items": {},
+        "persons": dict(list(all_persons.items())[:active_count]),
+        "retired_persons": dict(list(all_persons.items())[active_count:]),
+        "loans": active_loans,
+        "retired_loans": retired_loans,
+    }
+
+
+def main():
+    def configure(parser):
+        parser.add_argument("filename", help="save to write, e.g. big_save.json")
+        parser.add_argument("--items", type=int, default=100_000)
+        parser.add_argument("--loans", type=int, default=1_000_000)
+        parser.add_argument("--persons", type=int, default=50_000)
+
+    args = parse_args(__doc__, configure)
+    mega_dict = generate(args.items, args.loans, args.persons)
+    with gzip.open(args.filename, "wt", encoding="utf-8", compresslevel=6) as file:
+        json.dump(mega_dict, file)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+#
+# MatGest
+
+"""
+Measures the full load of a save into an ItemManager: time and peak RSS
+
+Run it on a save written by generate_save.py. Run it once per process, the peak RSS being the
+one of the whole process, and with --src to compare with the sources of another checkout:
+
+    python benchmarks/generate_save.py big_save.json
+    python benchmarks/load_save.py big_save.json
+    python benchmarks/load_save.py big_save.json --src ../old/src
+"""
+
+import time
+import tempfile
+
+from common import parse_args
+
+
+def main():
+    def configure(parser):
+        parser.add_argument("filename", help="save to load (JSON or binary)")
+
+    args = parse_args(__doc__, configure)
+    import resource
+
+    from gestmat.item.manager import ItemManager
+    from gestmat.item.workspace import Workspace
+
+    workspace = Workspace()
+    with tempfile.TemporaryDirectory() as directory:
+        workspace.init(ItemManager(), directory)
+        start = time.perf_counter()
+        success, manager = workspace.load(args.filename)
+        duration = time.perf_counter() - start
+
+    loans = sum(len(loans) for loans in manager.loans.values())
+    loans += sum(len(loans) for loans in manager.retired_loans.values())
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(
+        f"loaded: {success}, items: {len(manager.items)}, loans: {loans}, "
+        f"time: {duration:.1f}s, peak RSS: {peak:.0f}MB"
+    )
+
+
+if __name__ == "__main__":
+    main()
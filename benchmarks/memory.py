@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+#
+# MatGest
+
+"""
+Measures the memory of the items, persons and loans (tracemalloc) and the cost of item._uuid
+
+    python benchmarks/memory.py
+    python benchmarks/memory.py --src ../old/src
+"""
+
+import gc
+import timeit
+import datetime
+import tracemalloc
+
+from common import parse_args
+
+
+def main():
+    def configure(parser):
+        parser.add_argument("--count", type=int, default=50_000, help="objects of each kind")
+
+    args = parse_args(__doc__, configure)
+    from gestmat.item.manager import ItemManager, ItemLoan, Person
+    from gestmat.item.representation import Item
+
+    count = args.count
+    manager = ItemManager()
+    manager.create_property("ID", mandatory=True, no_edit=True)
+    manager.create_property("largeur", unit="cm")
+    manager.create_property("hauteur", unit="cm")
+    manager.create_property("marque")
+    manager.create_property("modele")
+    manager.add_category("FR", "Fauteuil roulant", ["ID", "largeur", "hauteur", "marque", "modele"])
+    category = manager.categories["FR"]
+
+    gc.collect()
+    tracemalloc.start()
+    start = tracemalloc.get_traced_memory()[0]
+    items = [
+        Item(
+            category,
+            id=f"FR {i}",
+            largeur=str(40 + i % 10),
+            hauteur=str(50 + i % 7),
+            marque="Küschall",
+            modele="K-Series",
+        )
+        for i in range(count)
+    ]
+    after_items = tracemalloc.get_traced_memory()[0]
+    birthday = datetime.datetime(1970, 1, 1)
+    persons = [Person(f"N{i}", f"S{i}", birthday, "A1") for i in range(count)]
+    after_persons = tracemalloc.get_traced_memory()[0]
+    date = datetime.datetime(2024, 1, 1)
+    loans = [ItemLoan(items[i], date, persons[i], "") for i in range(count)]
+    after_loans = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del loans
+
+    item = items[0]
+    number = 200_000
+    uuid_cost = min(timeit.repeat(lambda: item._uuid, number=number, repeat=5)) / number
+    print(f"item   {(after_items - start) / count:5.0f} bytes")
+    print(f"person {(after_persons - after_items) / count:5.0f} bytes")
+    print(f"loan   {(after_loans - after_persons) / count:5.0f} bytes")
+    print(f"item._uuid {uuid_cost * 1e9:.0f} ns")
+
+
+if __name__ == "__main__":
+    main()
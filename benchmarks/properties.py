@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+#
+# MatGest
+
+"""
+Measures the definition of the property classes, and the load of the properties of a save
+
+    python benchmarks/properties.py
+    python benchmarks/properties.py --src ../old/src
+"""
+
+import time
+
+from common import parse_args
+
+
+def main():
+    def configure(parser):
+        parser.add_argument("--count", type=int, default=500, help="number of properties")
+
+    args = parse_args(__doc__, configure)
+    from gestmat.item.loader import SnapshotBuilder
+    from gestmat.item.representation import define_new_property
+
+    count = args.count
+    names = [f"Propriété n°{i} (côté)" for i in range(count)]
+    durations = []
+    # Defined a first time, then again with the same attributes (as by every load)
+    for _ in range(2):
+        start = time.perf_counter()
+        for name in names:
+            define_new_property(name, str, unit="cm", select=["a", "b"])
+        durations.append(time.perf_counter() - start)
+
+    section = [
+        (
+            f"P{i}",
+            dict(name=f"Propriété {i}", unit="", select=[], no_edit=False, mandatory=False),
+        )
+        for i in range(count)
+    ]
+    loads = 5
+    start = time.perf_counter()
+    for _ in range(loads):
+        builder = SnapshotBuilder()
+        builder.feed("properties", section)
+        builder.finish()
+    load = (time.perf_counter() - start) / loads
+
+    print(f"define {count} properties: {durations[0] / count * 1e6:.1f} us per property")
+    print(f"define them again:        {durations[1] / count * 1e6:.1f} us per property")
+    print(f"load the properties section of a save: {load * 1e3:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
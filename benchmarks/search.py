@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+#
+# MatGest
+
+"""
+Measures strip_accents, strip_special_chars and the search keys of the loans
+
+The previous versions of the functions and of the search text of a loan (built again by each
+build of the loan table) are copied below, to compare with.
+
+    python benchmarks/search.py
+"""
+
+import time
+import random
+import timeit
+import datetime
+import unicodedata
+
+from common import parse_args
+
+
+def old_strip_accents(text):
+    return unicodedata.normalize("NFD", text).encode("ascii", "ignore").decode("utf-8")
+
+
+def old_strip_special_chars(text):
+    return old_strip_accents("".join([char for char in text if char.isalnum() or char == "_"]))
+
+
+def old_search_text(loan):
+    item = loan.item
+    prop_values = "".join([item._properties[prop].value for prop in item._properties])
+    person = loan.person
+    strings = [
+        loan.date.strftime("%Y/%m/%d"),
+        item._category.description,
+        person.surname,
+        person.name,
+        person.birthday.strftime("%Y/%m/%d"),
+        person.place,
+        person.note,
+        prop_values,
+    ]
+    return " ".join(old_strip_accents(string) for string in strings)
+
+
+def _per_call(function, argument, number: int = 20_000) -> float:
+    return min(timeit.repeat(lambda: function(argument), number=number, repeat=5)) / number
+
+
+def main():
+    def configure(parser):
+        parser.add_argument("--loans", type=int, default=20_000, help="number of loans")
+
+    args = parse_args(__doc__, configure)
+    from gestmat.item.manager import ItemManager, Person
+    from gestmat.item.representation import Item, define_new_property
+    from gestmat.util import strip_accents, strip_special_chars
+
+    # Same results as the previous versions
+    rng = random.Random(25)
+    texts = ["Chaise roulante", "Côté gauche", "Hélène", "Œuvre ß Å ﬁ", "ﾊﾟﾝ", "x²"]
+    texts += ["".join(chr(rng.randint(32, 0x2FFF)) for _ in range(40)) for _ in range(300)]
+    for text in texts:
+        assert strip_accents(text) == old_strip_accents(text), text
+        assert strip_special_chars(text) == old_strip_special_chars(text), text
+
+    uncached = getattr(strip_special_chars, "__wrapped__", strip_special_chars)
+    for label, old, new, text in [
+        ("strip_accents, ASCII", old_strip_accents, strip_accents, "Chaise roulante 12"),
+        ("strip_accents, accents", old_strip_accents, strip_accents, "Hélène Müller, Unité 3"),
+        ("strip_special_chars", old_strip_special_chars, strip_special_chars, "Côté gauche"),
+        ("  not cached", old_strip_special_chars, uncached, "Côté gauche"),
+    ]:
+        print(
+            f"{label:24s} {_per_call(old, text) * 1e9:6.0f} ns -> "
+            f"{_per_call(new, text) * 1e9:6.0f} ns"
+        )
+
+    manager = ItemManager()
+    id_prop = define_new_property("ID", str, mandatory=True)
+    side = define_new_property("Côté", str)
+    manager.add_category("CR", "Chaise à roulettes", [id_prop, side])
+    category = manager.categories["CR"]
+    names = ["Hélène", "Müller", "Zoé", "Jean", "Béatrice", "Martin"]
+    birthday = datetime.datetime(1950, 1, 1)
+    for i in range(args.loans):
+        item = Item(category, id=str(i), cote=rng.choice(["gauche", "droite"]))
+        manager.add_item(item)
+        person = Person(rng.choice(names), rng.choice(names), birthday, f"Unité {i % 9}", "")
+        manager.create_loan(
+            item, datetime.datetime(2024, 1, 1 + i % 28), person, merge_person=False
+        )
+    loans = [loan for loans in manager.loans.values() for loan in loans]
+
+    for label, build in [
+        ("previous, each build", lambda: [old_search_text(loan) for loan in loans]),
+        ("cached, first build", lambda: [manager.loan_search_keys.get(loan) for loan in loans]),
+        ("cached, next builds", lambda: [manager.loan_search_keys.get(loan) for loan in loans]),
+    ]:
+        start = time.perf_counter()
+        build()
+        print(f"search text of {len(loans)} loans, {label:22s} {time.perf_counter() - start:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -79,10 +79,15 @@ def main():
     # manager = hello_world()
 
     wkspace = Workspace()
-    wkspace.init(ItemManager())
+    wkspace.init(ItemManager(), journal=True, background=True)
     # wkspace.save()
     success, manager = wkspace.loan_most_recent()
+    # The management panel reads and sorts the values of the items column by column
+    manager.enable_columns()
 
     ui = UIManager(manager)
 
     ui.init()
+
+    # Write the saves still pending before exiting
+    wkspace.close()
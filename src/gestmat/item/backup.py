@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+#
+# MatGest
+
+import os
+import gzip
+import json
+import zlib
+import hashlib
+import datetime
+from typing import Any, Callable, Iterator, Optional
+
+from .targets import SaveTarget, write_atomic
+
+MANIFEST_VERSION = 1
+
+
+def _canonical(section: str, value: Any) -> Any:
+    """
+    Puts the lists built from sets in a fixed order, so that an unchanged object gives the same
+    bytes from one save to the other
+    """
+    if section in ("items", "retired_items"):
+        return dict(value, properties=sorted(value["properties"], key=lambda p: next(iter(p))))
+    if section in ("persons", "retired_persons"):
+        return dict(value, loans=sorted(value.get("loans", [])))
+    if section in ("loans", "retired_loans"):
+        return sorted(value, key=lambda loan: loan["uuid"])
+    if section == "categories":
+        return dict(
+            value,
+            registered_items=sorted(value.get("registered_items", [])),
+            properties=sorted(value.get("properties", [])),
+        )
+    return value
+
+
+def is_manifest(file: str) -> bool:
+    """Returns True if file is a manifest of a BackupStore"""
+    with open(file, "rb") as fin:
+        return fin.read(1) == b"{"
+
+
+def read_manifest(file: str) -> Iterator[tuple[str, Iterator[tuple[str, Any]]]]:
+    """Yields (section, entries) for each section of a snapshot stored in a BackupStore"""
+    store = BackupStore(os.path.dirname(os.path.dirname(file)))
+    return store.iter_sections(os.path.basename(file))
+
+
+class BackupStore(SaveTarget):
+    path: str
+    chunk_entries: int
+    keep_daily: Optional[int]
+    keep_monthly: Optional[int]
+    keep_yearly: Optional[int]
+
+    def __init__(
+        self,
+        path: str,
+        chunk_entries: int = 256,
+        keep_daily: Optional[int] = None,
+        keep_monthly: Optional[int] = None,
+        keep_yearly: Optional[int] = None,
+    ) -> None:
+        """
+        Stores the snapshots as content-addressed chunks, so that the parts of the data which did
+        not change between two saves are stored only once.
+
+        path/chunks holds the chunks (gzip JSON, named after the sha256 of their content),
+        path/manifests holds one small manifest per snapshot listing its chunks and
+        path/LATEST holds the name of the most recent save.
+
+        Arguments
+        ---------
+        path : str
+            folder of the store, created if needed
+        chunk_entries : int
+            average number of entries per chunk. The chunk boundaries depend on the keys of the
+            entries, so that adding or removing an entry only changes one chunk.
+        keep_daily, keep_monthly, keep_yearly : int
+            retention policy applied by prune(), which is called at the first save of each day
+            when any of them is given: the saves of the last keep_daily days, the last save of
+            the last keep_monthly months and the last save of the last keep_yearly years are
+            kept. None means that this rule keeps nothing, the most recent save is always kept.
+        """
+        super().__init__(path)
+        self.path = path
+        self.chunk_entries = chunk_entries
+        self.keep_daily = keep_daily
+        self.keep_monthly = keep_monthly
+        self.keep_yearly = keep_yearly
+
+    def _chunk_path(self, digest: str) -> str:
+        return os.path.join(self.path, "chunks", digest[:2], digest)
+
+    def manifest_path(self, file_name: str) -> str:
+        return os.path.join(self.path, "manifests", file_name)
+
+    def _is_boundary(self, key: str) -> bool:
+        return zlib.crc32(key.encode("utf-8")) % self.chunk_entries == 0
+
+    def _write_chunk(self, chunk: dict) -> str:
+        content = json.dumps(chunk).encode("utf-8")
+        digest = hashlib.sha256(content).hexdigest()
+        file = self._chunk_path(digest)
+        # A chunk which already exists does not need to be written again
+        if not os.path.exists(file):
+            os.makedirs(os.path.dirname(file), exist_ok=True)
+            write_atomic(file, gzip.compress(content, compresslevel=6, mtime=0))
+        return digest
+
+    def write(self, file_name: str, data: bytes) -> None:
+        raise TypeError("A BackupStore stores snapshots, use write_snapshot()")
+
+    def write_snapshot(self, file_name: str, mega_dict: dict, encoded: Callable[[], bytes]) -> None:
+        sections = []
+        for section, content in mega_dict.items():
+            digests = []
+            chunk = dict()
+            for key in sorted(content):
+                chunk[key] = _canonical(section, content[key])
+                if self._is_boundary(key):
+                    digests.append(self._write_chunk(chunk))
+                    chunk = dict()
+            if chunk or not digests:
+                digests.append(self._write_chunk(chunk))
+            sections.append([section, digests])
+
+        manifest = {"version": MANIFEST_VERSION, "sections": sections, "refs": []}
+        archive = mega_dict.get("archive")
+        if isinstance(archive, dict) and archive.get("file"):
+            manifest["refs"].append(archive["file"])
+
+        os.makedirs(os.path.join(self.path, "manifests"), exist_ok=True)
+        new_day = not os.path.exists(self.manifest_path(file_name))
+        write_atomic(self.manifest_path(file_name), json.dumps(manifest).encode("utf-8"))
+
+        if os.path.splitext(file_name)[0].endswith("_save"):
+            latest = self.latest()
+            if latest is None or file_name >= os.path.basename(latest):
+                write_atomic(os.path.join(self.path, "LATEST"), file_name.encode("utf-8"))
+            if new_day and any(
+                keep is not None for keep in (self.keep_daily, self.keep_monthly, self.keep_yearly)
+            ):
+                self.prune()
+
+    def latest(self) -> Optional[str]:
+        """Returns the path of the manifest of the most recent save, None if the store is empty"""
+        try:
+            with open(os.path.join(self.path, "LATEST"), "r", encoding="utf-8") as fin:
+                file_name = fin.read().strip()
+        except FileNotFoundError:
+            return None
+        if not file_name or not os.path.exists(self.manifest_path(file_name)):
+            return None
+        return self.manifest_path(file_name)
+
+    def _read_manifest(self, file_name: str) -> dict:
+        with open(self.manifest_path(file_name), "r", encoding="utf-8") as fin:
+            manifest = json.load(fin)
+        if manifest.get("version", 0) > MANIFEST_VERSION:
+            raise ValueError(f"Manifest version {manifest['version']} is not supported")
+        return manifest
+
+    def _iter_chunks(self, digests: list[str]) -> Iterator[tuple[str, Any]]:
+        for digest in digests:
+            with gzip.open(self._chunk_path(digest), "rt", encoding="utf-8") as fin:
+                yield from json.load(fin).items()
+
+    def iter_sections(self, file_name: str) -> Iterator[tuple[str, Iterator[tuple[str, Any]]]]:
+        """Yields (section, entries) for each section of a snapshot, one chunk at a time"""
+        for section, digests in self._read_manifest(file_name)["sections"]:
+            yield section, self._iter_chunks(digests)
+
+    def snapshots(self) -> list[str]:
+        """Returns the names of the stored snapshots"""
+        try:
+            files = os.listdir(os.path.join(self.path, "manifests"))
+        except FileNotFoundError:
+            return []
+        return sorted(file for file in files if not file.endswith(".tmp"))
+
+    def prune(self) -> None:
+        """Removes the saves which are not kept by the retention policy, and the unused chunks"""
+        saves = [
+            name for name in self.snapshots() if os.path.splitext(name)[0].endswith("_save")
+        ]
+        dated = []
+        for name in saves:
+            try:
+                dated.append((datetime.datetime.strptime(name[:10], "%Y_%m_%d").date(), name))
+            except ValueError:
+                continue
+        dated.sort(reverse=True)
+
+        keep = set()
+        if dated:
+            keep.add(dated[0][1])
+        for rule, period in (
+            (self.keep_daily, lambda day: day),
+            (self.keep_monthly, lambda day: (day.year, day.month)),
+            (self.keep_yearly, lambda day: day.year),
+        ):
+            if not rule:
+                continue
+            periods = []
+            for day, name in dated:
+                # The saves are sorted from the most recent, the first one of a period is kept
+                if period(day) not in periods:
+                    if len(periods) == rule:
+                        break
+                    periods.append(period(day))
+                    keep.add(name)
+
+        kept_manifests = set()
+        used_chunks = set()
+        for name in keep:
+            manifest = self._read_manifest(name)
+            kept_manifests.add(name)
+            kept_manifests.update(manifest.get("refs", []))
+        for name in kept_manifests:
+            if os.path.exists(self.manifest_path(name)):
+                for _, digests in self._read_manifest(name)["sections"]:
+                    used_chunks.update(digests)
+
+        # The archives which are not referenced by a kept save are removed as well
+        for name in self.snapshots():
+            if name not in kept_manifests:
+                os.remove(self.manifest_path(name))
+
+        chunks_dir = os.path.join(self.path, "chunks")
+        for prefix in os.listdir(chunks_dir):
+            for digest in os.listdir(os.path.join(chunks_dir, prefix)):
+                if digest not in used_chunks:
+                    os.remove(os.path.join(chunks_dir, prefix, digest))
@@ -0,0 +1,345 @@
+# -*- coding: utf-8 -*-
+#
+# MatGest
+
+import gzip
+import json
+import struct
+import sys
+from array import array
+from typing import Any, Iterator, Optional
+
+from .targets import write_atomic
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Layout of a binary snapshot (all the integers are little-endian):
+#   header  : MAGIC, version (1 byte), codec (1 byte)
+#   payload : compressed with the codec, a sequence of sections, each one made of
+#             name length (2 bytes), name, kind (1 byte), body length (8 bytes), body
+# The body of a generic section is the section in UTF-8 JSON. Items, persons and loans are
+# stored column by column (columnar sections), their body being a sequence of fields made of
+# type (1 byte), length (8 bytes), data: either UTF-8 JSON, an array of unsigned 32 bits
+# integers or an array of 64 bits floats. The repeated strings (property names, categories,
+# persons, dates) are replaced by their index in a string table stored with the section.
+# Versions 1 and 2 (marshal bodies) are not supported anymore.
+MAGIC = b"GMSB"
+VERSION = 3
+
+CODEC_NONE = 0
+CODEC_GZIP = 1
+CODEC_ZSTD = 2
+
+_GENERIC = 0
+_COLUMNAR = 1
+
+_FIELD_JSON = 0
+_FIELD_UINT32 = 1
+_FIELD_FLOAT64 = 2
+
+_header = struct.Struct("<4sBB")
+_section_name = struct.Struct("<H")
+_section_body = struct.Struct("<BQ")
+_field = struct.Struct("<BQ")
+
+# Type codes of the arrays of the columns, "I" is 32 bits on all the usual platforms
+_uint32 = "I" if array("I").itemsize == 4 else "L"
+_array_fields = {_FIELD_UINT32: _uint32, _FIELD_FLOAT64: "d"}
+
+
+def default_codec() -> int:
+    return CODEC_ZSTD if zstandard is not None else CODEC_GZIP
+
+
+def is_binary(file: str) -> bool:
+    """Returns True if file is a binary snapshot"""
+    with open(file, "rb") as fin:
+        return fin.read(len(MAGIC)) == MAGIC
+
+
+class _StringTable:
+    def __init__(self) -> None:
+        self.strings = []
+        self._index = dict()
+
+    def index(self, string: str) -> int:
+        if string not in self._index:
+            self._index[string] = len(self.strings)
+            self.strings.append(string)
+        return self._index[string]
+
+
+def _ints(values: list[int]) -> array:
+    return array(_uint32, values)
+
+
+def _to_json(value: Any) -> bytes:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _pack_fields(fields: tuple) -> bytes:
+    """Encodes the fields of a columnar section, arrays as they are and the rest in JSON"""
+    chunks = []
+    for field in fields:
+        if isinstance(field, array):
+            kind = _FIELD_FLOAT64 if field.typecode == "d" else _FIELD_UINT32
+            if sys.byteorder == "big":
+                field = array(field.typecode, field)
+                field.byteswap()
+            data = field.tobytes()
+        else:
+            kind, data = _FIELD_JSON, _to_json(field)
+        chunks += [_field.pack(kind, len(data)), data]
+    return b"".join(chunks)
+
+
+def _unpack_fields(body: memoryview) -> list:
+    fields = []
+    pos = 0
+    while pos < len(body):
+        kind, length = _field.unpack_from(body, pos)
+        pos += _field.size
+        data = body[pos : pos + length]
+        pos += length
+        if kind == _FIELD_JSON:
+            fields.append(json.loads(bytes(data).decode("utf-8")))
+        elif kind in _array_fields:
+            column = array(_array_fields[kind])
+            column.frombytes(data)
+            if sys.byteorder == "big":
+                column.byteswap()
+            fields.append(column)
+        else:
+            raise ValueError(f"Unknown field type {kind} in a binary snapshot")
+    return fields
+
+
+def _encode_items(section: dict) -> tuple:
+    strings = _StringTable()
+    categories, counts, names, values = [], [], [], []
+    notes = []
+    for row, item in enumerate(section.values()):
+        categories.append(strings.index(item["category"]))
+        counts.append(len(item["properties"]))
+        for prop in item["properties"]:
+            for name, value in prop.items():
+                names.append(strings.index(name))
+                values.append(value)
+        if item["notes"]:
+            notes.append([row, item["notes"]])
+    return (
+        strings.strings,
+        list(section.keys()),
+        _ints(categories),
+        _ints(counts),
+        _ints(names),
+        values,
+        notes,
+    )
+
+
+def _decode_items(columns: list) -> Iterator[tuple[str, dict]]:
+    strings, ids, categories, counts, names, values, notes = columns
+    notes = dict(notes)
+    pos = 0
+    for row, ID in enumerate(ids):
+        end = pos + counts[row]
+        yield ID, {
+            "category": strings[categories[row]],
+            "properties": [{strings[names[i]]: values[i]} for i in range(pos, end)],
+            "notes": notes.get(row, {}),
+        }
+        pos = end
+
+
+_person_fields = ["name", "surname", "birthday", "place", "note"]
+
+
+def _encode_persons(section: dict) -> tuple:
+    strings = _StringTable()
+    columns = {field: [] for field in _person_fields}
+    loans = []
+    for person in section.values():
+        for field in _person_fields:
+            columns[field].append(person[field])
+        loans.append(person.get("loans", []))
+    # The birthdays are often shared, the other fields are kept as they are
+    columns["birthday"] = _ints([strings.index(day) for day in columns["birthday"]])
+    return (
+        strings.strings,
+        list(section.keys()),
+        *(columns[field] for field in _person_fields),
+        loans,
+    )
+
+
+def _decode_persons(columns: list) -> Iterator[tuple[str, dict]]:
+    strings, ids = columns[:2]
+    fields = columns[2 : 2 + len(_person_fields)]
+    loans = columns[2 + len(_person_fields)]
+    birthday = _person_fields.index("birthday")
+    fields[birthday] = [strings[i] for i in fields[birthday]]
+    for row, ID in enumerate(ids):
+        person = {field: fields[i][row] for i, field in enumerate(_person_fields)}
+        person["loans"] = loans[row]
+        yield ID, person
+
+
+def _encode_loans(section: dict) -> tuple:
+    strings = _StringTable()
+    counts, uuids, persons, dates, loan_backs, due_dates, notes = [], [], [], [], [], [], []
+    timestamps = array("d")
+    for loans in section.values():
+        counts.append(len(loans))
+        for loan in loans:
+            uuids.append(loan["uuid"])
+            persons.append(strings.index(loan["person"]))
+            dates.append(strings.index(loan["date"]))
+            loan_backs.append(strings.index(loan["loan_back"]))
+            due_dates.append(strings.index(loan.get("due_date", "")))
+            notes.append(loan["note"])
+            timestamps.append(loan["timestamp"] or 0)
+    return (
+        strings.strings,
+        list(section.keys()),
+        _ints(counts),
+        uuids,
+        _ints(persons),
+        _ints(dates),
+        _ints(loan_backs),
+        _ints(due_dates),
+        notes,
+        timestamps,
+    )
+
+
+def _decode_loans(columns: list) -> Iterator[tuple[str, list[dict]]]:
+    strings, ids, counts, uuids, persons, dates, loan_backs, due_dates, notes, timestamps = columns
+    pos = 0
+    for row, ID in enumerate(ids):
+        end = pos + counts[row]
+        yield ID, [
+            {
+                "uuid": uuids[i],
+                "person": strings[persons[i]],
+                "date": strings[dates[i]],
+                "loan_back": strings[loan_backs[i]],
+                "due_date": strings[due_dates[i]],
+                "note": notes[i],
+                "timestamp": timestamps[i],
+            }
+            for i in range(pos, end)
+        ]
+        pos = end
+
+
+_columnar = {
+    "items": (_encode_items, _decode_items),
+    "retired_items": (_encode_items, _decode_items),
+    "persons": (_encode_persons, _decode_persons),
+    "retired_persons": (_encode_persons, _decode_persons),
+    "loans": (_encode_loans, _decode_loans),
+    "retired_loans": (_encode_loans, _decode_loans),
+}
+
+
+def encode(mega_dict: dict, codec: Optional[int] = None) -> bytes:
+    """
+    Encodes a snapshot (see Workspace._snapshot) in the binary format
+
+    Arguments
+    ---------
+    mega_dict : dict
+        snapshot to encode, a dict of sections
+    codec : int
+        CODEC_NONE, CODEC_GZIP or CODEC_ZSTD, by default zstandard if it is installed,
+        otherwise gzip
+    """
+    if codec is None:
+        codec = default_codec()
+
+    chunks = []
+    for section, content in mega_dict.items():
+        name = section.encode("utf-8")
+        if section in _columnar:
+            kind, body = _COLUMNAR, _pack_fields(_columnar[section][0](content))
+        else:
+            kind, body = _GENERIC, _to_json(content)
+        chunks += [_section_name.pack(len(name)), name, _section_body.pack(kind, len(body)), body]
+    payload = b"".join(chunks)
+
+    if codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise ValueError("The zstandard module is not installed")
+        payload = zstandard.ZstdCompressor(level=3).compress(payload)
+    elif codec == CODEC_GZIP:
+        payload = gzip.compress(payload, compresslevel=1)
+    elif codec != CODEC_NONE:
+        raise ValueError(f"Unknown codec {codec}")
+    return _header.pack(MAGIC, VERSION, codec) + payload
+
+
+def iter_sections(data: bytes) -> Iterator[tuple[str, Iterator[tuple[str, Any]]]]:
+    """Yields (section, entries) for each section of a binary snapshot, like stream.iter_sections"""
+    magic, version, codec = _header.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("Not a binary snapshot")
+    if version != VERSION:
+        raise ValueError(f"Binary snapshot version {version} is not supported")
+
+    payload = memoryview(data)[_header.size :]
+    if codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise ValueError("The zstandard module is needed to read this snapshot")
+        payload = zstandard.ZstdDecompressor().decompressobj().decompress(payload)
+    elif codec == CODEC_GZIP:
+        payload = gzip.decompress(payload)
+    elif codec != CODEC_NONE:
+        raise ValueError(f"Unknown codec {codec}")
+
+    payload = memoryview(payload)
+    pos = 0
+    while pos < len(payload):
+        (length,) = _section_name.unpack_from(payload, pos)
+        pos += _section_name.size
+        section = bytes(payload[pos : pos + length]).decode("utf-8")
+        pos += length
+        kind, length = _section_body.unpack_from(payload, pos)
+        pos += _section_body.size
+        body = payload[pos : pos + length]
+        pos += length
+
+        if kind == _COLUMNAR and section in _columnar:
+            yield section, _columnar[section][1](_unpack_fields(body))
+            continue
+        content = json.loads(bytes(body).decode("utf-8")) if kind == _GENERIC else None
+        if isinstance(content, dict):
+            yield section, iter(content.items())
+        else:
+            yield section, iter(())
+
+
+def read_file(file: str) -> Iterator[tuple[str, Iterator[tuple[str, Any]]]]:
+    with open(file, "rb") as fin:
+        data = fin.read()
+    return iter_sections(data)
+
+
+def convert(json_file: str, binary_file: Optional[str] = None, codec: Optional[int] = None) -> str:
+    """
+    Converts a gzip JSON save file (*_save.json or *_archive.json) to the binary format
+
+    Returns the name of the written file, by default the name of the JSON file with the .gms
+    extension
+    """
+    if binary_file is None:
+        binary_file = json_file[: -len(".json")] + ".gms"
+    with gzip.open(json_file, "rt", encoding="utf-8") as fin:
+        mega_dict = json.load(fin)
+    if isinstance(mega_dict.get("archive"), dict) and mega_dict["archive"].get("file"):
+        mega_dict["archive"]["file"] = mega_dict["archive"]["file"].replace(".json", ".gms")
+    write_atomic(binary_file, encode(mega_dict, codec))
+    return binary_file
@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+#
+# MatGest
+
+import datetime
+from typing import Any, Callable, Iterable, Iterator, Optional
+
+from ..util import ProtectedDatetime
+from .index import to_number
+from .representation import Item, ItemCategory
+from .timeline import date_key
+
+
+def sort_key(value: Any) -> tuple:
+    """Key sorting the numbers (or strings representing numbers) before the other values"""
+    number = to_number(value)
+    if number is not None:
+        return (0, number, "")
+    return (1, 0, str(value).lower())
+
+
+def date_sort_key(value: Any) -> tuple:
+    """Key sorting the dates in chronological order before the other values"""
+    ordinal = date_key(value)
+    if ordinal is not None:
+        return (0, ordinal, "")
+    return (1, 0, str(value).lower())
+
+
+def typed_sort_key(value_type: Optional[type] = None) -> Callable[[Any], tuple]:
+    """
+    Returns the key function sorting the values of value_type
+
+    Dates are sorted in chronological order, everything else with sort_key: the values of int
+    and float properties are numbers (or strings representing numbers), and the numbers held by
+    str properties (e.g. an ID) are also compared as numbers.
+    """
+    if value_type in (datetime.date, datetime.datetime, ProtectedDatetime):
+        return date_sort_key
+    return sort_key
+
+
+def property_value(item: Item, prop: type) -> Any:
+    """Returns the value of prop of item, "" if the item does not have the property"""
+    value = item._properties.get(prop)
+    return value.value if value is not None else ""
+
+
+class CategoryColumns:
+    category: ItemCategory
+    rows: list[Item]
+    row_of: dict[Item, int]
+    columns: dict[type, list]
+
+    def __init__(self, category: ItemCategory) -> None:
+        """
+        Values of the properties of the active items of a category, stored column by column
+
+        Each item is a row index, and each property of the category a list of values indexed
+        by row. Removing an item moves the last row in its place, so the columns stay dense.
+        """
+        self.category = category
+        self.rows = []
+        self.row_of = dict()
+        self.columns = {prop: [] for prop in category.properties_order}
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __contains__(self, item: Item) -> bool:
+        return item in self.row_of
+
+    def add(self, item: Item) -> None:
+        if item in self.row_of:
+            return
+        self.row_of[item] = len(self.rows)
+        self.rows.append(item)
+        for prop, column in self.columns.items():
+            column.append(property_value(item, prop))
+
+    def remove(self, item: Item) -> None:
+        row = self.row_of.pop(item, None)
+        if row is None:
+            return
+        last = self.rows.pop()
+        if last is not item:
+            self.rows[row] = last
+            self.row_of[last] = row
+        for column in self.columns.values():
+            value = column.pop()
+            if last is not item:
+                column[row] = value
+
+    def set(self, item: Item, prop: type, value: Any) -> None:
+        row = self.row_of.get(item)
+        if row is not None and prop in self.columns:
+            self.columns[prop][row] = value
+
+    def sync_properties(self) -> None:
+        """Adds and removes columns after the properties of the category changed"""
+        columns = dict()
+        for prop in self.category.properties_order:
+            if prop in self.columns:
+                columns[prop] = self.columns[prop]
+            else:
+                columns[prop] = [property_value(item, prop) for item in self.rows]
+        self.columns = columns
+
+    def column(self, prop: type) -> list:
+        """Returns the values of prop, in the order of the rows (the list must not be modified)"""
+        return self.columns[prop]
+
+    def iter_rows(self, properties: Optional[list] = None) -> Iterator[tuple[Item, tuple]]:
+        """Yields each item with its values of properties (the properties of the category)"""
+        if properties is None:
+            properties = list(self.columns)
+        elif any(prop not in self.columns for prop in properties):
+            # The properties of the category were changed without the manager
+            self.sync_properties()
+        columns = [self.columns[prop] for prop in properties]
+        return zip(self.rows, zip(*columns) if columns else ((),) * len(self.rows))
+
+
+class TableModel:
+    rows: list
+    getters: list[Callable[[Any], Any]]
+    types: list[Optional[type]]
+
+    def __init__(
+        self,
+        rows: Iterable,
+        getters: list[Callable[[Any], Any]],
+        types: Optional[list[Optional[type]]] = None,
+    ) -> None:
+        """
+        Rows of a table, sorted by the values of their columns
+
+        The tables sort this model instead of reading the values back from their widgets. The
+        sort keys of a column are computed the first time the column is sorted, and the order of
+        the rows for each column and direction is kept, so sorting again by a column only copies
+        a list. A sort by several columns reuses the keys of each column.
+
+        Arguments
+        ---------
+        rows : list
+            objects shown on the rows (items, loans, ...)
+        getters : list[Callable]
+            for each column, function returning the value of a row in the column
+        types : list[type]
+            for each column, type of the values (see typed_sort_key), None for any type
+        """
+        self.getters = list(getters)
+        self.types = list(types) if types is not None else [None] * len(self.getters)
+        self.set_rows(rows)
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def set_rows(self, rows: Iterable) -> None:
+        self.rows = list(rows)
+        self.invalidate()
+
+    def invalidate(self) -> None:
+        """To call when values of the rows changed"""
+        self._keys = dict()
+        self._orders = dict()
+
+    def keys(self, column: int) -> list[tuple]:
+        """Returns the sort keys of the rows in column"""
+        keys = self._keys.get(column)
+        if keys is None:
+            key = typed_sort_key(self.types[column])
+            getter = self.getters[column]
+            # The values of a column repeat a lot, their keys are only computed once
+            cache = dict()
+            keys = []
+            for row in self.rows:
+                value = getter(row)
+                keys.append(cache[value] if value in cache else cache.setdefault(value, key(value)))
+            self._keys[column] = keys
+        return keys
+
+    def order(self, column: int, reverse: bool = False) -> list[int]:
+        """Returns the indices of the rows sorted by column (the list must not be modified)"""
+        order = self._orders.get((column, reverse))
+        if order is None:
+            keys = self.keys(column)
+            order = sorted(range(len(keys)), key=keys.__getitem__, reverse=reverse)
+            self._orders[column, reverse] = order
+        return order
+
+    def sorted_rows(self, specs: Iterable[tuple[int, bool]]) -> list:
+        """
+        Returns the rows sorted by specs, a list of (column, reverse) pairs, the first column
+        being the main one
+        """
+        specs = list(specs)
+        if not specs:
+            return list(self.rows)
+        order = self.order(*specs[-1])
+        if len(specs) > 1:
+            # The sort is stable, each sort keeps the order of the rows equal for its column
+            order = list(order)
+            for column, reverse in reversed(specs[:-1]):
+                order.sort(key=self.keys(column).__getitem__, reverse=reverse)
+        rows = self.rows
+        return [rows[index] for index in order]
@@ -0,0 +1,470 @@
+# -*- coding: utf-8 -*-
+#
+# MatGest
+
+import json
+import sqlite3
+import itertools
+from typing import Optional
+
+from ..util import to_date
+from .manager import ItemManager, Item, Person, ItemLoan, ItemCategory
+from .loader import SnapshotBuilder
+from .persons import person_key
+from .serialization import date_to_str
+
+_tables = ["properties", "categories", "items", "property_values", "persons", "loans"]
+
+_schema = """
+CREATE TABLE IF NOT EXISTS properties (
+    special_name TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    unit TEXT,
+    select_list TEXT NOT NULL,
+    no_edit INTEGER NOT NULL,
+    mandatory INTEGER NOT NULL,
+    active INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS categories (
+    name TEXT PRIMARY KEY,
+    description TEXT NOT NULL,
+    properties TEXT NOT NULL,
+    properties_order TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS items (
+    uuid TEXT PRIMARY KEY,
+    category TEXT NOT NULL,
+    retired INTEGER NOT NULL DEFAULT 0,
+    notes TEXT NOT NULL DEFAULT '{}'
+);
+CREATE TABLE IF NOT EXISTS property_values (
+    item_uuid TEXT NOT NULL,
+    property TEXT NOT NULL,
+    value,
+    PRIMARY KEY (item_uuid, property)
+);
+CREATE TABLE IF NOT EXISTS persons (
+    uuid TEXT PRIMARY KEY,
+    name TEXT,
+    surname TEXT,
+    birthday TEXT,
+    place TEXT,
+    note TEXT
+);
+CREATE TABLE IF NOT EXISTS loans (
+    uuid TEXT PRIMARY KEY,
+    item_uuid TEXT NOT NULL,
+    person_uuid TEXT NOT NULL,
+    date TEXT,
+    loan_back TEXT,
+    note TEXT,
+    timestamp REAL,
+    finished INTEGER NOT NULL DEFAULT 0,
+    due_date TEXT
+);
+CREATE INDEX IF NOT EXISTS items_category ON items (category, retired);
+CREATE INDEX IF NOT EXISTS property_values_value ON property_values (property, value);
+CREATE INDEX IF NOT EXISTS loans_item ON loans (item_uuid, finished);
+CREATE INDEX IF NOT EXISTS loans_person ON loans (person_uuid, finished);
+CREATE INDEX IF NOT EXISTS loans_date ON loans (date);
+"""
+
+# Columns added after the first version of the schema, with their definition
+_added_columns = {"loans": [("due_date", "TEXT")]}
+
+
+class SQLiteStore:
+    path: str
+    manager: Optional[ItemManager]
+    items: dict[str, Item]
+
+    def __init__(self, path: str) -> None:
+        """
+        Stores the data of an ItemManager in a SQLite database.
+
+        Once attached to a manager, every mutation of the manager is written immediately, as one
+        small transaction. The database can also answer queries on the data with indexed SQL.
+        """
+        self.path = path
+        self.manager = None
+        self.items = dict()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(_schema)
+        self._migrate()
+
+    def _migrate(self) -> None:
+        """Adds the columns missing in a database created by an older version"""
+        with self.connection:
+            for table, columns in _added_columns.items():
+                rows = self.connection.execute(f"PRAGMA table_info({table})")
+                existing = {row[1] for row in rows}
+                for name, definition in columns:
+                    if name not in existing:
+                        self.connection.execute(
+                            f"ALTER TABLE {table} ADD COLUMN {name} {definition}"
+                        )
+
+    def close(self) -> None:
+        if self.manager is not None:
+            self.manager.unsubscribe(self.record)
+            self.manager = None
+        self.connection.close()
+
+    def is_empty(self) -> bool:
+        return self.connection.execute("SELECT 1 FROM properties LIMIT 1").fetchone() is None
+
+    def attach(self, manager: ItemManager) -> None:
+        """Starts writing the mutations of manager to the database"""
+        if self.manager is not None:
+            self.manager.unsubscribe(self.record)
+        self.manager = manager
+        self.items = {item._uuid: item for item in manager.items}
+        self.items.update({item._uuid: item for item in manager._retired_items})
+        manager.subscribe(self.record)
+
+    def import_manager(self, manager: ItemManager) -> None:
+        """Replaces the content of the database with the content of manager"""
+        with self.connection:
+            for table in _tables:
+                self.connection.execute(f"DELETE FROM {table}")
+            self._write_structure(manager)
+            for retired, items in ((False, manager.items), (True, manager.retired_items)):
+                self.connection.executemany(
+                    "INSERT INTO items VALUES (?, ?, ?, ?)",
+                    [
+                        (item._uuid, item._category.name, retired, json.dumps(item._notes))
+                        for item in items
+                    ],
+                )
+                self.connection.executemany(
+                    "INSERT INTO property_values VALUES (?, ?, ?)",
+                    [
+                        (item._uuid, prop.special_name, prop.value)
+                        for item in items
+                        for prop in item._properties.values()
+                    ],
+                )
+            loans = list(
+                itertools.chain.from_iterable(
+                    itertools.chain(manager.loans.values(), manager.retired_loans.values())
+                )
+            )
+            persons = {loan.person for loan in loans}
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO persons VALUES (?, ?, ?, ?, ?, ?)",
+                [self._person_row(person) for person in persons],
+            )
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO loans VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [self._loan_row(loan) for loan in loans],
+            )
+
+    # Writing of the mutations
+
+    def record(self, op: str, **payload) -> None:
+        """Listener of ItemManager, writes a mutation in one transaction"""
+        with self.connection:
+            if op in ("add_item", "delete_item", "retire_item", "unretire_item", "set_property"):
+                item = payload["item"]
+                if op == "add_item":
+                    self._insert_item(item, False)
+                    self.items[item._uuid] = item
+                elif op == "delete_item":
+                    self.connection.execute("DELETE FROM items WHERE uuid = ?", (item._uuid,))
+                    self.connection.execute(
+                        "DELETE FROM property_values WHERE item_uuid = ?", (item._uuid,)
+                    )
+                    self.items.pop(item._uuid, None)
+                elif op == "retire_item":
+                    self.connection.execute(
+                        "UPDATE items SET retired = 1 WHERE uuid = ?", (item._uuid,)
+                    )
+                    if payload["retire_loans"]:
+                        self.connection.execute(
+                            "UPDATE loans SET finished = 1, loan_back = ? "
+                            "WHERE item_uuid = ? AND finished = 0",
+                            (date_to_str(payload["date"]), item._uuid),
+                        )
+                elif op == "unretire_item":
+                    self.connection.execute(
+                        "UPDATE items SET retired = 0 WHERE uuid = ?", (item._uuid,)
+                    )
+                else:
+                    self.connection.execute(
+                        "INSERT OR REPLACE INTO property_values VALUES (?, ?, ?)",
+                        (item._uuid, payload["prop"].special_name, payload["value"]),
+                    )
+            elif op == "create_loan":
+                self._insert_loan(payload["loan"])
+            elif op == "give_back":
+                self.connection.execute(
+                    "UPDATE loans SET finished = 1, loan_back = ? WHERE uuid = ?",
+                    (date_to_str(payload["date"]), payload["loan"].uuid),
+                )
+            elif op == "set_due_date":
+                self.connection.execute(
+                    "UPDATE loans SET due_date = ? WHERE uuid = ?",
+                    (date_to_str(payload["due_date"]), payload["loan"].uuid),
+                )
+            elif op == "edit_person":
+                self._insert_person(payload["person"])
+            else:
+                old_special_name = payload.get("old_special_name")
+                if op == "edit_property" and old_special_name != payload["prop"].special_name:
+                    # The values are stored under the special name of their property
+                    self.connection.execute(
+                        "UPDATE OR REPLACE property_values SET property = ? WHERE property = ?",
+                        (payload["prop"].special_name, old_special_name),
+                    )
+                elif op == "update_category" and payload.get("old_name"):
+                    # The items refer to their category by its name
+                    self.connection.execute(
+                        "UPDATE items SET category = ? WHERE category = ?",
+                        (payload["category"].name, payload["old_name"]),
+                    )
+                # Properties and categories are small, they are rewritten as a whole
+                self.connection.execute("DELETE FROM properties")
+                self.connection.execute("DELETE FROM categories")
+                self._write_structure(self.manager)
+
+    def _write_structure(self, manager: ItemManager) -> None:
+        self.connection.executemany(
+            "INSERT INTO properties VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [
+                (
+                    prop.special_name,
+                    prop.name,
+                    prop.unit,
+                    json.dumps(list(prop.select)),
+                    prop.no_edit,
+                    prop.mandatory,
+                    active,
+                )
+                for prop, active in manager.properties.items()
+            ],
+        )
+        self.connection.executemany(
+            "INSERT INTO categories VALUES (?, ?, ?, ?)",
+            [
+                (
+                    name,
+                    category.description,
+                    json.dumps([prop.special_name for prop in category.properties]),
+                    json.dumps([prop.special_name for prop in category.properties_order]),
+                )
+                for name, category in manager.categories.items()
+            ],
+        )
+
+    def _insert_item(self, item: Item, retired: bool) -> None:
+        self.connection.execute(
+            "INSERT OR REPLACE INTO items VALUES (?, ?, ?, ?)",
+            (item._uuid, item._category.name, retired, json.dumps(item._notes)),
+        )
+        self.connection.executemany(
+            "INSERT OR REPLACE INTO property_values VALUES (?, ?, ?)",
+            [(item._uuid, prop.special_name, prop.value) for prop in item._properties.values()],
+        )
+
+    @staticmethod
+    def _person_row(person: Person) -> tuple:
+        return (
+            person.uuid,
+            person.name,
+            person.surname,
+            date_to_str(person.birthday),
+            person.place,
+            person.note,
+        )
+
+    @staticmethod
+    def _loan_row(loan: ItemLoan) -> tuple:
+        return (
+            loan.uuid,
+            loan.item._uuid,
+            loan.person.uuid,
+            date_to_str(loan.date),
+            date_to_str(loan.loan_back),
+            loan.note,
+            loan.timestamp,
+            loan.finished,
+            date_to_str(loan.due_date),
+        )
+
+    def _insert_person(self, person: Person) -> None:
+        self.connection.execute(
+            "INSERT OR REPLACE INTO persons VALUES (?, ?, ?, ?, ?, ?)", self._person_row(person)
+        )
+
+    def _insert_loan(self, loan: ItemLoan) -> None:
+        self._insert_person(loan.person)
+        self.connection.execute(
+            "INSERT OR REPLACE INTO loans VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            self._loan_row(loan),
+        )
+
+    # Loading
+
+    def load(self) -> ItemManager:
+        """
+        Builds an ItemManager from the database. The retired items, persons and loans are only
+        read when they are accessed (see ItemManager.set_archive_loader).
+        """
+        builder = SnapshotBuilder()
+        builder.feed("properties", self._iter_properties())
+        builder.feed("categories", self._iter_categories())
+        builder.feed("items", self._iter_items(False))
+        builder.feed("retired_items", ())
+        builder.feed("persons", self._iter_persons(False))
+        builder.feed("retired_persons", ())
+        builder.feed("loans", self._iter_loans(False))
+        builder.feed("retired_loans", ())
+        builder.feed("archived_persons", self._iter_archived_persons())
+        manager = builder.finish()
+
+        retired = {
+            special_name
+            for special_name, active in self.connection.execute(
+                "SELECT special_name, active FROM properties"
+            )
+            if not active
+        }
+        for prop in list(manager.properties):
+            if prop.special_name in retired:
+                manager.retire_property(prop)
+
+        manager.set_archive_loader(self._load_archive)
+        manager.archive_dirty = False
+        return manager
+
+    def _load_archive(self, manager: ItemManager) -> None:
+        builder = SnapshotBuilder(
+            manager, built=("properties", "categories", "items", "persons", "loans")
+        )
+        builder.feed("retired_items", self._iter_items(True))
+        builder.feed("retired_persons", self._iter_persons(True))
+        builder.feed("retired_loans", self._iter_loans(True))
+        builder.finish()
+        self.items.update({item._uuid: item for item in manager._retired_items})
+
+    def _iter_properties(self):
+        for row in self.connection.execute(
+            "SELECT special_name, name, unit, select_list, no_edit, mandatory FROM properties"
+        ):
+            yield row[0], dict(
+                name=row[1],
+                unit=row[2],
+                select=json.loads(row[3]),
+                no_edit=bool(row[4]),
+                mandatory=bool(row[5]),
+            )
+
+    def _iter_categories(self):
+        for name, description, properties, properties_order in self.connection.execute(
+            "SELECT name, description, properties, properties_order FROM categories"
+        ):
+            yield name, dict(
+                description=description,
+                properties=json.loads(properties),
+                properties_order=json.loads(properties_order),
+            )
+
+    def _iter_items(self, retired: bool):
+        rows = self.connection.execute(
+            "SELECT items.uuid, items.category, items.notes, property_values.property, "
+            "property_values.value FROM items LEFT JOIN property_values "
+            "ON property_values.item_uuid = items.uuid WHERE items.retired = ? "
+            "ORDER BY items.uuid",
+            (retired,),
+        )
+        for ID, item_rows in itertools.groupby(rows, key=lambda row: row[0]):
+            item_rows = list(item_rows)
+            yield ID, dict(
+                category=item_rows[0][1],
+                notes=json.loads(item_rows[0][2]),
+                properties=[{row[3]: row[4]} for row in item_rows if row[3] is not None],
+            )
+
+    def _iter_persons(self, retired: bool):
+        # A person is active as long as one of its loans is not finished
+        active = "EXISTS (SELECT 1 FROM loans WHERE person_uuid = persons.uuid AND finished = 0)"
+        rows = self.connection.execute(
+            "SELECT uuid, name, surname, birthday, place, note FROM persons "
+            f"WHERE {'NOT ' if retired else ''}{active}"
+        )
+        for row in rows:
+            yield row[0], dict(
+                name=row[1], surname=row[2], birthday=row[3], place=row[4], note=row[5]
+            )
+
+    def _iter_archived_persons(self):
+        # Only the keys of the retired persons are needed until the archive is loaded
+        for ID, person in self._iter_persons(True):
+            key = person_key(person["surname"], person["name"], to_date(person["birthday"]))
+            if key is not None:
+                yield ID, key
+
+    def _iter_loans(self, finished: bool):
+        rows = self.connection.execute(
+            "SELECT item_uuid, uuid, person_uuid, date, loan_back, note, timestamp, due_date "
+            "FROM loans WHERE finished = ? ORDER BY item_uuid",
+            (finished,),
+        )
+        for item_uuid, loan_rows in itertools.groupby(rows, key=lambda row: row[0]):
+            yield item_uuid, [
+                dict(
+                    uuid=row[1],
+                    person=row[2],
+                    date=row[3],
+                    loan_back=row[4],
+                    note=row[5],
+                    timestamp=row[6],
+                    due_date=row[7] or "",
+                )
+                for row in loan_rows
+            ]
+
+    # Queries
+
+    def _to_items(self, rows) -> list[Item]:
+        return [self.items[row[0]] for row in rows if row[0] in self.items]
+
+    def available_items(self, category: ItemCategory) -> list[Item]:
+        """Returns the active items of category which are not loaned"""
+        return self._to_items(
+            self.connection.execute(
+                "SELECT uuid FROM items WHERE category = ? AND retired = 0 AND NOT EXISTS "
+                "(SELECT 1 FROM loans WHERE item_uuid = items.uuid AND finished = 0)",
+                (category.name,),
+            )
+        )
+
+    def loaned_items(self, category: ItemCategory) -> list[Item]:
+        """Returns the active items of category which are loaned"""
+        return self._to_items(
+            self.connection.execute(
+                "SELECT uuid FROM items WHERE category = ? AND retired = 0 AND EXISTS "
+                "(SELECT 1 FROM loans WHERE item_uuid = items.uuid AND finished = 0)",
+                (category.name,),
+            )
+        )
+
+    def find_items(self, prop: type, value) -> list[Item]:
+        """Returns the items whose property prop equals value"""
+        return self._to_items(
+            self.connection.execute(
+                "SELECT item_uuid FROM property_values WHERE property = ? AND value = ?",
+                (prop.special_name, value),
+            )
+        )
+
+    def person_loans(self, person: Person, finished: Optional[bool] = None) -> list[str]:
+        """Returns the uuids of the loans of person, optionally filtered on their state"""
+        query = "SELECT uuid FROM loans WHERE person_uuid = ?"
+        args = [person.uuid]
+        if finished is not None:
+            query += " AND finished = ?"
+            args.append(finished)
+        return [row[0] for row in self.connection.execute(query + " ORDER BY date", args)]
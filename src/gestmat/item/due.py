@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+#
+# MatGest
+
+import heapq
+import itertools
+from typing import Any, Optional
+
+from .timeline import date_key
+
+
+class DueTracker:
+    def __init__(self) -> None:
+        """
+        Priority queue of the due dates of the active loans
+
+        The loans are kept in a binary heap ordered by due date. Removing a loan (given back, or
+        whose due date changed) only forgets its entry, which is skipped by the queries and
+        dropped once it reaches the top of the heap, or when the heap is rebuilt because it holds
+        more stale entries than live ones.
+        """
+        self.heap = []
+        self._entries = dict()
+        self._counter = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def clear(self) -> None:
+        self.heap.clear()
+        self._entries.clear()
+
+    def _is_live(self, entry: tuple) -> bool:
+        return self._entries.get(entry[2]) is entry
+
+    def push(self, loan, due_date: Any) -> None:
+        """Tracks loan, due on due_date (a loan without due date is not tracked)"""
+        self.discard(loan)
+        key = date_key(due_date)
+        if key is None:
+            return
+        # The counter keeps the loans due on a same day in their order of arrival
+        entry = (key, next(self._counter), loan)
+        self._entries[loan] = entry
+        heapq.heappush(self.heap, entry)
+
+    def discard(self, loan) -> None:
+        if self._entries.pop(loan, None) is None:
+            return
+        while self.heap and not self._is_live(self.heap[0]):
+            heapq.heappop(self.heap)
+        if len(self.heap) > 2 * len(self._entries) + 16:
+            self.heap = list(self._entries.values())
+            heapq.heapify(self.heap)
+
+    def _iter_sorted(self, before: Optional[int] = None):
+        """
+        Yields the live entries by due date, stopping at the first one due on before or later
+
+        The heap is walked without being modified: a second heap holds the frontier of the walk,
+        so that the k first entries cost O(k log k).
+        """
+        heap = self.heap
+        if not heap:
+            return
+        frontier = [(heap[0], 0)]
+        while frontier:
+            entry, index = heapq.heappop(frontier)
+            if before is not None and entry[0] >= before:
+                return
+            if self._is_live(entry):
+                yield entry
+            for child in (2 * index + 1, 2 * index + 2):
+                if child < len(heap):
+                    heapq.heappush(frontier, (heap[child], child))
+
+    def overdue(self, date: Any) -> list:
+        """Returns the loans due before date, the most overdue first"""
+        return [entry[2] for entry in self._iter_sorted(date_key(date))]
+
+    def next_due(self, count: int, date: Any = None) -> list:
+        """
+        Returns the count loans due first, only the ones due on date or later if date is given
+        (the overdue loans are then walked through, but not returned)
+        """
+        entries = self._iter_sorted()
+        key = date_key(date)
+        if key is not None:
+            entries = (entry for entry in entries if entry[0] >= key)
+        return [entry[2] for entry in itertools.islice(entries, count)]
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+#
+# MatGest
+
+import contextlib
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterator
+
+
+@dataclass(frozen=True)
+class ManagerEvent:
+    """Base of the events emitted by ItemManager after a mutation"""
+
+
+@dataclass(frozen=True)
+class ItemAdded(ManagerEvent):
+    item: Any
+
+
+@dataclass(frozen=True)
+class ItemRetired(ManagerEvent):
+    item: Any
+    date: Any = None
+
+
+@dataclass(frozen=True)
+class LoanCreated(ManagerEvent):
+    loan: Any
+
+
+@dataclass(frozen=True)
+class LoanReturned(ManagerEvent):
+    loan: Any
+    date: Any = None
+
+
+@dataclass(frozen=True)
+class PersonEdited(ManagerEvent):
+    person: Any
+
+
+@dataclass(frozen=True)
+class CategoryChanged(ManagerEvent):
+    category: Any
+
+
+@dataclass(frozen=True)
+class ManagerChanged(ManagerEvent):
+    """Any other mutation, op being its name (e.g. "set_property") as in ItemManager.subscribe"""
+
+    op: str
+    payload: dict = field(default_factory=dict, compare=False)
+
+
+def event_from_op(op: str, payload: dict) -> ManagerEvent:
+    """Returns the event of the mutation op of ItemManager (see ItemManager._notify)"""
+    if op == "add_item":
+        return ItemAdded(payload["item"])
+    if op == "retire_item":
+        return ItemRetired(payload["item"], payload.get("date"))
+    if op == "create_loan":
+        return LoanCreated(payload["loan"])
+    if op == "give_back":
+        return LoanReturned(payload["loan"], payload.get("date"))
+    if op == "edit_person":
+        return PersonEdited(payload["person"])
+    if op in ("add_category", "update_category"):
+        return CategoryChanged(payload["category"])
+    return ManagerChanged(op, dict(payload))
+
+
+class EventBus:
+    def __init__(self) -> None:
+        """
+        Delivers the events of ItemManager to the handlers subscribed to their type
+
+        The events emitted inside batch() are held back and delivered when the outermost batch
+        ends, so that a bulk operation (e.g. ItemManager.add_items) reaches the handlers as a
+        whole: the handlers of subscribe_batch receive the list of events at once, the ones of
+        subscribe each event in turn.
+        """
+        self._handlers = []
+        self._batch_handlers = []
+        self._depth = 0
+        self._pending = []
+
+    def subscribe(self, handler: Callable[[ManagerEvent], None], *event_types: type) -> None:
+        """Calls handler(event) for each event of event_types (of any type if none is given)"""
+        self._handlers.append((handler, event_types or (ManagerEvent,)))
+
+    def subscribe_batch(
+        self, handler: Callable[[list[ManagerEvent]], None], *event_types: type
+    ) -> None:
+        """
+        Calls handler(events) with the events of event_types (of any type if none is given) of
+        each batch, an event emitted outside of a batch being a batch of its own
+        """
+        self._batch_handlers.append((handler, event_types or (ManagerEvent,)))
+
+    @property
+    def active(self) -> bool:
+        """Whether handlers are subscribed (the events are only created if they are)"""
+        return bool(self._handlers or self._batch_handlers)
+
+    def unsubscribe(self, handler: Callable) -> None:
+        self._handlers = [entry for entry in self._handlers if entry[0] != handler]
+        self._batch_handlers = [entry for entry in self._batch_handlers if entry[0] != handler]
+
+    @contextlib.contextmanager
+    def batch(self) -> Iterator[None]:
+        """Holds back the events emitted in the with block, batches can be nested"""
+        self._depth += 1
+        try:
+            yield
+        finally:
+            self._depth -= 1
+            if not self._depth:
+                events, self._pending = self._pending, []
+                self._deliver(events)
+
+    def emit(self, event: ManagerEvent) -> None:
+        if self._depth:
+            self._pending.append(event)
+        else:
+            self._deliver([event])
+
+    def _deliver(self, events: list[ManagerEvent]) -> None:
+        if not events:
+            return
+        for handler, event_types in list(self._handlers):
+            for event in events:
+                if isinstance(event, event_types):
+                    handler(event)
+        for handler, event_types in list(self._batch_handlers):
+            selected = [event for event in events if isinstance(event, event_types)]
+            if selected:
+                handler(selected)
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+#
+# MatGest
+
+import json
+from typing import Any, Callable, Hashable, Iterable
+
+
+class _Section:
+    def __init__(self, version: Hashable, content: dict, fragments: dict) -> None:
+        self.version = version
+        self.content = content
+        self.fragments = fragments
+        self.text = None
+
+
+class FragmentCache:
+    def __init__(self) -> None:
+        """
+        Keeps the serialized sections of the last snapshot, and the serialized objects they are
+        made of, so that a save only serializes (and encodes to JSON) what changed since the
+        previous one.
+
+        The cached dicts are shared between the snapshots and must not be modified.
+        """
+        self.sections = dict()
+
+    def clear(self) -> None:
+        self.sections.clear()
+
+    def section(
+        self,
+        name: str,
+        version: Hashable,
+        entries: Callable[[], Iterable[tuple[str, Hashable, Any]]],
+        to_dict: Callable[[Any], Any],
+    ) -> dict:
+        """
+        Returns the content of a section of the snapshot
+
+        Arguments
+        ---------
+        name : str
+            name of the section
+        version : Hashable
+            version of the section, the cached section is returned as long as it is unchanged
+        entries : Callable
+            returns the (key, version, object) of the entries of the section, the entries whose
+            key and version are unchanged reuse their cached value
+        to_dict : Callable
+            serializes an object
+        """
+        cached = self.sections.get(name)
+        if cached is not None and cached.version == version:
+            return cached.content
+
+        old_fragments = cached.fragments if cached is not None else {}
+        fragments = dict()
+        content = dict()
+        for key, obj_version, obj in entries():
+            fragment = old_fragments.get(key)
+            if fragment is None or fragment[0] != obj_version:
+                fragment = [obj_version, to_dict(obj), None]
+            fragments[key] = fragment
+            content[key] = fragment[1]
+        self.sections[name] = _Section(version, content, fragments)
+        return content
+
+    def _section_text(self, name: str, content: Any) -> str:
+        cached = self.sections.get(name)
+        if cached is None or cached.content is not content:
+            return json.dumps(content)
+        if cached.text is None:
+            parts = []
+            for key, fragment in cached.fragments.items():
+                if fragment[2] is None:
+                    fragment[2] = json.dumps(fragment[1])
+                parts.append(f"{json.dumps(key)}: {fragment[2]}")
+            cached.text = "{" + ", ".join(parts) + "}"
+        return cached.text
+
+    def to_json(self, mega_dict: dict) -> str:
+        """Same as json.dumps(mega_dict), reusing the JSON text of the unchanged parts"""
+        parts = [
+            f"{json.dumps(name)}: {self._section_text(name, content)}"
+            for name, content in mega_dict.items()
+        ]
+        return "{" + ", ".join(parts) + "}"
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+#
+# MatGest
+
+import bisect
+import math
+from typing import Any, Optional, Set
+
+from .representation import Item
+
+
+def to_number(value: Any) -> Optional[float]:
+    """Returns value as a number, None if it does not represent a number (e.g. "40,5" -> 40.5)"""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value
+    if isinstance(value, float):
+        number = value
+    elif isinstance(value, str):
+        try:
+            number = float(value.strip().replace(",", "."))
+        except ValueError:
+            return None
+    else:
+        return None
+    # nan cannot be ordered (it would break the sorted index), "inf" or "nan" are not numbers
+    # for the user either
+    return number if math.isfinite(number) else None
+
+
+class PropertyIndex:
+    def __init__(self) -> None:
+        """
+        Indexes the items by the values of their properties
+
+        For each property, a hash index maps each value to the items having it, and a sorted
+        index holds the distinct numeric values (numbers, or strings representing numbers) for
+        range queries.
+        """
+        self.values = dict()
+        self.numbers = dict()
+        self.sorted_numbers = dict()
+
+    def clear(self) -> None:
+        self.values.clear()
+        self.numbers.clear()
+        self.sorted_numbers.clear()
+
+    def _add_value(self, prop: type, value: Any, item: Item) -> None:
+        self.values.setdefault(prop, dict()).setdefault(value, set()).add(item)
+        number = to_number(value)
+        if number is not None:
+            numbers = self.numbers.setdefault(prop, dict())
+            if number not in numbers:
+                numbers[number] = set()
+                bisect.insort(self.sorted_numbers.setdefault(prop, []), number)
+            numbers[number].add(item)
+
+    def _remove_value(self, prop: type, value: Any, item: Item) -> None:
+        items = self.values.get(prop, {}).get(value)
+        if items is not None:
+            items.discard(item)
+            if not items:
+                del self.values[prop][value]
+        number = to_number(value)
+        if number is not None and number in self.numbers.get(prop, {}):
+            items = self.numbers[prop][number]
+            items.discard(item)
+            if not items:
+                del self.numbers[prop][number]
+                sorted_numbers = self.sorted_numbers[prop]
+                del sorted_numbers[bisect.bisect_left(sorted_numbers, number)]
+
+    def add(self, item: Item) -> None:
+        for prop, value in item._properties.items():
+            self._add_value(prop, value.value, item)
+
+    def remove(self, item: Item) -> None:
+        for prop, value in item._properties.items():
+            self._remove_value(prop, value.value, item)
+
+    def update(self, item: Item, prop: type, old_value: Any, new_value: Any) -> None:
+        self._remove_value(prop, old_value, item)
+        self._add_value(prop, new_value, item)
+
+    def find(self, prop: type, value: Any) -> Set[Item]:
+        return set(self.values.get(prop, {}).get(value, ()))
+
+    def find_range(
+        self, prop: type, low: Optional[float] = None, high: Optional[float] = None
+    ) -> Set[Item]:
+        sorted_numbers = self.sorted_numbers.get(prop, [])
+        start = 0 if low is None else bisect.bisect_left(sorted_numbers, low)
+        end = len(sorted_numbers) if high is None else bisect.bisect_right(sorted_numbers, high)
+        items = set()
+        for number in sorted_numbers[start:end]:
+            items.update(self.numbers[prop][number])
+        return items
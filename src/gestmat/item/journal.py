@@ -0,0 +1,293 @@
+# -*- coding: utf-8 -*-
+#
+# MatGest
+
+import os
+import json
+from typing import Optional
+
+from ..util import to_date
+from .targets import write_atomic
+from .manager import ItemManager
+from .serialization import (
+    date_to_str,
+    item_to_dict,
+    person_to_dict,
+    loan_to_dict,
+    item_from_dict,
+    person_from_dict,
+    to_optional_date,
+)
+
+# Mutations which change the structure of the database (properties, categories). They are not
+# journaled, a full snapshot is written instead at the next save.
+structural_ops = {
+    "create_property",
+    "edit_property",
+    "retire_property",
+    "unretire_property",
+    "add_category",
+    "update_category",
+}
+
+
+class Journal:
+    path: str
+    base: Optional[str]
+    generation: Optional[str]
+    pending: list[dict]
+    count: int
+    compact_every: int
+    needs_snapshot: bool
+
+    def __init__(self, path: str, compact_every: int = 500) -> None:
+        """
+        Append-only log of the mutations of an ItemManager since the last snapshot.
+
+        The first line of the journal file names the snapshot the records apply to, along with
+        the generation of this snapshot (see Workspace._prepare), each following line is one
+        mutation record (JSON).
+
+        Arguments
+        ---------
+        path : str
+            path of the journal file
+        compact_every : int
+            number of records after which the journal is compacted into a new snapshot
+        """
+        self.path = path
+        self.compact_every = compact_every
+        self.manager = None
+        self.base = None
+        self.generation = None
+        self.pending = []
+        self.count = 0
+        self.needs_snapshot = True
+
+    def attach(self, manager: ItemManager, base: Optional[str] = None, count: int = 0):
+        """
+        Starts recording the mutations of manager
+
+        Arguments
+        ---------
+        manager : ItemManager
+            manager to record
+        base : str
+            name of the snapshot the journal file currently applies to. If None, a new snapshot
+            is required before anything can be appended.
+        count : int
+            number of records already in the journal file
+        """
+        if self.manager is not None:
+            self.manager.unsubscribe(self.record)
+        self.manager = manager
+        self.pending = []
+        self.count = count
+        self.base = base
+        self.needs_snapshot = base is None
+        manager.subscribe(self.record)
+
+    def record(self, op: str, **payload) -> None:
+        """Listener of ItemManager, converts a mutation to a journal record"""
+        if op in structural_ops:
+            self.needs_snapshot = True
+            return
+
+        record = {"op": op}
+        if op in ("add_item", "delete_item", "retire_item", "unretire_item", "set_property"):
+            item = payload["item"]
+            record["item"] = item._uuid
+            if op == "add_item":
+                record["data"] = item_to_dict(item)
+            elif op == "retire_item":
+                record["date"] = date_to_str(payload["date"])
+                record["retire_loans"] = payload["retire_loans"]
+            elif op == "set_property":
+                record["property"] = payload["prop"].special_name
+                record["value"] = payload["value"]
+        elif op == "create_loan":
+            loan = payload["loan"]
+            record["item"] = loan.item._uuid
+            record["loan"] = loan_to_dict(loan)
+            record["person"] = person_to_dict(loan.person)
+        elif op == "give_back":
+            record["loan"] = payload["loan"].uuid
+            record["date"] = date_to_str(payload["date"])
+        elif op == "set_due_date":
+            record["loan"] = payload["loan"].uuid
+            record["date"] = date_to_str(payload["due_date"])
+        elif op == "edit_person":
+            record["person"] = payload["person"].uuid
+            record["data"] = person_to_dict(payload["person"])
+        else:
+            # Unknown mutation, we cannot journal it
+            self.needs_snapshot = True
+            return
+
+        self.pending.append(record)
+
+    def needs_compaction(self, name: str) -> bool:
+        """Returns True if a full snapshot named name should be written instead of appending"""
+        return (
+            self.needs_snapshot
+            or self.base != name
+            or self.count + len(self.pending) >= self.compact_every
+        )
+
+    def take(self) -> list[dict]:
+        """Returns the pending records and forgets them"""
+        records = self.pending
+        self.pending = []
+        return records
+
+    def append(self, records: list[dict]) -> bool:
+        """Appends records to the journal file"""
+        if not records:
+            return True
+        lines = "".join(json.dumps(record) + "\n" for record in records)
+        try:
+            with open(self.path, "a", encoding="utf-8") as fout:
+                fout.write(lines)
+                fout.flush()
+                os.fsync(fout.fileno())
+        except OSError:
+            # The records are lost, the next save has to be a full snapshot
+            self.needs_snapshot = True
+            return False
+        self.count += len(records)
+        return True
+
+    def reset(self, base: str, generation: Optional[str] = None) -> bool:
+        """
+        Empties the journal file after a snapshot named base has been written
+
+        The snapshot of a given day is rewritten at each compaction, the generation of the
+        snapshot tells which one the records apply to: if the program stops after the new
+        snapshot is written but before the journal is reset, the records of the journal are
+        already in the snapshot and must not be replayed.
+        """
+        try:
+            header = json.dumps({"op": "snapshot", "file": base, "generation": generation}) + "\n"
+            write_atomic(self.path, header.encode("utf-8"))
+        except OSError:
+            self.needs_snapshot = True
+            return False
+        self.base = base
+        self.generation = generation
+        self.count = 0
+        return True
+
+    def read(self) -> tuple[Optional[str], Optional[str], list[dict]]:
+        """Returns the name and the generation of the snapshot of the journal, and its records"""
+        if not os.path.exists(self.path):
+            return None, None, []
+
+        base = None
+        generation = None
+        records = []
+        try:
+            with open(self.path, "r", encoding="utf-8") as fin:
+                for i, line in enumerate(fin):
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # Torn write at the end of the journal
+                        break
+                    if not i:
+                        if record.get("op") != "snapshot":
+                            return None, None, []
+                        base = record.get("file")
+                        generation = record.get("generation")
+                    else:
+                        records.append(record)
+        except OSError:
+            return None, None, []
+        return base, generation, records
+
+
+def replay(manager: ItemManager, records: list[dict]) -> None:
+    """Applies the journal records to manager"""
+    items = dict()
+    persons = dict()
+
+    def _index():
+        # Until it is needed, the archive of the manager is not loaded
+        items.update({item._uuid: item for item in manager.items})
+        items.update({item._uuid: item for item in manager._retired_items})
+        persons.update({person.uuid: person for person in manager.persons})
+        persons.update({person.uuid: person for person in manager._retired_persons})
+
+    def _find(objects: dict, ID: str):
+        if ID not in objects and not manager.archive_loaded:
+            manager.load_archive()
+            _index()
+        return objects.get(ID)
+
+    _index()
+    loans = {loan.uuid: loan for item_loans in manager.loans.values() for loan in item_loans}
+
+    for record in records:
+        op = record.get("op")
+        item = None
+        if "item" in record and op != "add_item":
+            item = _find(items, record["item"])
+
+        if op == "add_item":
+            item = item_from_dict(manager, record["item"], record["data"])
+            if item is not None:
+                item._category.register_item(item)
+                manager.add_item(item)
+                items[item._uuid] = item
+        elif item is None and op in ("delete_item", "retire_item", "unretire_item", "set_property"):
+            continue
+        elif op == "delete_item":
+            manager.delete_item(item)
+        elif op == "retire_item":
+            manager.retire_item(item, record.get("retire_loans", True), to_date(record["date"]))
+        elif op == "unretire_item":
+            manager.unretire_item(item)
+        elif op == "set_property":
+            prop = next(
+                (p for p in item._properties if p.special_name == record["property"]), None
+            )
+            if prop is not None:
+                manager.set_item_property(item, prop, record["value"])
+        elif op == "create_loan":
+            if item is None:
+                continue
+            loan = record["loan"]
+            person = _find(persons, loan["person"])
+            if person is None:
+                person, _ = person_from_dict(loan["person"], record["person"])
+                persons[person.uuid] = person
+            new_loan = manager.create_loan(
+                item,
+                to_date(loan["date"]),
+                person,
+                loan["note"],
+                loan["timestamp"],
+                merge_person=False,
+                due_date=to_optional_date(loan.get("due_date")),
+            )
+            new_loan.uuid = loan["uuid"]
+            loans[new_loan.uuid] = new_loan
+        elif op == "give_back":
+            loan = loans.pop(record["loan"], None)
+            if loan is not None:
+                manager.give_back(loan, to_date(record["date"]))
+        elif op == "set_due_date":
+            loan = loans.get(record["loan"])
+            if loan is not None:
+                manager.set_due_date(loan, to_optional_date(record["date"]))
+        elif op == "edit_person":
+            person = _find(persons, record["person"])
+            if person is not None:
+                new_person, _ = person_from_dict(person.uuid, record["data"])
+                manager.edit_person(
+                    person,
+                    name=new_person.name,
+                    surname=new_person.surname,
+                    birthday=new_person.birthday,
+                    place=new_person.place,
+                    note=new_person.note,
+                )
@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+#
+# MatGest
+
+from typing import Any, Iterable, Optional
+
+from ..util import to_date
+from .manager import ItemManager, Item, Person, ItemLoan
+from .serialization import check_and_load, item_from_dict, person_from_dict, to_optional_date
+
+# Sections of a save file, in the order in which they are built by finish(), each one with the
+# sections which must be built before it
+section_dependencies = {
+    "properties": (),
+    "categories": ("properties",),
+    "items": ("categories",),
+    "retired_items": ("items",),
+    "persons": (),
+    "retired_persons": ("persons",),
+    "loans": ("items", "persons"),
+    # Building the loans retires the persons left without an active loan
+    "retired_loans": ("retired_items", "retired_persons", "loans"),
+}
+section_order = list(section_dependencies)
+
+
+class SnapshotBuilder:
+    manager: ItemManager
+    items: dict[str, Item]
+    retired_items: dict[str, Item]
+    persons: dict[str, Person]
+    retired_persons: dict[str, Person]
+
+    archive: dict
+    generation: Optional[str]
+
+    def __init__(self, manager: Optional[ItemManager] = None, built: Iterable[str] = ()) -> None:
+        """
+        Builds an ItemManager from the sections of a save file.
+
+        The sections are fed one after the other with feed(), each one as an iterable of
+        (key, value) pairs, so that the objects are created while the file is being read.
+        A section arriving before the sections it depends on (see section_dependencies) is kept
+        aside until they are built.
+
+        Arguments
+        ---------
+        manager : ItemManager
+            if given, the sections are added to this manager (used to load the archive of a
+            manager), the objects it already contains are not created twice
+        built : list[str]
+            sections considered as already built
+        """
+        self.manager = manager if manager is not None else ItemManager()
+        self.items = {item._uuid: item for item in self.manager.items}
+        self.retired_items = {item._uuid: item for item in self.manager._retired_items}
+        self.persons = {person.uuid: person for person in self.manager.persons}
+        self.retired_persons = {person.uuid: person for person in self.manager._retired_persons}
+        self.archive = dict()
+        self.generation = None
+        self._built = set(built)
+        self._deferred = dict()
+
+    def feed(self, section: str, entries: Iterable[tuple[str, Any]]) -> None:
+        if section == "archive":
+            # Reference to the file holding the retired items, persons and loans
+            self.archive = dict(entries)
+            return
+        if section == "generation":
+            # Identifies this snapshot among the snapshots written under the same name
+            self.generation = dict(entries).get("id")
+            return
+        if section == "archived_persons":
+            # Keys of the persons of the archive, see ItemManager.find_person
+            self.manager.archived_person_keys = {
+                (surname, name, tuple(birthday) if birthday else None): ID
+                for ID, (surname, name, birthday) in entries
+            }
+            return
+        if section not in section_dependencies:
+            return
+        if not self._ready(section):
+            self._deferred[section] = list(entries)
+            return
+        self._build(section, entries)
+
+        # Build the sections which were waiting for this one
+        ready = True
+        while ready:
+            ready = [next_section for next_section in self._deferred if self._ready(next_section)]
+            for next_section in ready:
+                self._build(next_section, self._deferred.pop(next_section))
+
+    def _ready(self, section: str) -> bool:
+        """Returns True if the sections section depends on are built"""
+        return all(previous in self._built for previous in section_dependencies[section])
+
+    def finish(self) -> ItemManager:
+        """Builds the remaining sections (missing sections are considered empty)"""
+        for section in section_order:
+            if section not in self._built:
+                self._build(section, self._deferred.pop(section, ()))
+        return self.manager
+
+    def _build(self, section: str, entries: Iterable[tuple[str, Any]]) -> None:
+        getattr(self, f"_build_{section}")(entries)
+        self._built.add(section)
+
+    def _build_properties(self, entries):
+        for name, prop in entries:
+            kwargs = dict(
+                name="", unit="", value_type=str, select=[], no_edit=False, mandatory=False
+            )
+
+            if not isinstance(prop, dict) or "name" not in prop:
+                continue
+            check_and_load(kwargs, prop)
+            # The properties are saved under their special name
+            self.manager.create_property(special_name=name, **kwargs)
+
+    def _build_categories(self, entries):
+        for name, cat in entries:
+            kwargs = dict(name=name, description="", properties=[], properties_order=[])
+
+            check_and_load(kwargs, cat)
+            self.manager.add_category(**kwargs)
+
+    def _build_items(self, entries):
+        for ID, item in entries:
+            new_item = item_from_dict(self.manager, ID, item)
+            if new_item is not None:
+                self.items[ID] = new_item
+                new_item._category.register_item(new_item)
+                self.manager.add_item(new_item)
+
+    def _build_retired_items(self, entries):
+        for ID, item in entries:
+            if ID in self.items or ID in self.retired_items:
+                continue
+            new_item = item_from_dict(self.manager, ID, item)
+            if new_item is not None:
+                self.retired_items[ID] = new_item
+                self.manager._retired_items.add(new_item)
+
+    def _build_persons(self, entries):
+        for ID, person in entries:
+            self.persons[ID] = person_from_dict(ID, person)[0]
+
+    def _build_retired_persons(self, entries):
+        for ID, person in entries:
+            if ID in self.persons or ID in self.retired_persons:
+                continue
+            self.retired_persons[ID] = person_from_dict(ID, person)[0]
+            self.manager._retired_persons.add(self.retired_persons[ID])
+            self.manager.person_registry.add(self.retired_persons[ID])
+
+    def _iter_loans(self, entries, items: dict[str, Item]):
+        for item_id, item_loans in entries:
+            if item_id not in items:
+                continue
+            item = items[item_id]
+            for loan in item_loans:
+                kwargs = dict(
+                    uuid="", person="", date="", loan_back="", due_date="", note="", timestamp=0
+                )
+                check_and_load(kwargs, loan)
+                person = self.persons.get(kwargs["person"]) or self.retired_persons.get(
+                    kwargs["person"]
+                )
+                if person is None:
+                    continue
+                yield item, person, kwargs
+
+    def _build_loans(self, entries):
+        for item, person, kwargs in self._iter_loans(entries, self.items):
+            new_loan = self.manager.create_loan(
+                item,
+                to_date(kwargs["date"]),
+                person,
+                kwargs["note"],
+                kwargs["timestamp"],
+                merge_person=False,
+                due_date=to_optional_date(kwargs["due_date"]),
+            )
+            if kwargs["uuid"]:
+                new_loan.uuid = kwargs["uuid"]
+
+        # The persons saved as active without an active loan are retired, so that the loans of
+        # the archive, loaded later by another builder, still find them
+        for ID, person in list(self.persons.items()):
+            if person not in self.manager.persons:
+                del self.persons[ID]
+                self.retired_persons[ID] = person
+                self.manager._retired_persons.add(person)
+                self.manager.person_registry.add(person)
+
+    def _build_retired_loans(self, entries):
+        items = dict(self.retired_items, **self.items)
+        for item, person, kwargs in self._iter_loans(entries, items):
+            new_loan = ItemLoan(
+                item,
+                to_date(kwargs["date"]),
+                person,
+                kwargs["note"],
+                kwargs["timestamp"],
+                to_optional_date(kwargs["due_date"]),
+            )
+            if kwargs["uuid"]:
+                new_loan.uuid = kwargs["uuid"]
+            new_loan.give_back(to_date(kwargs["loan_back"]))
+            self.manager._add_retired_loan(new_loan, loaded=True)
@@ -2,15 +2,24 @@
 #
 # MatGest
 
-import uuid
 import datetime
 import time
 import copy
-from typing import Optional, Set, Any, Type, Union
+import functools
+import threading
+from typing import Optional, Set, Any, Type, Union, Callable
 
 from ..util import strip_special_chars
 
-from .representation import Item, ItemCategory, ItemProperty, define_new_property
+from .representation import Item, ItemCategory, ItemProperty, define_new_property, rename_property
+from .representation import new_uuid, uuid_to_int, uuid_to_str
+from .index import PropertyIndex
+from .columns import CategoryColumns
+from .persons import PersonRegistry, person_key
+from .timeline import LoanTimeline, LOAN_START, LOAN_RETURN
+from .due import DueTracker
+from .events import EventBus, event_from_op
+from .search import SearchKeys, loan_texts, loan_version, person_texts
 
 
 class Person:
@@ -21,6 +30,9 @@ class Person:
     note: str
     loans: Set["ItemLoan"]
     uuid: str
+    _version: int
+
+    __slots__ = ("name", "surname", "birthday", "place", "note", "loans", "uuid_int", "_version")
 
     def __init__(
         self,
@@ -36,9 +48,16 @@ class Person:
         self.place = place
         self.note = note
         self.loans = set()
-        self.uuid = str(uuid.uuid4())
+        self.uuid_int = new_uuid()
+        self._version = 0
+
+    @property
+    def uuid(self) -> str:
+        return uuid_to_str(self.uuid_int)
 
-        self.items = []
+    @uuid.setter
+    def uuid(self, value: str) -> None:
+        self.uuid_int = uuid_to_int(value)
 
     def __repr__(self) -> str:
         return f"Person({self.name} {self.surname}/Birth: {self.birthday}/Place: {self.place})"
@@ -55,16 +74,42 @@ class ItemLoan:
     person: Person
     date: datetime.date
     loan_back: datetime.date
-    finished: bool = False
+    due_date: datetime.date
+    finished: bool
     item: Item
     timestamp: float
     note: str
     uuid: str
+    _version: int
+
+    __slots__ = (
+        "person",
+        "date",
+        "loan_back",
+        "due_date",
+        "finished",
+        "item",
+        "timestamp",
+        "note",
+        "uuid_int",
+        "_version",
+    )
 
-    def __init__(self, item: Item, date: datetime.date, person: Person, note: str, timestamp=None):
-        """Represents a loan of an item"""
+    def __init__(
+        self,
+        item: Item,
+        date: datetime.date,
+        person: Person,
+        note: str,
+        timestamp=None,
+        due_date: datetime.date = None,
+    ):
+        """Represents a loan of an item, due_date is the date the item should be given back"""
         self.item = item
         self.date = date
+        self.loan_back = None
+        self.due_date = due_date
+        self.finished = False
         self.person = person
         self.note = note
         if not timestamp:
@@ -72,7 +117,16 @@ class ItemLoan:
         else:
             self.timestamp = timestamp
         self.person.register_loan(self)
-        self.uuid = str(uuid.uuid4())
+        self.uuid_int = new_uuid()
+        self._version = 0
+
+    @property
+    def uuid(self) -> str:
+        return uuid_to_str(self.uuid_int)
+
+    @uuid.setter
+    def uuid(self, value: str) -> None:
+        self.uuid_int = uuid_to_int(value)
 
     def __repr__(self) -> str:
         return f"Loan({self.person.surname}, date={self.date})"
@@ -84,6 +138,32 @@ class ItemLoan:
         self.person.unregister_loan(self)
 
 
+def _synchronized(method):
+    """Runs the method of ItemManager while holding the lock of the manager"""
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.lock:
+            return method(self, *args, **kwargs)
+
+    return wrapper
+
+
+# Parts of the saves changed by each mutation (see ItemManager.versions), the other mutations
+# change the structure (properties and categories)
+_op_sections = {
+    "add_item": ("items",),
+    "delete_item": ("items",),
+    "retire_item": ("items", "loans", "persons"),
+    "unretire_item": ("items",),
+    "set_property": ("items",),
+    "edit_person": ("persons",),
+    "create_loan": ("loans", "persons"),
+    "give_back": ("loans", "persons"),
+    "set_due_date": ("loans",),
+}
+
+
 def _add_to_dict_set(dict_set: dict, key: Any, element: Any):
     if key not in dict_set:
         dict_set[key] = set()
@@ -97,9 +177,10 @@ class ItemManager:
     loans: dict[Item, Set[ItemLoan]]
     grouped_loans: dict[Person, Set[ItemLoan]]
     persons: Set[Person]
-    retired_items: Set[Person]
-    retired_loans: dict[Item, Set[ItemLoan]]
-    retired_persons: Set[Person]
+    _retired_items: Set[Item]
+    _retired_loans: dict[Item, Set[ItemLoan]]
+    _retired_persons: Set[Person]
+    archive_dirty: bool
 
     def __init__(self):
         self.categories = {}
@@ -107,13 +188,121 @@ class ItemManager:
             {}
         )  # Defines the list of properties. True = active, False = retired property
         self.loans = {}
+        # Current and finished loans of each person
+        self.grouped_loans = {}
+        self._loan_history = {}
+        self.timeline = LoanTimeline()
+        self.due_dates = DueTracker()
         self.items = set()
         self.persons = set()
-        self.retired_items = set()
-        self.retired_loans = {}
-        self.retired_persons = set()
+        # The retired items, loans and persons (the archive) can be loaded on demand: until the
+        # loader is called, the collections only contain what has been retired since the load
+        self._retired_items = set()
+        self._retired_loans = {}
+        self._retired_persons = set()
+        self._archive_loader = None
+        self.archive_dirty = False
+        # Keys (see persons.person_key) of the persons of the archive which is not loaded yet,
+        # with their uuid, so that the archive is only loaded for the borrowers it knows. None
+        # if they are unknown (saves written without them)
+        self.archived_person_keys = None
         self.empty_person = Person()
+        self._listeners = []
+        # Typed events of the mutations, see events.EventBus
+        self.events = EventBus()
+        # Values of the properties of the active items
+        self.index = PropertyIndex()
+        # Active items of each category, depending on whether they are loaned or not
+        self._available = {}
+        self._on_loan = {}
+        # Active and retired persons, by name
+        self.person_registry = PersonRegistry()
+        # Search keys of the active loans and of the persons, computed on demand and again after
+        # the objects are edited
+        self.loan_search_keys = SearchKeys(loan_texts, loan_version)
+        self.person_search_keys = SearchKeys(person_texts)
+        # Values of the properties of the active items, stored column by column for each
+        # category. Optional, None until enable_columns() is called
+        self.columns = None
+        # Incremented at each mutation of the corresponding part of the manager, along with the
+        # _version of the objects concerned, so that the saves can tell what changed
+        self.versions = {"structure": 0, "items": 0, "persons": 0, "loans": 0}
+        # Held during mutations, so that a snapshot taken by another thread is consistent
+        self.lock = threading.RLock()
+
+    @property
+    def retired_items(self) -> Set[Item]:
+        self.load_archive()
+        return self._retired_items
+
+    @property
+    def retired_loans(self) -> dict[Item, Set[ItemLoan]]:
+        self.load_archive()
+        return self._retired_loans
+
+    @property
+    def retired_persons(self) -> Set[Person]:
+        self.load_archive()
+        return self._retired_persons
+
+    @property
+    def archive_loaded(self) -> bool:
+        return self._archive_loader is None
+
+    def set_archive_loader(self, loader: Callable[["ItemManager"], None]):
+        """
+        Defers the loading of the archive (retired items, loans and persons) until one of
+        retired_items, retired_loans or retired_persons is accessed.
 
+        The loader is called with the manager and must add the archived objects to it.
+        """
+        self._archive_loader = loader
+
+    @_synchronized
+    def load_archive(self) -> bool:
+        """Loads the archive if it has not been loaded yet. Returns False if the loading failed."""
+        if self._archive_loader is None:
+            return True
+        loader = self._archive_loader
+        self._archive_loader = None
+        try:
+            loader(self)
+        except Exception:
+            self._archive_loader = loader
+            return False
+        return True
+
+    def subscribe(self, callback: Callable[..., None]):
+        """
+        Registers a callback called after each mutation of the manager
+
+        The callback is called as callback(op, **payload), where op is the name of the
+        mutation (e.g. "create_loan") and payload holds the objects concerned by the mutation.
+        The same mutations are emitted as typed events by self.events (see events.EventBus).
+        """
+        if callback not in self._listeners:
+            self._listeners.append(callback)
+
+    def unsubscribe(self, callback: Callable[..., None]):
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def _notify(self, op: str, **payload):
+        for section in _op_sections.get(op, ("structure",)):
+            self.versions[section] += 1
+        for obj in payload.values():
+            if hasattr(type(obj), "_version"):
+                obj._version += 1
+        if "loan" in payload:
+            # The person lists its loans
+            payload["loan"].person._version += 1
+
+        for callback in self._listeners:
+            callback(op, **payload)
+        if self.events.active:
+            self.events.emit(event_from_op(op, payload))
+
+    @_synchronized
     def add_category(
         self, name: str, description: str, properties: list, properties_order: list = None
     ):
@@ -154,14 +343,18 @@ class ItemManager:
             prop_order = list(list_properties)
 
         self.categories[name] = ItemCategory(name, description, list_properties, prop_order)
+        self._notify("add_category", category=self.categories[name])
         return self.categories[name]
 
+    @_synchronized
     def update_category_key(self, category: ItemCategory, old_name: str):
         if old_name == category.name:
             return
         self.categories[category.name] = category
         del self.categories[old_name]
+        self._notify("update_category", category=category, old_name=old_name)
 
+    @_synchronized
     def update_properties(self, category: ItemCategory, properties: list[ItemProperty]):
         """
         Updates the properties of a category
@@ -172,12 +365,22 @@ class ItemManager:
         category.properties_order = list(properties)
 
         for item in category.registered_items:
+            active = item in self.items
+            if active:
+                self.index.remove(item)
             for prop in to_add:
                 item.add_property(prop)
+            if active:
+                self.index.add(item)
 
         category.properties = properties
         category.properties_order = properties
+        category.properties_changed()
+        if self.columns is not None and category in self.columns:
+            self.columns[category].sync_properties()
+        self._notify("update_category", category=category)
 
+    @_synchronized
     def create_property(
         self,
         name,
@@ -186,24 +389,48 @@ class ItemManager:
         mandatory: bool = False,
         select: list = [],
         no_edit: bool = False,
+        special_name: str = "",
     ):
-        """Creates a property"""
-        prop = define_new_property(name, value_type, unit, mandatory, select, no_edit)
+        """Creates a property (see define_new_property)"""
+        prop = define_new_property(
+            name, value_type, unit, mandatory, select, no_edit, special_name
+        )
         self.properties[prop] = True
+        self._notify("create_property", prop=prop)
         return prop
 
+    @_synchronized
+    def edit_property(self, prop: type, **attributes):
+        """
+        Edits the attributes (name, special_name, select, mandatory, ...) of a property
+        """
+        old_special_name = prop.special_name
+        for key, value in attributes.items():
+            setattr(prop, key, value)
+        if prop.special_name != old_special_name:
+            rename_property(prop, old_special_name)
+        for category in self.categories.values():
+            if prop in category.properties:
+                category.properties_changed()
+        self._notify("edit_property", prop=prop, old_special_name=old_special_name)
+
+    @_synchronized
     def retire_property(self, prop: Union[str, type]):
         if isinstance(prop, str):
             prop = ItemProperty.get(prop)
         if prop in self.properties:
             self.properties[prop] = False
+            self._notify("retire_property", prop=prop)
 
+    @_synchronized
     def unretire_property(self, prop: Union[str, type]):
         if isinstance(prop, str):
             prop = ItemProperty.get(prop)
         if prop in self.properties:
             self.properties[prop] = True
+            self._notify("unretire_property", prop=prop)
 
+    @_synchronized
     def add_item(self, item: Item):
         if item._category.name not in self.categories:
             self.categories[item._category.name] = item._category
@@ -212,56 +439,137 @@ class ItemManager:
                 self.properties[prop] = True
 
         self.items.add(item)
+        self.index.add(item)
+        self._update_availability(item)
+        self._add_to_columns(item)
+        self._notify("add_item", item=item)
 
+    @_synchronized
     def add_items(self, items: Any):
-        for item in items:
-            self.add_item(item)
+        with self.events.batch():
+            for item in items:
+                self.add_item(item)
 
+    @_synchronized
     def delete_item(self, item: Item):
         """
         Deletes the item from the manager. Irreversible.
         """
         if item in self.items:
             self.items.remove(item)
-            item._category.unregister_item(item)
-
-    def retire_item(self, item: Item, retire_loans: bool = True):
+            self.index.remove(item)
+            self._update_availability(item)
+            self._remove_from_columns(item)
+            item.unregister_item()
+            self._notify("delete_item", item=item)
+
+    @_synchronized
+    def set_item_property(self, item: Item, prop: type, value: Any):
+        """Sets the value of a property of an item"""
+        if prop not in item._properties:
+            item.add_property(prop)
+        if item in self.items:
+            self.index.update(item, prop, item._properties[prop].value, value)
+            if self.columns is not None:
+                self.category_columns(item._category).set(item, prop, value)
+        item._properties[prop].value = value
+        if item in self.items or item in self._retired_items:
+            self._notify("set_property", item=item, prop=prop, value=value)
+
+    @_synchronized
+    def edit_person(self, person: Person, **fields):
+        """
+        Edits the fields (name, surname, birthday, place, note) of a person
+        """
+        for key, value in fields.items():
+            setattr(person, key, value)
+        if person in self.person_registry:
+            self.person_registry.update(person)
+        self._notify("edit_person", person=person)
+
+    @_synchronized
+    def retire_item(self, item: Item, retire_loans: bool = True, date: datetime.date = None):
         """
         Retires the item, and all the associated loans of the item
         """
         if item in self.items:
-            self.retired_items.add(item)
+            if not date:
+                date = datetime.datetime.now()
+            self._retired_items.add(item)
+            self.archive_dirty = True
             self.items.remove(item)
+            self.index.remove(item)
             if item in self.loans and retire_loans:
-                if item not in self.retired_loans:
-                    self.retired_loans[item] = set()
                 for loan in self.loans[item]:
-                    self.retired_loans[item].add(loan)
-                    loan.give_back(datetime.datetime.now())
+                    loan.give_back(date)
+                    self.due_dates.discard(loan)
+                    self.loan_search_keys.discard(loan)
+                    self._remove_grouped_loan(loan)
+                    self._add_retired_loan(loan)
+                    if loan.person not in self.grouped_loans:
+                        self.persons.discard(loan.person)
+                        self._retired_persons.add(loan.person)
 
                 self.loans.pop(item)
+            self._update_availability(item)
+            self._remove_from_columns(item)
+            # The categories only list their active items
+            item._category.unregister_item(item)
+            self._notify("retire_item", item=item, date=date, retire_loans=retire_loans)
 
+    @_synchronized
     def unretire_item(self, item: Item):
         if item in self.retired_items:
-            self.retired_items.remove(item)
+            self._retired_items.remove(item)
+            self.archive_dirty = True
             self.items.add(item)
+            self.index.add(item)
+            self._update_availability(item)
+            self._add_to_columns(item)
+            item._category.register_item(item)
+            self._notify("unretire_item", item=item)
 
+    @_synchronized
     def create_loan(
-        self, item: Item, date: datetime.date, person: Person, note: str = "", timestamp=None
+        self,
+        item: Item,
+        date: datetime.date,
+        person: Person,
+        note: str = "",
+        timestamp=None,
+        merge_person: bool = True,
+        due_date: datetime.date = None,
     ):
         """Creates a loan.
-        The item must already exist. If the person does not exists, it is added to the list of persons having a loan
+        The item must already exist. If the person does not exists, it is added to the list of
+        persons having a loan. If merge_person is True and person is a new Person with the same
+        surname, name and birthday as a known person, the known person is used instead.
+        due_date is the date the item should be given back (None for no due date).
         """
         if item not in self.items:
             raise KeyError(f"{item} is not in list of available items")
 
-        loan = ItemLoan(item, date, person, note, timestamp)
+        if person not in self.person_registry:
+            if merge_person:
+                person = self.find_person(person.surname, person.name, person.birthday) or person
+            self.person_registry.add(person)
+
+        loan = ItemLoan(item, date, person, note, timestamp, due_date)
 
         self.persons.add(person)
+        if person in self._retired_persons:
+            self._retired_persons.remove(person)
+            self.archive_dirty = True
 
         _add_to_dict_set(self.loans, item, loan)
+        _add_to_dict_set(self.grouped_loans, person, loan)
+        self.timeline.add(date, LOAN_START, loan)
+        self.due_dates.push(loan, due_date)
+        self._update_availability(item)
+        self._notify("create_loan", loan=loan)
         return loan
 
+    @_synchronized
     def _give_back(self, loan: ItemLoan, date: datetime.date):
         """"""
         item = loan.item
@@ -269,10 +577,163 @@ class ItemManager:
             if loan in self.loans[item]:
                 loan.give_back(date)
                 self.loans[item].remove(loan)
-                _add_to_dict_set(self.retired_loans, item, loan)
-                if not loan.person.loans:
-                    self.persons.remove(loan.person)
-                    self.retired_persons.add(loan.person)
+                self._update_availability(item)
+                self.due_dates.discard(loan)
+                self.loan_search_keys.discard(loan)
+                self._remove_grouped_loan(loan)
+                self._add_retired_loan(loan)
+                self.archive_dirty = True
+                if loan.person not in self.grouped_loans:
+                    self.persons.discard(loan.person)
+                    self._retired_persons.add(loan.person)
+                self._notify("give_back", loan=loan, date=date)
+
+    @_synchronized
+    def set_due_date(self, loan: ItemLoan, due_date: datetime.date = None):
+        """Changes the date an active loan should be given back (None for no due date)"""
+        if loan.finished:
+            return
+        loan.due_date = due_date
+        self.due_dates.push(loan, due_date)
+        self._notify("set_due_date", loan=loan, due_date=due_date)
+
+    def overdue_loans(self, date: datetime.date = None) -> list[ItemLoan]:
+        """Returns the active loans due before date (today by default), the most overdue first"""
+        with self.lock:
+            return self.due_dates.overdue(date or datetime.date.today())
+
+    def next_due_loans(self, count: int, date: datetime.date = None) -> list[ItemLoan]:
+        """Returns the count active loans due first on date (today by default) or later"""
+        with self.lock:
+            return self.due_dates.next_due(count, date or datetime.date.today())
+
+    def _remove_grouped_loan(self, loan: ItemLoan):
+        loans = self.grouped_loans.get(loan.person)
+        if loans is not None:
+            loans.discard(loan)
+            if not loans:
+                del self.grouped_loans[loan.person]
+
+    def _add_retired_loan(self, loan: ItemLoan, loaded: bool = False):
+        """
+        Files a finished loan with the retired loans, in the history of its person and in the
+        timeline. loaded is True for the loans read from a save, whose start is not known yet.
+        """
+        _add_to_dict_set(self._retired_loans, loan.item, loan)
+        _add_to_dict_set(self._loan_history, loan.person, loan)
+        if loaded:
+            self.timeline.add(loan.date, LOAN_START, loan)
+        self.timeline.add(loan.loan_back, LOAN_RETURN, loan)
+
+    def person_loans(self, person: Person, history: bool = False) -> Set[ItemLoan]:
+        """
+        Returns the current loans of person, or its finished loans if history is True (which
+        loads the archive). The set must not be modified.
+        """
+        if history:
+            self.load_archive()
+            return self._loan_history.get(person, set())
+        return self.grouped_loans.get(person, set())
+
+    def loan_events(self, start: Any = None, end: Any = None, kind: Optional[str] = None) -> list:
+        """
+        Returns the (date, kind, loan) events of the loans between start and end (included),
+        in chronological order. kind is "start" or "return" (see timeline.py), None for both.
+        """
+        self.load_archive()
+        return self.timeline.between(start, end, kind)
+
+    def loans_since(self, date: Any) -> list[ItemLoan]:
+        """Returns the loans started since date, in chronological order"""
+        return [loan for _, _, loan in self.loan_events(date, kind=LOAN_START)]
+
+    def find(self, prop: Union[str, type], value: Any) -> Set[Item]:
+        """Returns the active items whose property prop has the given value"""
+        if isinstance(prop, str):
+            prop = ItemProperty.get(prop)
+        return self.index.find(prop, value)
+
+    def find_range(
+        self, prop: Union[str, type], low: Optional[float] = None, high: Optional[float] = None
+    ) -> Set[Item]:
+        """
+        Returns the active items whose property prop is a number between low and high
+        (included). If low or high is None, the range is not bounded on that side.
+        """
+        if isinstance(prop, str):
+            prop = ItemProperty.get(prop)
+        return self.index.find_range(prop, low, high)
+
+    def find_person(self, surname: str, name: str, birthday: Any) -> Optional[Person]:
+        """
+        Returns the known person (active or retired) with this surname, name and birthday, the
+        comparison ignoring case and accents. Loads the archive if a person of the archive has
+        this surname, name and birthday.
+        """
+        person = self.person_registry.find(surname, name, birthday)
+        if person is None and not self.archive_loaded:
+            keys = self.archived_person_keys
+            if keys is None or person_key(surname, name, birthday) in keys:
+                if self.load_archive():
+                    person = self.person_registry.find(surname, name, birthday)
+        return person
+
+    def search_persons(self, prefix: str) -> list[Person]:
+        """Returns the known persons whose surname starts with prefix, sorted by surname"""
+        return self.person_registry.search(prefix)
+
+    def sorted_persons(self) -> list[Person]:
+        """Returns the persons having a loan, sorted by surname and name"""
+        return [person for person in self.person_registry.sorted() if person in self.persons]
+
+    @_synchronized
+    def enable_columns(self):
+        """
+        Starts keeping the values of the properties of the active items column by column (see
+        CategoryColumns), so that they can be read, sorted or serialized a column at a time
+        """
+        if self.columns is not None:
+            return
+        self.columns = dict()
+        for item in self.items:
+            self._add_to_columns(item)
+
+    def category_columns(self, category: ItemCategory) -> Optional[CategoryColumns]:
+        """Returns the columns of the active items of category, None if columns are disabled"""
+        if self.columns is None:
+            return None
+        if category not in self.columns:
+            self.columns[category] = CategoryColumns(category)
+        return self.columns[category]
+
+    def _add_to_columns(self, item: Item):
+        if self.columns is not None:
+            self.category_columns(item._category).add(item)
+
+    def _remove_from_columns(self, item: Item):
+        if self.columns is not None and item._category in self.columns:
+            self.columns[item._category].remove(item)
+
+    def _update_availability(self, item: Item):
+        """Puts the item in the available or on loan set of its category (none if inactive)"""
+        category = item._category
+        available = self._available.setdefault(category, set())
+        on_loan = self._on_loan.setdefault(category, set())
+        available.discard(item)
+        on_loan.discard(item)
+        if item in self.items:
+            if self.is_item_loaned(item):
+                on_loan.add(item)
+            else:
+                available.add(item)
+
+    def available_items(self, category: ItemCategory) -> Set[Item]:
+        """Returns the active items of category which are not loaned (do not modify the set)"""
+        return self._available.get(category, set())
+
+    def loaned_items(self, category: ItemCategory) -> Set[Item]:
+        """Returns the active items of category which are loaned (do not modify the set)"""
+        return self._on_loan.get(category, set())
 
     def is_item_loaned(self, item: Item) -> bool:
         if item in self.loans:
@@ -280,11 +741,13 @@ class ItemManager:
                 return True
         return False
 
+    @_synchronized
     def give_back(self, loan_or_item: Union[Item, ItemLoan], date: datetime.date):
         """"""
         if isinstance(loan_or_item, Item):
             loans = list(self.loans[loan_or_item])
-            for loan in loans:
-                self._give_back(loan, date)
+            with self.events.batch():
+                for loan in loans:
+                    self._give_back(loan, date)
         elif isinstance(loan_or_item, ItemLoan):
             self._give_back(loan_or_item, date)
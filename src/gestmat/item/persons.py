@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+#
+# MatGest
+
+import bisect
+import datetime
+from typing import Any, Optional
+
+from ..util import ProtectedDatetime, strip_accents
+
+
+def normalize_name(text: str) -> str:
+    """Returns the form of a name used for comparisons (lower case, without accents)"""
+    return strip_accents(" ".join((text or "").split())).lower()
+
+
+def _birthday_key(birthday: Any) -> Optional[tuple]:
+    if isinstance(birthday, ProtectedDatetime):
+        birthday = birthday.date
+    if isinstance(birthday, datetime.date):
+        return (birthday.year, birthday.month, birthday.day)
+    return None
+
+
+def person_key(surname: str, name: str, birthday: Any) -> Optional[tuple]:
+    """Returns the key identifying a person, None if the person has neither name nor surname"""
+    surname, name = normalize_name(surname), normalize_name(name)
+    if not surname and not name:
+        return None
+    return (surname, name, _birthday_key(birthday))
+
+
+class PersonRegistry:
+    def __init__(self) -> None:
+        """
+        Index of the persons of an ItemManager
+
+        The persons are identified by their normalized (surname, name, birthday), and kept
+        sorted by surname for prefix searches.
+        """
+        self.by_key = dict()
+        self.by_uuid = dict()
+        # Sorted list of (normalized surname, normalized name, uuid)
+        self.sorted_names = []
+        self._entries = dict()
+
+    def __contains__(self, person) -> bool:
+        return self.by_uuid.get(person.uuid) is person
+
+    def add(self, person) -> None:
+        if person in self:
+            return
+        self.by_uuid[person.uuid] = person
+        key = person_key(person.surname, person.name, person.birthday)
+        if key is not None:
+            # With duplicates (e.g. in old saves), the first person registered is the one found
+            self.by_key.setdefault(key, []).append(person)
+        entry = (normalize_name(person.surname), normalize_name(person.name), person.uuid)
+        self._entries[person.uuid] = (key, entry)
+        bisect.insort(self.sorted_names, entry)
+
+    def remove(self, person) -> None:
+        if person not in self:
+            return
+        key, entry = self._entries.pop(person.uuid)
+        del self.by_uuid[person.uuid]
+        if key is not None:
+            self.by_key[key].remove(person)
+            if not self.by_key[key]:
+                del self.by_key[key]
+        index = bisect.bisect_left(self.sorted_names, entry)
+        if index < len(self.sorted_names) and self.sorted_names[index] == entry:
+            del self.sorted_names[index]
+
+    def update(self, person) -> None:
+        """Re-indexes a person whose name, surname or birthday changed"""
+        self.remove(person)
+        self.add(person)
+
+    def key(self, person) -> Optional[tuple]:
+        """Returns the key under which a registered person is indexed"""
+        return self._entries[person.uuid][0]
+
+    def find(self, surname: str, name: str, birthday: Any):
+        key = person_key(surname, name, birthday)
+        if key is None or key not in self.by_key:
+            return None
+        return self.by_key[key][0]
+
+    def search(self, prefix: str) -> list:
+        """Returns the persons whose surname starts with prefix, sorted by surname and name"""
+        prefix = normalize_name(prefix)
+        index = bisect.bisect_left(self.sorted_names, (prefix,))
+        persons = []
+        while index < len(self.sorted_names):
+            surname, _, uuid = self.sorted_names[index]
+            if not surname.startswith(prefix):
+                break
+            persons.append(self.by_uuid[uuid])
+            index += 1
+        return persons
+
+    def sorted(self) -> list:
+        """Returns all the persons, sorted by surname and name"""
+        return [self.by_uuid[uuid] for _, _, uuid in self.sorted_names]
@@ -6,11 +6,33 @@ from ..util import strip_special_chars
 
 import time
 import uuid
+import weakref
 from dataclasses import dataclass
 from collections import defaultdict
 from typing import Optional, Set, Any, Type, Union
 
 
+def new_uuid() -> int:
+    """Returns a new random uuid, stored as a 128 bits int (smaller than its string form)"""
+    return uuid.uuid4().int
+
+
+def uuid_to_int(text: str) -> Union[int, str]:
+    """Returns the int form of a uuid string, or the string itself if it is not a uuid"""
+    try:
+        return uuid.UUID(text).int
+    except (ValueError, TypeError, AttributeError):
+        return text
+
+
+def uuid_to_str(value: Union[int, str]) -> str:
+    """Returns the string form of a uuid stored by uuid_to_int (same as str(uuid.UUID))"""
+    if isinstance(value, str):
+        return value
+    text = "%032x" % value
+    return f"{text[:8]}-{text[8:12]}-{text[12:16]}-{text[16:20]}-{text[20:]}"
+
+
 class ItemProperty:
     value: str
     unit: Optional[str] = None
@@ -23,12 +45,16 @@ class ItemProperty:
     _property_types: dict[str, Type["ItemProperty"]] = {}
     registered_items: Set["Item"]
 
+    # The instances only hold their value, everything else is defined by their class
+    __slots__ = ("value",)
+
     def __init__(self, value):
         self.value = value
 
     def __init_subclass__(cls) -> None:
         cls._property_types = {}
-        cls.registered_items = set()
+        # Weak, so that an item dropped without being unregistered does not stay alive
+        cls.registered_items = weakref.WeakSet()
         ItemProperty._property_types[cls.__name__[8:].lower()] = cls
 
     @classmethod
@@ -40,22 +66,29 @@ class ItemProperty:
             return None
 
     @classmethod
-    def filter(cls, value) -> list["ItemProperty"]:
-        return cls.registered_items[value]
+    def value_type(cls) -> type:
+        """Returns the type of the values of the property (int, float or str)"""
+        return cls.__annotations__.get("value", str)
+
+    @classmethod
+    def filter(cls, value) -> list["Item"]:
+        """
+        Returns the registered items whose value of this property is value
+
+        This scans the registered items, use ItemManager.find for an indexed lookup
+        """
+        return [item for item in cls.registered_items if item._properties[cls].value == value]
 
     @classmethod
     def remove_property(cls):
-        parents = []
-        for item in cls.registered_items:
-            parents.append(item.category)
+        for item in list(cls.registered_items):
             item.remove_property(cls, True)
 
     def register_item(self, item: "Item"):
         self.registered_items.add(item)
 
     def unregister_item(self, item: "Item"):
-        if item in self.registered_items:
-            self.registered_items.remove(item)
+        self.registered_items.discard(item)
 
     def __repr__(self) -> str:
         return f"{self.__class__.__name__}(value={self.value}, unit={self.unit}, mandatory={self.mandatory})"
@@ -64,6 +97,13 @@ class ItemProperty:
         return self.__class__.__name__[8:]
 
 
+# Classes of the properties by (lower case) special name, so that a property defined again
+# (e.g. each time a save is loaded) reuses its class instead of creating a new one
+_property_classes: dict[str, Type[ItemProperty]] = {}
+
+_value_types = (int, float, str)
+
+
 def define_new_property(
     name: str,
     value_type: Type,
@@ -71,25 +111,82 @@ def define_new_property(
     mandatory: bool = False,
     select: list = [],
     no_edit=False,
+    special_name: str = "",
 ):
-    special_name = strip_special_chars(name)
-    name = name.replace("'", "\\'")
-
-    prop_class_name = f"Property{special_name[0].upper()}{special_name[1:]}"
-    value_type_str = {int: "int", float: "float", str: "str"}[value_type]
-    cls_str = (
-        f"class {prop_class_name}(ItemProperty):\n"
-        f"    value : {value_type_str}\n"
-        f"    unit : str = '{unit}'\n"
-        f"    special_name : str = '{special_name}'\n"
-        f"    name : str = '{name}'\n"
-        f"    select : list = {select}\n"
-        f"    no_edit : bool = {no_edit}\n"
-        f"    mandatory : bool = " + ("True" if mandatory else "False")
+    """
+    Returns the class of the property named name, creating it if it does not exist yet. An
+    existing class is only returned if it has the same attributes, a ValueError is raised
+    otherwise.
+
+    Arguments
+    ---------
+    name : str
+        name of the property
+    value_type : type
+        type of the values (int, float or str)
+    unit, mandatory, select, no_edit
+        attributes of the property
+    special_name : str
+        name identifying the property, by default name without its special characters. A
+        renamed property (see ItemManager.edit_property) keeps the special name it was given.
+    """
+    if value_type not in _value_types:
+        raise ValueError(f"Unsupported type of property values: {value_type!r}")
+    special_name = special_name or strip_special_chars(name)
+    attributes = dict(
+        unit=unit,
+        special_name=special_name,
+        name=name,
+        select=list(select),
+        no_edit=no_edit,
+        mandatory=bool(mandatory),
     )
-    scope = dict(ItemProperty=ItemProperty)
-    exec(cls_str, scope)
-    return scope[prop_class_name]
+
+    key = special_name.lower()
+    prop = _property_classes.get(key)
+    if prop is None:
+        prop_class_name = f"Property{special_name[0].upper()}{special_name[1:]}"
+        namespace = dict(__slots__=(), __annotations__={"value": value_type}, **attributes)
+        prop = type(prop_class_name, (ItemProperty,), namespace)
+        _property_classes[key] = prop
+    else:
+        # The class is shared by all the managers, its attributes are never changed here
+        del attributes["special_name"]
+        defined = {attribute: getattr(prop, attribute) for attribute in attributes}
+        defined["select"] = list(defined["select"])
+        if defined != attributes or prop.__annotations__["value"] is not value_type:
+            raise ValueError(f"The property {special_name!r} is already defined differently")
+    return prop
+
+
+def property_classes() -> tuple[dict, dict]:
+    """Returns a copy of the registries of the property classes, see restore_property_classes"""
+    return dict(_property_classes), dict(ItemProperty._property_types)
+
+
+def restore_property_classes(registries: tuple[dict, dict]) -> None:
+    """Forgets the property classes defined since property_classes() returned registries"""
+    for registry, saved in zip((_property_classes, ItemProperty._property_types), registries):
+        registry.clear()
+        registry.update(saved)
+
+
+def rename_property(prop: Type[ItemProperty], old_special_name: str) -> None:
+    """
+    Updates the registries of the properties after the special name of prop was changed (see
+    ItemManager.edit_property), the old special name being free for a new property
+    """
+    old_key = old_special_name.lower()
+    key = prop.special_name.lower()
+    if key == old_key:
+        return
+    for registry in (_property_classes, ItemProperty._property_types):
+        if registry.get(old_key) is prop:
+            del registry[old_key]
+        registry[key] = prop
+    # The name of the class is the name under which ItemProperty.get finds it
+    special_name = prop.special_name
+    prop.__name__ = prop.__qualname__ = f"Property{special_name[:1].upper()}{special_name[1:]}"
 
 
 def _return_prop_type(prop):
@@ -107,6 +204,7 @@ class ItemCategory:
     properties: Set[type[ItemProperty]]
     properties_order: list[ItemProperty]
     registered_items: Set["Item"]
+    _version: int = 0
 
     def __init__(
         self,
@@ -124,6 +222,8 @@ class ItemCategory:
             self.properties_order = list(properties)
         else:
             self.properties_order = list(properties_order)
+        # Properties by (lower case) name, built on demand
+        self._property_names = None
 
     def __repr__(self):
         text = ""
@@ -148,6 +248,23 @@ class ItemCategory:
         if item in self.registered_items:
             self.registered_items.remove(item)
 
+    def property_type(self, name: str) -> Optional[type[ItemProperty]]:
+        """Returns the property of the category named name (special name, case insensitive)"""
+        if self._property_names is None:
+            names = dict()
+            for prop in self.properties:
+                names.setdefault(prop.special_name.lower(), prop)
+                names.setdefault(prop.__name__[8:].lower(), prop)
+            self._property_names = names
+        prop = self._property_names.get(name)
+        if prop is None:
+            prop = self._property_names.get(name.lower())
+        return prop
+
+    def properties_changed(self) -> None:
+        """To call when properties (or the names of the properties) were changed directly"""
+        self._property_names = None
+
     def add_property(self, prop: type):
         prop = _return_prop_type(prop)
         if prop:
@@ -155,6 +272,7 @@ class ItemCategory:
                 return
             self.properties.add(prop)
             self.properties_order.append(prop)
+            self.properties_changed()
 
     def remove_property(self, prop: type, remove_in_children: bool = True):
         prop = _return_prop_type(prop)
@@ -162,6 +280,7 @@ class ItemCategory:
             if prop not in self.properties:
                 return
             self.properties.remove(prop)
+            self.properties_changed()
             if remove_in_children:
                 for item in self.registered_items:
                     item.remove_property(prop, True)
@@ -173,6 +292,8 @@ forbidden_property_names = {
     "_notes",
     "_category",
     "_uuid",
+    "_uuid_int",
+    "_version",
     "__empty__",
     "__no_registration__",
 }
@@ -183,6 +304,9 @@ class Item:
     notes: list[dict]
     category: ItemCategory
     uuid: str
+    _version: int
+
+    __slots__ = ("_properties", "_notes", "_category", "_uuid_int", "_version", "__weakref__")
 
     def __init__(
         self, _category: ItemCategory, __empty__=False, __no_registration__=False, **props
@@ -204,6 +328,7 @@ class Item:
         if __empty__:
             for prop in _category.properties:
                 self._properties[prop] = prop("")
+                self._properties[prop].register_item(self)
         else:
             self._properties = {}
             for k, v in props.items():
@@ -238,7 +363,16 @@ class Item:
             self._category.register_item(self)
 
         self._notes = {}
-        self._uuid = str(uuid.uuid4())
+        self._uuid_int = new_uuid()
+        self._version = 0
+
+    @property
+    def _uuid(self) -> str:
+        return uuid_to_str(self._uuid_int)
+
+    @_uuid.setter
+    def _uuid(self, value: str) -> None:
+        self._uuid_int = uuid_to_int(value)
 
     def __repr__(self) -> str:
         properties = ""
@@ -249,20 +383,28 @@ class Item:
         return f"Item(type={self._category.name}{properties})"
 
     def __getattr__(self, key) -> ItemProperty:
-        prop_type = ItemProperty.get(key)
-        for prop_type, prop in self._properties.items():
-            if isinstance(prop, prop_type):
-                return prop
-        raise AttributeError(f"No attribute named {key!r}")
+        """Returns the property named key of the item, e.g. item.id"""
+        # Only called for the names which are not attributes, an unset slot (during __init__)
+        # must not be looked up in the properties
+        if key in Item.__slots__:
+            raise AttributeError(f"No attribute named {key!r}")
+        prop = self._properties.get(self._category.property_type(key))
+        if prop is None:
+            # A property which is not (or no longer) a property of the category
+            prop = self._properties.get(ItemProperty.get(key))
+            if prop is None:
+                raise AttributeError(f"No attribute named {key!r}")
+        return prop
 
     def unregister_item(self) -> None:
+        """
+        Removes the item from the registries of its properties and category, called by
+        ItemManager when the item is deleted
+        """
         for prop_type, prop in self._properties.items():
             prop.unregister_item(self)
         self._category.unregister_item(self)
 
-    def __del__(self) -> None:
-        self.unregister_item()
-
     def add_note(self, text, timestamp=None) -> None:
         """Adds a note / remark to the item"""
         if not timestamp:
@@ -282,6 +424,7 @@ class Item:
         if property in self._properties and not erase:
             return
         self._properties[property] = property("")
+        self._properties[property].register_item(self)
 
     def remove_property(self, property: type, ignore_mandatory=False) -> None:
         """Removes a property from the item.
@@ -294,7 +437,7 @@ class Item:
             if True, removes property even if mandatory"""
         if property in self._properties:
             if not self._properties[property].mandatory or ignore_mandatory:
-                self._properties.pop(property, None)
+                self._properties.pop(property).unregister_item(self)
             else:
                 raise KeyError(
                     f"Cannot remove the property '{property.name}' because it is mandatory"
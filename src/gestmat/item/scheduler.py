@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+#
+# MatGest
+
+import threading
+from typing import Callable, Optional
+
+
+class SaveScheduler:
+    save_fct: Callable[[], bool]
+    last_result: bool
+
+    def __init__(self, save_fct: Callable[[], bool]) -> None:
+        """
+        Runs save_fct on a dedicated writer thread.
+
+        Save requests made while a save is running are coalesced: however many requests
+        arrive in the meantime, only one more save is performed afterwards.
+        """
+        self.save_fct = save_fct
+        self.last_result = True
+        self._condition = threading.Condition()
+        self._requested = 0
+        self._done = 0
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="gestmat-save", daemon=True)
+        self._thread.start()
+
+    def request(self) -> int:
+        """Asks for a save, returns the number of the request"""
+        with self._condition:
+            self._requested += 1
+            self._condition.notify_all()
+            return self._requested
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Waits until every request made before the call has been written
+
+        Returns False if the timeout expired or if the last save failed
+        """
+        with self._condition:
+            target = self._requested
+            if not self._condition.wait_for(lambda: self._done >= target, timeout):
+                return False
+            return self.last_result
+
+    def stop(self, timeout: Optional[float] = None) -> bool:
+        """Writes the pending requests and stops the writer thread"""
+        result = self.flush(timeout)
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        self._thread.join(timeout)
+        return result
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._requested > self._done or not self._running)
+                if self._requested <= self._done:
+                    return
+                target = self._requested
+
+            try:
+                result = self.save_fct()
+            except Exception:
+                result = False
+
+            with self._condition:
+                self.last_result = result
+                self._done = target
+                self._condition.notify_all()
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+#
+# MatGest
+
+from typing import Any, Callable, Iterable
+
+from ..util import strip_accents
+
+
+def search_key(texts: Iterable[Any]) -> str:
+    """Returns the texts joined in the form used by the searches (lower case, without accents)"""
+    return strip_accents(" ".join(str(text) for text in texts)).lower()
+
+
+def _version(obj: Any) -> Any:
+    return obj._version
+
+
+def loan_texts(loan) -> tuple:
+    """Texts of a loan matched by the searches: dates, category, person and item properties"""
+    person = loan.person
+    return (
+        loan.date.strftime("%Y/%m/%d"),
+        loan.item._category.description,
+        person.surname,
+        person.name,
+        person.birthday.strftime("%Y/%m/%d"),
+        person.place,
+        person.note,
+        *(prop.value for prop in loan.item._properties.values()),
+    )
+
+
+def loan_version(loan) -> tuple:
+    # The text of a loan also changes with its person, its item and the category of the item
+    return (loan._version, loan.person._version, loan.item._version, loan.item._category._version)
+
+
+def person_texts(person) -> tuple:
+    return (
+        person.surname,
+        person.name,
+        person.birthday.strftime("%Y/%m/%d"),
+        person.place,
+        person.note,
+    )
+
+
+class SearchKeys:
+    def __init__(
+        self, texts: Callable[[Any], Iterable[Any]], version: Callable[[Any], Any] = _version
+    ) -> None:
+        """
+        Search keys (see search_key) of objects, kept along with the version of the object
+
+        The key of an object is computed the first time it is searched, and again only after
+        the object was edited: ItemManager increments the _version of the objects it changes.
+
+        Arguments
+        ---------
+        texts : Callable
+            returns the texts of an object matched by the searches
+        version : Callable
+            returns the version of an object (its _version by default)
+        """
+        self.texts = texts
+        self.version = version
+        self._keys = dict()
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def get(self, obj: Any) -> str:
+        version = self.version(obj)
+        entry = self._keys.get(obj)
+        if entry is None or entry[0] != version:
+            entry = (version, search_key(self.texts(obj)))
+            self._keys[obj] = entry
+        return entry[1]
+
+    def discard(self, obj: Any) -> None:
+        self._keys.pop(obj, None)
+
+    def clear(self) -> None:
+        self._keys.clear()
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+#
+# MatGest
+
+from typing import Optional
+
+from ..util import to_date
+from .manager import ItemManager, Item, Person, ItemLoan
+
+
+def date_to_str(date) -> str:
+    """Converts a date to the 'YYYY/MM/DD' representation used in the save files"""
+    if not date:
+        return ""
+    return date.strftime("%Y/%m/%d")
+
+
+def to_optional_date(date: str):
+    """Converts an optional date of the save files, '' (or a missing date) gives None"""
+    return to_date(date) if date else None
+
+
+def check_and_load(key_dic: dict, to_check: dict):
+    """Overwrites the values of key_dic with the values of to_check sharing the same key"""
+    for key, value in key_dic.items():
+        if key in to_check:
+            key_dic[key] = to_check[key]
+
+
+def item_to_dict(item: Item) -> dict:
+    return {
+        "properties": [{prop.special_name: prop.value} for prop in item._properties.values()],
+        "notes": dict(item._notes),
+        "category": item._category.name,
+    }
+
+
+def person_to_dict(person: Person) -> dict:
+    return {
+        "name": person.name,
+        "surname": person.surname,
+        "birthday": date_to_str(person.birthday),
+        "place": person.place,
+        "note": person.note,
+        "loans": [loan.uuid for loan in person.loans],
+    }
+
+
+def loan_to_dict(loan: ItemLoan) -> dict:
+    return {
+        "uuid": loan.uuid,
+        "person": loan.person.uuid,
+        "date": date_to_str(loan.date),
+        "loan_back": date_to_str(loan.loan_back),
+        "due_date": date_to_str(loan.due_date),
+        "note": loan.note,
+        "timestamp": loan.timestamp,
+    }
+
+
+def item_from_dict(manager: ItemManager, ID: str, item: dict) -> Optional[Item]:
+    """
+    Creates an (unregistered) item from its dict representation
+
+    Returns None if the category of the item does not exist in the manager
+    """
+    kwargs = dict(properties=[], notes={}, category="")
+
+    if "category" not in item:
+        return None
+    check_and_load(kwargs, item)
+    if kwargs["category"] not in manager.categories:
+        return None
+
+    cat = manager.categories[kwargs["category"]]
+
+    # The property types are looked up in the category (and not in the global registry of
+    # ItemProperty), properties which do not belong to the category are ignored
+    cat_properties = {prop.special_name.lower(): prop for prop in cat.properties}
+    new_item = Item(cat, __empty__=True, __no_registration__=True)
+    for prop in kwargs["properties"]:
+        name, value = list(prop.items())[0]
+        prop_type = cat_properties.get(name.lower())
+        if prop_type is None:
+            continue
+        new_item._properties[prop_type] = prop_type(value)
+        new_item._properties[prop_type].register_item(new_item)
+
+    new_item._notes = kwargs["notes"] or {}
+    new_item._uuid = ID
+    return new_item
+
+
+def person_from_dict(ID: str, person: dict) -> tuple[Person, list[str]]:
+    """Creates a person from its dict representation, and returns it with its loans uuids"""
+    kwargs = dict(name="", surname="", birthday="", place="", note="", loans=[])
+    check_and_load(kwargs, person)
+
+    kwargs["birthday"] = to_date(kwargs["birthday"])
+
+    loans = kwargs["loans"]
+    del kwargs["loans"]
+    new_person = Person(**kwargs)
+    new_person.uuid = ID
+    return new_person, loans
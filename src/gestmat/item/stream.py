@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+#
+# MatGest
+
+import json
+from typing import Any, Iterator, TextIO
+
+_whitespace = " \t\n\r"
+
+
+class _JsonReader:
+    def __init__(self, fin: TextIO, chunk_size: int) -> None:
+        """Reads JSON tokens and values from a text stream, keeping only a small buffer in memory"""
+        self.fin = fin
+        self.chunk_size = chunk_size
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self) -> bool:
+        """Reads the next chunk of the stream, returns False at the end of the stream"""
+        if self.eof:
+            return False
+        chunk = self.fin.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        # Drop what has already been consumed
+        self.buffer = self.buffer[self.pos :] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Returns the next non-whitespace character without consuming it ("" at the end)"""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in _whitespace:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, char: str) -> None:
+        if self.peek() != char:
+            raise ValueError(f"Expected {char!r} at position {self.pos} of the JSON stream")
+        self.pos += 1
+
+    def value(self) -> Any:
+        """Decodes the next JSON value"""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # A number at the end of the buffer may continue in the next chunk
+            if end == len(self.buffer) and self._fill():
+                continue
+            self.pos = end
+            return value
+
+
+def iter_object(reader: _JsonReader) -> Iterator[tuple[str, Any]]:
+    """Yields the (key, value) pairs of the JSON object starting at the position of the reader"""
+    reader.expect("{")
+    if reader.peek() == "}":
+        reader.pos += 1
+        return
+    while True:
+        key = reader.value()
+        reader.expect(":")
+        yield key, reader.value()
+        if reader.peek() == ",":
+            reader.pos += 1
+        else:
+            reader.expect("}")
+            return
+
+
+def iter_sections(fin: TextIO, chunk_size: int = 1 << 16) -> Iterator[tuple[str, Iterator]]:
+    """
+    Incrementally parses a JSON object of objects, such as a save file
+
+    Yields (section, entries) for each key of the top-level object, where entries is an iterator
+    over the (key, value) pairs of the section. Only one entry is decoded at a time. Sections
+    which are not JSON objects yield an empty iterator. The entries of a section must be consumed
+    before the next section is requested, otherwise they are skipped.
+    """
+    reader = _JsonReader(fin, chunk_size)
+    reader.expect("{")
+    if reader.peek() == "}":
+        return
+    while True:
+        section = reader.value()
+        reader.expect(":")
+        if reader.peek() == "{":
+            entries = iter_object(reader)
+            yield section, entries
+            for _ in entries:
+                pass
+        else:
+            reader.value()
+            yield section, iter(())
+
+        if reader.peek() == ",":
+            reader.pos += 1
+        else:
+            reader.expect("}")
+            return
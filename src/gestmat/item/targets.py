@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+#
+# MatGest
+
+import os
+from typing import Callable
+
+
+def write_atomic(file: str, data: bytes) -> None:
+    """
+    Writes data to file so that, whatever happens (crash, power loss), file holds either its
+    previous content or data: the data is written and synced to a temporary file, which then
+    replaces file.
+    """
+    tmp_file = f"{file}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_file, "wb") as fout:
+            fout.write(data)
+            fout.flush()
+            os.fsync(fout.fileno())
+        os.replace(tmp_file, file)
+    except BaseException:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+        raise
+    sync_dir(os.path.dirname(file))
+
+
+def sync_dir(path: str) -> None:
+    """Makes the creation or renaming of the files of a folder durable (no-op on Windows)"""
+    try:
+        fd = os.open(path or ".", os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class SaveTarget:
+    name: str
+
+    def __init__(self, name: str) -> None:
+        """Destination of the save files. Subclasses implement write()."""
+        self.name = name
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({self.name!r})"
+
+    def write(self, file_name: str, data: bytes) -> None:
+        """Writes the (already compressed) data of a save under file_name. Raises on failure."""
+        raise NotImplementedError
+
+    def write_snapshot(self, file_name: str, mega_dict: dict, encoded: Callable[[], bytes]) -> None:
+        """
+        Writes a snapshot under file_name. By default, writes the encoded snapshot returned by
+        encoded() (which is only computed once for all the targets). Targets storing the
+        snapshots in their own way override this method.
+        """
+        self.write(file_name, encoded())
+
+
+class DirectoryTarget(SaveTarget):
+    path: str
+
+    def __init__(self, path: str) -> None:
+        """Writes the save files (atomically) in a folder, created if needed"""
+        super().__init__(path)
+        self.path = path
+
+    def write(self, file_name: str, data: bytes) -> None:
+        os.makedirs(self.path, exist_ok=True)
+        write_atomic(os.path.join(self.path, file_name), data)
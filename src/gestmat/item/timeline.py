@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+#
+# MatGest
+
+import bisect
+import datetime
+import itertools
+from typing import Any, Optional
+
+from ..util import ProtectedDatetime
+
+LOAN_START = "start"
+LOAN_RETURN = "return"
+
+
+def date_key(date: Any) -> Optional[int]:
+    """Returns the ordinal of a date (datetime, date or ProtectedDatetime), None if not a date"""
+    if isinstance(date, ProtectedDatetime):
+        date = date.date
+    if isinstance(date, datetime.date):
+        return date.toordinal()
+    return None
+
+
+class LoanTimeline:
+    def __init__(self) -> None:
+        """
+        Start and return dates of the loans, in chronological order
+
+        Events are appended as they come, and the list is only sorted when it is queried after
+        events arrived out of order (e.g. when a save is loaded), so that building the timeline
+        stays linear.
+        """
+        self.events = []
+        self._keys = []
+        self._sorted = True
+        self._counter = itertools.count()
+
+    def add(self, date: Any, kind: str, loan) -> None:
+        key = date_key(date)
+        if key is None:
+            return
+        # The counter keeps the events of a same day in their order of arrival
+        event = (key, next(self._counter), kind, loan)
+        if self._sorted and self.events and event < self.events[-1]:
+            self._sorted = False
+        self.events.append(event)
+        if self._sorted:
+            self._keys.append(key)
+
+    def _sort(self) -> None:
+        if not self._sorted:
+            self.events.sort(key=lambda event: event[:2])
+            self._keys = [event[0] for event in self.events]
+            self._sorted = True
+
+    def between(self, start: Any = None, end: Any = None, kind: Optional[str] = None) -> list:
+        """
+        Returns the (date, kind, loan) events between start and end (included, None for no
+        bound), optionally only the events of one kind (LOAN_START or LOAN_RETURN)
+        """
+        self._sort()
+        start_key, end_key = date_key(start), date_key(end)
+        first = 0 if start_key is None else bisect.bisect_left(self._keys, start_key)
+        last = len(self._keys) if end_key is None else bisect.bisect_right(self._keys, end_key)
+        return [
+            (datetime.date.fromordinal(key), event_kind, loan)
+            for key, _, event_kind, loan in self.events[first:last]
+            if kind is None or event_kind == kind
+        ]
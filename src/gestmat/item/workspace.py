@@ -1,9 +1,21 @@
 import os
 import datetime
-import json
 import gzip
-from ..util import Singleton, to_date
-from .manager import ItemManager, Item, Person, ItemLoan, ItemCategory, ItemProperty
+import uuid
+from typing import Optional
+from ..util import Singleton
+from .manager import ItemManager
+from .representation import property_classes, restore_property_classes
+from .serialization import item_to_dict, person_to_dict, loan_to_dict
+from .journal import Journal, replay
+from .loader import SnapshotBuilder
+from .stream import iter_sections
+from .scheduler import SaveScheduler
+from .fragments import FragmentCache
+from .targets import SaveTarget, DirectoryTarget
+from .backup import BackupStore, is_manifest, read_manifest
+from .database import SQLiteStore
+from . import binary
 import pathlib
 
 
@@ -11,10 +23,61 @@ class Workspace(metaclass=Singleton):
     def __init__(self) -> None:
         pass
 
-    def init(self, manager: ItemManager, path: str = "") -> None:
-        self.current_manager = manager
+    def init(
+        self,
+        manager: ItemManager,
+        path: str = "",
+        journal: bool = False,
+        compact_every: int = 500,
+        background: bool = False,
+        database: bool = False,
+        snapshot_format: str = "json",
+        backup_store: bool = False,
+        retention: Optional[dict] = None,
+    ) -> None:
+        """
+        Initializes the workspace
+
+        Arguments
+        ---------
+        manager : ItemManager
+            manager to save
+        path : str
+            folder in which the 'sauvegardes' folder is located
+        journal : bool
+            if True, save() appends the mutations made since the last save to a journal file
+            instead of writing a full snapshot each time. The journal is compacted into a new
+            snapshot every compact_every records, at the first save of the day, or when the
+            properties or categories are modified.
+        background : bool
+            if True, save() only schedules the save, which is written by a dedicated thread.
+            Use flush() to wait for the pending saves and close() before exiting.
+        database : bool
+            if True, the data is stored in a SQLite database (sauvegardes/gestmat.sqlite3) in
+            which every mutation is written as soon as it is made. The JSON snapshots are then
+            only backups, written at the first save of each day.
+        snapshot_format : str
+            "json" (gzip JSON, *_save.json) or "binary" (see binary.py, *_save.gms). Both
+            formats can be loaded whatever the format chosen for the saves.
+        backup_store : bool
+            if True, the snapshots are kept in deduplicated backup stores (see BackupStore), in
+            'sauvegardes/store' and in the backup folder, instead of one full file per day
+        retention : dict
+            retention policy of the backup stores (keep_daily, keep_monthly, keep_yearly)
+        """
+        self.current_manager = None
         self.path = path
         self.valid = True
+        if snapshot_format not in ("json", "binary"):
+            raise ValueError(f"Unknown snapshot format {snapshot_format!r}")
+        self.snapshot_format = snapshot_format
+        self.extension = ".gms" if snapshot_format == "binary" else ".json"
+
+        self.journal = None
+        if journal:
+            self.journal = Journal(
+                os.path.join(path, "sauvegardes", "journal.jsonl"), compact_every
+            )
 
         if not os.path.exists(os.path.join(path, "sauvegardes")):
             try:
@@ -24,256 +87,425 @@ class Workspace(metaclass=Singleton):
             except:
                 self.valid = False
 
-    def save(self) -> None:
+        # The first target is the main one, from which the saves are loaded
+        folders = [
+            os.path.join(path, "sauvegardes"),
+            os.path.join(pathlib.Path.home(), "Documents", "sauvegardes_gestion_mat"),
+        ]
+        if backup_store:
+            retention = retention or dict()
+            self.targets = [
+                BackupStore(os.path.join(folder, "store"), **retention) for folder in folders
+            ]
+        else:
+            self.targets = [DirectoryTarget(folder) for folder in folders]
+        self.last_errors = dict()
+
+        self.scheduler = None
+        if background:
+            self.scheduler = SaveScheduler(self._save)
+
+        self.database = None
+        self.snapshot_name = None
+        self.fragments = FragmentCache()
+        if database and self.valid:
+            self.database = SQLiteStore(os.path.join(path, "sauvegardes", "gestmat.sqlite3"))
+
+        self.set_manager(manager)
+
+    def set_manager(
+        self,
+        manager: ItemManager,
+        base: Optional[str] = None,
+        count: int = 0,
+        archive_name: Optional[str] = None,
+    ):
+        """
+        Sets the manager to save. The journal (if any) starts recording its mutations.
+
+        base and count describe the journal file (see Journal.attach), archive_name is the name
+        of the archive file of the manager, if it has been loaded from a save.
+        """
+        self.current_manager = manager
+        self.archive_name = archive_name
+        self.fragments.clear()
+        self._structure_version = None
+        self._pending_versions = None
+        self._saved_versions = None
+        if self.journal:
+            self.journal.attach(manager, base, count)
+        if self.database:
+            self.database.attach(manager)
+
+    def add_target(self, target: SaveTarget) -> None:
+        """Adds a destination to which the snapshots are written"""
+        self.targets.append(target)
+
+    def remove_target(self, target: SaveTarget) -> None:
+        if target in self.targets:
+            self.targets.remove(target)
+
+    def save(self, wait: bool = False) -> bool:
+        """
+        Saves the current manager
+
+        In background mode, the save is only scheduled (and returns True) unless wait is True.
+        The targets which could not be written are listed with their error in last_errors.
+        """
         if not self.valid:
-            return
+            return False
+
+        if self.scheduler:
+            self.scheduler.request()
+            if wait:
+                return self.flush()
+            return True
+        return self._save()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Waits until the scheduled saves are written, returns False if the last one failed"""
+        if not self.scheduler:
+            return True
+        return self.scheduler.flush(timeout)
+
+    def close(self, timeout: Optional[float] = None) -> bool:
+        """Writes the scheduled saves and stops the writer thread"""
+        result = True
+        if self.scheduler:
+            scheduler = self.scheduler
+            self.scheduler = None
+            result = scheduler.stop(timeout)
+        if self.database:
+            self.database.close()
+            self.database = None
+        return result
+
+    def _save(self) -> bool:
+        # Only the collection of the data needs the manager to stay still, the encoding and the
+        # writing are done once the lock is released
+        with self.current_manager.lock:
+            save_name, mega_dict, archive_dict, records = self._prepare()
+        return self._write(save_name, mega_dict, archive_dict, records)
+
+    def _prepare(self) -> tuple[str, Optional[dict], Optional[dict], list[dict]]:
+        """
+        Collects what needs to be written: either the journal records made since the last save,
+        or a full snapshot of the manager. The archive (retired items, persons and loans) is
+        only collected if it changed since it was last written.
+        """
+        save_name = f"{datetime.datetime.today().strftime('%Y_%m_%d')}_save{self.extension}"
+        manager = self.current_manager
+        if self.journal:
+            compact = self.journal.needs_compaction(save_name)
+            records = self.journal.take()
+            if not compact:
+                return save_name, None, None, records
+            self.journal.needs_snapshot = False
+        elif self.snapshot_name == save_name and (
+            self.database
+            or (self._saved_versions == manager.versions and not manager.archive_dirty)
+        ):
+            # Nothing changed since today's snapshot was written (with a database, the database
+            # already holds every mutation and the snapshot is only a daily backup)
+            return save_name, None, None, []
+
+        archive_dict = None
+        archive_name = self.archive_name
+        if manager.archive_dirty or archive_name is None:
+            # The archive file is rewritten as a whole, the archived objects must be loaded
+            if manager.load_archive():
+                archive_dict = self._archive_snapshot()
+                archive_name = save_name.replace("_save", "_archive")
+                manager.archive_dirty = False
+
+        self._pending_versions = dict(manager.versions)
+        mega_dict = self._snapshot()
+        mega_dict["archive"] = {"file": archive_name} if archive_name else {}
+        archived_persons = self._archived_persons()
+        if archived_persons is not None:
+            mega_dict["archived_persons"] = archived_persons
+        # Today's snapshot is rewritten at each compaction of the journal, the generation tells
+        # the journal which of them its records apply to
+        mega_dict["generation"] = {"id": uuid.uuid4().hex}
+        return save_name, mega_dict, archive_dict, []
+
+    def _snapshot(self) -> dict:
+        """
+        Returns the dict representation of the active part of the manager
+
+        The parts of the manager which did not change since the previous snapshot are taken
+        from the fragment cache instead of being serialized again.
+        """
+        manager = self.current_manager
+        versions = manager.versions
+        if versions["structure"] != self._structure_version:
+            # The properties of all the items may have changed
+            self.fragments.clear()
+            self._structure_version = versions["structure"]
 
         mega_dict = dict()
 
-        mega_dict["properties"] = dict()
-        for prop in self.current_manager.properties.keys():
-            mega_dict["properties"][prop.special_name] = {
+        mega_dict["properties"] = self.fragments.section(
+            "properties",
+            versions["structure"],
+            lambda: ((prop.special_name, None, prop) for prop in manager.properties.keys()),
+            lambda prop: {
                 "name": prop.name,
                 "unit": prop.unit,
                 "special_name": prop.special_name,
                 "name": prop.name,
-                "select": prop.select,
+                "select": list(prop.select),
                 "no_edit": prop.no_edit,
                 "mandatory": prop.mandatory,
-            }
-
-        mega_dict["categories"] = dict()
-        for name, category in self.current_manager.categories.items():
-            mega_dict["categories"][name] = {
+            },
+        )
+
+        mega_dict["categories"] = self.fragments.section(
+            "categories",
+            (versions["structure"], versions["items"]),
+            lambda: (
+                (name, versions["items"], category)
+                for name, category in manager.categories.items()
+            ),
+            lambda category: {
                 "registered_items": [item._uuid for item in category.registered_items],
                 "properties": [prop.special_name for prop in category.properties],
                 "properties_order": [prop.name for prop in category.properties_order],
                 "description": category.description,
-            }
-
-        def _get_item_dict_repr(item: Item):
-            return {
-                "properties": [
-                    {prop.special_name: prop.value} for prop in item._properties.values()
-                ],
-                "notes": item._notes,
-                "category": item._category.name,
-            }
-
-        def _get_person_dict_repr(person: Person):
-            return {
-                "name": person.name,
-                "surname": person.surname,
-                "birthday": person.birthday.strftime("%Y/%m/%d"),
-                "place": person.place,
-                "note": person.note,
-                "loans": [loan.uuid for loan in person.loans],
-            }
-
-        def _get_loan_dict_repr(loan: ItemLoan):
-            return {
-                "person": loan.person.uuid,
-                "date": loan.date.strftime("%Y/%m/%d"),
-                "note": loan.note,
-                "timestamp": loan.timestamp,
-            }
-
-        mega_dict["items"] = dict()
-        for item in self.current_manager.items:
-            mega_dict["items"][item._uuid] = _get_item_dict_repr(item)
+            },
+        )
+
+        mega_dict["items"] = self.fragments.section(
+            "items",
+            versions["items"],
+            lambda: ((item._uuid, item._version, item) for item in manager.items),
+            item_to_dict,
+        )
+
+        mega_dict["persons"] = self.fragments.section(
+            "persons",
+            versions["persons"],
+            lambda: ((person.uuid, person._version, person) for person in manager.persons),
+            person_to_dict,
+        )
+
+        mega_dict["loans"] = self.fragments.section(
+            "loans",
+            versions["loans"],
+            lambda: (
+                (item._uuid, frozenset((loan.uuid, loan._version) for loan in loans), loans)
+                for item, loans in manager.loans.items()
+            ),
+            lambda loans: [loan_to_dict(loan) for loan in loans],
+        )
+
+        return mega_dict
+
+    def _archived_persons(self) -> Optional[dict]:
+        """
+        Returns the keys of the retired persons (see ItemManager.archived_person_keys), by uuid,
+        or None if the archive is not loaded and its persons are unknown
+        """
+        manager = self.current_manager
+        keys = dict()
+        if not manager.archive_loaded:
+            if manager.archived_person_keys is None:
+                return None
+            keys.update((ID, key) for key, ID in manager.archived_person_keys.items())
+        for person in manager._retired_persons:
+            key = manager.person_registry.key(person)
+            if key is not None:
+                keys[person.uuid] = key
+        return keys
+
+    def _archive_snapshot(self) -> dict:
+        """Returns the dict representation of the retired items, persons and loans"""
+        mega_dict = dict()
 
         mega_dict["retired_items"] = dict()
         for item in self.current_manager.retired_items:
-            mega_dict["retired_items"][item._uuid] = _get_item_dict_repr(item)
-
-        mega_dict["persons"] = dict()
-        for person in self.current_manager.persons:
-            mega_dict["persons"][person.uuid] = _get_person_dict_repr(person)
+            mega_dict["retired_items"][item._uuid] = item_to_dict(item)
 
         mega_dict["retired_persons"] = dict()
         for person in self.current_manager.retired_persons:
-            mega_dict[person.uuid] = _get_person_dict_repr(person)
-
-        mega_dict["loans"] = dict()
-        for item, loans in self.current_manager.loans.items():
-            mega_dict["loans"][item._uuid] = [_get_loan_dict_repr(loan) for loan in loans]
+            mega_dict["retired_persons"][person.uuid] = person_to_dict(person)
 
         mega_dict["retired_loans"] = dict()
         for item, loans in self.current_manager.retired_loans.items():
-            mega_dict["retired_loans"][item._uuid] = [_get_loan_dict_repr(loan) for loan in loans]
-
-        name = f"{datetime.datetime.today().strftime('%Y_%m_%d')}_save.json"
-        json_str = json.dumps(mega_dict)
-        json_bytes = json_str.encode("utf-8")
-
-        desktop = pathlib.Path.home()
-        desktop_save = os.path.join(desktop, "Documents", "sauvegardes_gestion_mat")
-        try:
-            os.mkdir(desktop_save)
-        except:
-            pass
-
-        try:
-            with gzip.open(os.path.join(self.path, "sauvegardes", name), "w") as fout:
-                fout.write(json_bytes)
-            with gzip.open(os.path.join(desktop_save, name), "w") as fout:
-                fout.write(json_bytes)
-        except:
-            return False
-        return True
+            mega_dict["retired_loans"][item._uuid] = [loan_to_dict(loan) for loan in loans]
+
+        return mega_dict
+
+    def _write(
+        self,
+        save_name: str,
+        mega_dict: Optional[dict],
+        archive_dict: Optional[dict],
+        records: list[dict],
+    ) -> bool:
+        if mega_dict is None:
+            if self.journal:
+                return self.journal.append(records)
+            return True
+
+        errors = dict()
+        if archive_dict is not None:
+            # The archive is written first, a snapshot must never refer to a missing archive
+            archive_name = mega_dict["archive"]["file"]
+            errors = self._write_to_targets(archive_name, archive_dict)
+            if self.targets and self.targets[0].name in errors:
+                self.current_manager.archive_dirty = True
+                self.last_errors = errors
+                if self.journal:
+                    self.journal.needs_snapshot = True
+                return False
+            self.archive_name = archive_name
+
+        errors.update(self._write_to_targets(save_name, mega_dict))
+        self.last_errors = errors
+        if self.targets and self.targets[0].name not in errors:
+            self.snapshot_name = save_name
+            self._saved_versions = self._pending_versions
+
+        # The journal lives next to the main target, it can only be reset if the main target
+        # holds the new snapshot
+        if self.journal:
+            if self.targets and self.targets[0].name not in errors:
+                self.journal.reset(save_name, mega_dict["generation"]["id"])
+            else:
+                self.journal.needs_snapshot = True
+
+        return not errors
+
+    def _write_to_targets(self, file_name: str, mega_dict: dict) -> dict[str, Exception]:
+        """Writes mega_dict in every target, returns the errors of the targets which failed"""
+        data = None
+
+        def encoded() -> bytes:
+            # The data is compressed once and the same bytes are written to every target
+            nonlocal data
+            if data is None:
+                if self.snapshot_format == "binary":
+                    data = binary.encode(mega_dict)
+                else:
+                    data = gzip.compress(self.fragments.to_json(mega_dict).encode("utf-8"))
+            return data
+
+        errors = dict()
+        for target in list(self.targets):
+            try:
+                target.write_snapshot(file_name, mega_dict, encoded)
+            except Exception as e:
+                errors[target.name] = e
+        return errors
 
     def load(self, file) -> ItemManager:
+        """
+        Loads a save file. The file is parsed incrementally: the objects are built section by
+        section while the file is read, without decoding the whole file in memory first.
+        """
+        # The properties defined by a save which cannot be loaded are forgotten, the save loaded
+        # instead may define them differently
+        registries = property_classes()
+        builder = SnapshotBuilder()
         try:
-            with gzip.open(file, "r") as fin:
-                json_bytes = fin.read()
-                json_dict = json.loads(json_bytes.decode("utf-8"))
+            for section, entries in self._read_sections(file):
+                builder.feed(section, entries)
+            manager = builder.finish()
         except:
+            restore_property_classes(registries)
             return False, ItemManager()
 
-        def _check_and_load(key_dic: dict, to_check: dict):
-            for key, value in key_dic.items():
-                if key in to_check:
-                    key_dic[key] = to_check[key]
-
-        manager = ItemManager()
-
-        properties = dict()
-        if "properties" in json_dict and isinstance(json_dict["properties"], dict):
-            for name, prop in json_dict["properties"].items():
-                kwargs = dict(
-                    name="", unit="", value_type=str, select=[], no_edit=False, mandatory=False
-                )
-
-                if "name" not in prop:
-                    continue
-                _check_and_load(kwargs, prop)
-                properties[name] = manager.create_property(**kwargs)
-
-        categories = dict()
-        if "categories" in json_dict and isinstance(json_dict["categories"], dict):
-            for name, cat in json_dict["categories"].items():
-                kwargs = dict(name=name, description="", properties=[], properties_order=[])
-
-                _check_and_load(kwargs, cat)
-                manager.add_category(**kwargs)
-
-                categories[name] = cat
-
-        def _make_items(items: dict[str, dict]):
-            item_dict = dict()
-            for ID, item in items.items():
-                kwargs = dict(properties=[], notes="", category="")
-
-                if "category" not in item:
-                    continue
-                _check_and_load(kwargs, item)
-                if kwargs["category"] not in manager.categories:
-                    continue
-
-                cat = manager.categories[kwargs["category"]]
-
-                # Check if all indicated properties are valid
-                props_kwargs = dict()
-                for prop in kwargs["properties"]:
-                    name, value = list(prop.items())[0]
-                    if name not in properties:
-                        continue
-                    props_kwargs[name] = value
-
-                item_dict[ID] = Item(cat, __no_registration__=True, **props_kwargs)
-                item_dict[ID].notes = kwargs["notes"]
-            return item_dict
-
-        items = {}
-        if "items" in json_dict and isinstance(json_dict["items"], dict):
-            items = _make_items(json_dict["items"])
-            for item in items.values():
-                item._category.register_item(item)
-                manager.add_item(item)
-
-        retired_items = {}
-        if "retired_items" in json_dict and isinstance(json_dict["retired_items"], dict):
-            retired_items = _make_items(json_dict["retired_items"])
-            manager.retired_items = set(retired_items.values())
-
-        def _make_persons(persons: dict[str, dict]):
-            persons_ret = dict()
-            for ID, person in persons.items():
-                kwargs = dict(name="", surname="", birthday="", place="", note="", loans=[])
-                _check_and_load(kwargs, person)
-
-                kwargs["birthday"] = to_date(kwargs["birthday"])
-
-                loans = kwargs["loans"]
-                del kwargs["loans"]
-                persons_ret[ID] = (Person(**kwargs), loans)
-            return persons_ret
-
-        persons = dict()
-        if "persons" in json_dict and isinstance(json_dict["persons"], dict):
-            persons = _make_persons(json_dict["persons"])
-
-        retired_persons = dict()
-        if "retired_persons" in json_dict and isinstance(json_dict["retired_persons"], dict):
-            retired_persons = _make_persons(json_dict["retired_persons"])
-
-        def _make_loans(loans: dict[str, dict], persons_dic, item_dic):
-            loan_ret = dict()
-            for item_id, item_loans in loans.items():
-                if item_id not in items:
-                    continue
-                valid_loans = []
-                for loan in item_loans:
-                    kwargs = dict(person="", date="", note="", timestamp=0, item="")
-                    _check_and_load(kwargs, loan)
-                    if kwargs["person"] not in persons_dic:
-                        continue
-                    item = item_dic[item_id]
-                    person = persons_dic[kwargs["person"]][0]
-                    valid_loans.append(
-                        {
-                            "item": item,
-                            "person": person,
-                            "date": to_date(kwargs["date"]),
-                            "note": kwargs["note"],
-                            "timestamp": kwargs["timestamp"],
-                        }
-                    )
-
-                loan_ret[item_id] = valid_loans
-            return loan_ret
-
-        if "loans" in json_dict and isinstance(json_dict["loans"], dict):
-            loans = _make_loans(json_dict["loans"], persons, items)
-
-            to_add = {}
-            for item_id, item_loans in loans.items():
-                for loan in item_loans:
-                    manager.create_loan(**loan)
-
-        if "retired_loans" in json_dict and isinstance(json_dict["loans"], dict):
-            loans = _make_loans(json_dict["retired_loans"], retired_persons, retired_items)
-
-            to_add = {}
-            for item_id, item_loans in loans.items():
-                for loan in item_loans:
-                    to_add[loan["item"]] = ItemLoan(**loan)
-            manager.retired_loans = to_add
-
-        self.current_manager = manager
+        # The archive is only loaded when the retired items, persons or loans are accessed
+        archive_name = builder.archive.get("file")
+        if archive_name:
+            archive_path = os.path.join(os.path.dirname(file), archive_name)
+            if not os.path.exists(archive_path):
+                restore_property_classes(registries)
+                return False, ItemManager()
+            manager.set_archive_loader(lambda manager: self._load_archive(manager, archive_path))
+        manager.archive_dirty = not archive_name
+
+        base, count = None, 0
+        if self.journal:
+            journal_base, generation, records = self.journal.read()
+            # The records are only replayed on the snapshot they were made after: a snapshot
+            # written by a compaction whose journal was not reset already contains them
+            if journal_base == os.path.basename(file) and generation == builder.generation:
+                replay(manager, records)
+                base, count = journal_base, len(records)
+
+        self.set_manager(manager, base, count, archive_name)
 
         return True, self.current_manager
 
+    def _load_archive(self, manager: ItemManager, file: str) -> None:
+        """Adds the retired items, persons and loans of an archive file to manager"""
+        builder = SnapshotBuilder(
+            manager, built=("properties", "categories", "items", "persons", "loans")
+        )
+        for section, entries in self._read_sections(file):
+            builder.feed(section, entries)
+        builder.finish()
+
+    def _read_sections(self, file: str):
+        """Yields the sections of a save file, whatever its format"""
+        if binary.is_binary(file):
+            yield from binary.read_file(file)
+        elif is_manifest(file):
+            yield from read_manifest(file)
+        else:
+            with gzip.open(file, "rt", encoding="utf-8") as fin:
+                yield from iter_sections(fin)
+
     def new_clean_manager(self) -> ItemManager:
-        self.current_manager = ItemManager()
-        self.current_manager.create_property("N°", no_edit=True)
+        manager = ItemManager()
+        manager.create_property("N°", no_edit=True)
+        if self.database:
+            self.database.import_manager(manager)
+        self.set_manager(manager)
         return self.current_manager
 
-    def loan_most_recent(self):
+    def _save_candidates(self) -> list[str]:
+        """Returns the paths of the saves which can be loaded, the most recent first"""
+        candidates = []
+        if self.targets and isinstance(self.targets[0], BackupStore):
+            store = self.targets[0]
+            latest = store.latest()
+            if latest is not None:
+                candidates.append(latest)
+            saves = [name for name in store.snapshots() if "_save" in name]
+            candidates += [
+                store.manifest_path(name)
+                for name in reversed(saves)
+                if store.manifest_path(name) != latest
+            ]
+
         files = os.listdir(os.path.join(self.path, "sauvegardes"))
-        files.sort()
+        files = [file for file in files if file.endswith(("_save.json", "_save.gms"))]
+        # Sorted by day, a save in the format in use coming after a save of the same day in the
+        # other format
+        files.sort(key=lambda file: (file.rsplit("_save", 1)[0], file.endswith(self.extension)))
+        candidates += [os.path.join(self.path, "sauvegardes", file) for file in reversed(files)]
+        return candidates
+
+    def loan_most_recent(self):
+        if self.database and not self.database.is_empty():
+            self.set_manager(self.database.load())
+            return True, self.current_manager
 
-        if not len(files):
+        candidates = self._save_candidates()
+        if not candidates:
             return True, self.new_clean_manager()
 
-        return self.load(os.path.join(self.path, "sauvegardes", files[-1]))
+        # A save which cannot be read (e.g. damaged by a crash) is skipped, the most recent one
+        # which can be read is loaded
+        for file in candidates:
+            success, manager = self.load(file)
+            if success:
+                break
+
+        if success and self.database:
+            # First start with the database, it is filled with the content of the last save
+            self.database.import_manager(manager)
+        return success, manager
@@ -19,7 +19,8 @@ ressources = Ressources()
 
 
 class UIManager(metaclass=Singleton):
-    panels: dict[str, Panel]
+    panels: dict[str, type[Panel]]
+    instances: dict[str, Panel]
     current_item_manager: ItemManager
     buttons: list[dict]
     current_panel: Panel = None
@@ -48,6 +49,7 @@ class UIManager(metaclass=Singleton):
         self.buttons["management"] = dict(
             label="Gestion", callback=lambda: self.load_panel("management"), **opts
         )
+        self.instances = dict()
         self.uuids = dict()
 
     def init(self) -> None:
@@ -109,20 +111,24 @@ class UIManager(metaclass=Singleton):
 
     def load_panel(self, name: str) -> None:
         dpg.delete_item("nav_menu", children_only=True)
-        dpg.delete_item("panels", children_only=True)
         dpg.add_text("Matériel", parent="nav_menu")
 
-        if self.current_panel:
-            self.current_panel.delete_items()
-
-        self.current_panel = self.panels[name](self.current_item_manager)
-
         for key, value in self.buttons.items():
             if key == name:
                 dpg.add_button(parent="nav_menu", indent=10, **value)
             else:
                 dpg.add_button(parent="nav_menu", **value)
 
-        self.current_panel.main_window("panels")
+        # Each panel is built once in its own group, the other panels are only hidden
+        if name not in self.instances:
+            self.instances[name] = self.panels[name](self.current_item_manager)
+            self.uuids[name] = dpg.add_group(parent="panels")
+
+        for key, panel in self.instances.items():
+            if key != name and panel.visible:
+                panel.hide()
+                dpg.configure_item(self.uuids[key], show=False)
 
-        # dpg.delete_item("panels")
+        self.current_panel = self.instances[name]
+        dpg.configure_item(self.uuids[name], show=True)
+        self.current_panel.show(self.uuids[name])
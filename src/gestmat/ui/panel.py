@@ -2,21 +2,60 @@ import dearpygui.dearpygui as dpg
 
 from ..item.representation import Item
 
+from ..item.events import ManagerEvent
 from ..item.manager import ItemManager
 
 
 class Panel:
     items: list[str]
     manager: ItemManager
+    parent: int = None
+    visible: bool = False
+    stale: bool = False
 
     def __init__(self, manager: ItemManager) -> None:
         self.items = []
         self.manager = manager
+        # The panels are built once, and follow the changes of the manager while they live
+        manager.events.subscribe_batch(self.on_events)
 
     def delete_items(self) -> None:
         for item in self.items:
             dpg.delete_item(item)
 
+    def on_events(self, events: list[ManagerEvent]) -> None:
+        """
+        Called with the events of the mutations of the manager, once per batch (see
+        events.EventBus)
+
+        The panels update the widgets concerned by the change, or set stale when they cannot,
+        so that they are rebuilt the next time they are shown (see refresh)
+        """
+        self.stale = True
+
+    def show(self, parent) -> None:
+        """Shows the panel in parent, building it the first time"""
+        self.visible = True
+        if self.parent is None:
+            self.parent = parent
+            self.stale = False
+            self.main_window(parent)
+        else:
+            self.refresh()
+
+    def hide(self) -> None:
+        self.visible = False
+
+    def refresh(self) -> None:
+        """Rebuilds the panel if changes of the manager could not be applied to its widgets"""
+        if self.stale:
+            self.stale = False
+            self.build_main_window()
+
+    def build_main_window(self) -> None:
+        dpg.delete_item(self.parent, children_only=True)
+        self.main_window(self.parent)
+
     def main_window(self, parent) -> None:
         pass
 
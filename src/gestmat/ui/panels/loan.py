@@ -4,93 +4,97 @@ import dearpygui.dearpygui as dpg
 from ...item.workspace import Workspace
 from ...util import ProtectedDatetime, factory
 from ...item.representation import ItemCategory, Item
+from ...item.events import (
+    ManagerEvent,
+    ManagerChanged,
+    ItemAdded,
+    ItemRetired,
+    LoanCreated,
+    LoanReturned,
+    PersonEdited,
+)
 from ...item.manager import ItemManager, Person
+from ...item.search import person_texts
 from ..panel import Panel
-from ..widgets import DateWidget, error, item_info_box, modal, title, subtitle, help
+from ..widgets import (
+    DateWidget,
+    VirtualTable,
+    error,
+    item_info_box,
+    modal,
+    title,
+    subtitle,
+    help,
+)
 
 workspace = Workspace()
 
+# Number of rows of the tables of persons and items shown at once
+_visible_rows = 12
+
+# Mutations of the items, other than ItemAdded and ItemRetired, changing the tables of items
+_item_ops = ("delete_item", "unretire_item", "set_property")
+
 
 class LoanPanel(Panel):
     def __init__(self, manager: ItemManager) -> None:
         super().__init__(manager)
-        self.memory = dict(objects=dict(), loan_date=datetime.today(), chosen_items=set())
-
-    def generate_height(self, num):
-        return 30 * (num + 1)
-
-    def table_person(self, persons: list[Person], parent):
-        def _sort_callback(sender, sort_specs):
-            if sort_specs is None:
-                return
-
-            headers = {num: i for i, num in enumerate(dpg.get_item_children(sender, 0))}
-
-            rows = dpg.get_item_children(sender, 1)
-
-            # create a list that can be sorted based on first cell
-            # value, keeping track of row and value used to sort
-            sortable_list = []
-            for row in rows:
-                cell = dpg.get_item_children(row, 1)[headers[sort_specs[0][0]]]
-                # cell = dpg.get_item_children(cell, 1)[0]
-                sortable_list.append([row, dpg.get_value(cell)])
-
-            def _sorter(e):
-                return e[1]
-
-            sortable_list.sort(key=_sorter, reverse=sort_specs[0][1] < 0)
+        self.memory = dict(
+            objects=dict(), tables=dict(), loan_date=datetime.today(), chosen_items=set()
+        )
 
-            # create list of just sorted row ids
-            new_order = []
-            for pair in sortable_list:
-                new_order.append(pair[0])
+    def on_events(self, events: list[ManagerEvent]) -> None:
+        # Categories whose tables of items changed, and whether the persons changed
+        categories = set()
+        persons = False
+        for event in events:
+            if isinstance(event, (LoanCreated, LoanReturned)):
+                categories.add(event.loan.item._category)
+                persons |= isinstance(event, LoanCreated)
+            elif isinstance(event, (ItemAdded, ItemRetired)):
+                categories.add(event.item._category)
+                persons |= isinstance(event, ItemRetired)
+            elif isinstance(event, PersonEdited):
+                persons = True
+            elif isinstance(event, ManagerChanged) and event.op in _item_ops:
+                categories.add(event.payload["item"]._category)
+            elif not (isinstance(event, ManagerChanged) and event.op == "set_due_date"):
+                # The properties or categories changed, the tables are built again
+                self.stale = True
+
+        for obj_num, table in list(self.memory["tables"].items()):
+            if table["cat"] in categories:
+                self.update_object_table(obj_num)
+        if persons and self.memory.get("person_table") is not None:
+            self.memory["person_table"].set_rows(
+                self._person_row(person) for person in self.manager.persons
+            )
 
-            dpg.reorder_items(sender, 1, new_order)
+    @staticmethod
+    def _person_row(person: Person) -> tuple:
+        return (person, person_texts(person))
 
-        def _choose_person(s, d, person):
+    def table_person(self, persons: list[Person], parent):
+        def _choose_person(person):
             self.build_loan_info_widget(person)
             dpg.configure_item(self.memory["person_popup"], show=False)
 
-        with dpg.table(
-            header_row=True,
-            row_background=True,
-            borders_innerH=True,
-            borders_outerH=True,
-            borders_innerV=True,
-            borders_outerV=True,
-            resizable=True,
-            scrollY=True,
-            scrollX=True,
-            delay_search=True,
-            parent=parent,
-            sortable=True,
-            callback=_sort_callback,
-            height=self.generate_height(len(persons)),
-            policy=dpg.mvTable_SizingStretchProp,
-        ) as table_id:
-            dpg.add_table_column(label="Action", no_sort=True)
-            dpg.add_table_column(label="Nom")
-            dpg.add_table_column(label="Prénom")
-            dpg.add_table_column(label="Date de naissance")
-            dpg.add_table_column(label="Unité / Chambre")
-            dpg.add_table_column(label="Remarque")
-            for person in persons:
-                with dpg.table_row():
-                    dpg.add_button(
-                        label="Choisir",
-                        callback=_choose_person,
-                        user_data=person,
-                    )
-                    dpg.add_text(person.surname)
-                    dpg.add_text(person.name)
-                    dpg.add_text(person.birthday.strftime("%Y/%m/%d"))
-                    dpg.add_text(person.place)
-                    dpg.add_text(person.note)
+        search_uuid = dpg.add_input_text(label="Rechercher", parent=parent)
+        table = VirtualTable(
+            parent,
+            ["Nom", "Prénom", "Date de naissance", "Unité / Chambre", "Remarque"],
+            visible_rows=_visible_rows,
+            action=("Choisir", _choose_person),
+            search_keys=self.manager.person_search_keys,
+        )
+        dpg.configure_item(search_uuid, callback=lambda s, a, u: table.set_filter(a))
+        table.set_rows(self._person_row(person) for person in persons)
+        self.memory["person_table"] = table
 
     def choose_item(self, obj_num, item: Item):
         tag = self.memory["objects"][obj_num]
         dpg.delete_item(tag, children_only=True)
+        self.memory["tables"].pop(obj_num, None)
         cat = item._category
         props = list(cat.properties_order)
 
@@ -115,43 +119,30 @@ class LoanPanel(Panel):
             with dpg.tooltip(dpg.last_item()) as tooltip_uid:
                 item_info_box(item, tooltip_uid)
 
-    def build_object_table(self, cat: ItemCategory, obj_num, parent, all_items=False) -> None:
-        def _sort_callback(sender, sort_specs):
-            if sort_specs is None:
-                return
-
-            headers = {num: i for i, num in enumerate(dpg.get_item_children(sender, 0))}
-
-            rows = dpg.get_item_children(sender, 1)
-
-            # create a list that can be sorted based on first cell
-            # value, keeping track of row and value used to sort
-            sortable_list = []
-            for row in rows:
-                # print(row)
-                cell = dpg.get_item_children(row, 1)[headers[sort_specs[0][0]]]
-                sortable_list.append([row, dpg.get_value(cell)])
-
-            def _sorter(e):
-                return e[1]
-
-            sortable_list.sort(key=_sorter, reverse=sort_specs[0][1] < 0)
-
-            # create list of just sorted row ids
-            new_order = []
-            for pair in sortable_list:
-                new_order.append(pair[0])
+    def _object_rows(self, cat: ItemCategory, all_items: bool) -> list[tuple]:
+        """Returns the rows of the items of cat which can be chosen for the loan"""
+        available = self.manager.available_items(cat)
+        items = available
+        if all_items:
+            items = available | self.manager.loaned_items(cat)
 
-            dpg.reorder_items(sender, 1, new_order)
+        props = list(cat.properties_order)
+        rows = []
+        for item in items:
+            if item in self.memory["chosen_items"]:
+                continue
+            for prop in props:
+                if not prop in item._properties:
+                    item.add_property(prop)
+            values = tuple(item._properties[prop].value for prop in props)
+            if all_items:
+                values = ("Non" if item in available else "Oui",) + values
+            rows.append((item, values))
+        return rows
 
+    def build_object_table(self, cat: ItemCategory, obj_num, parent, all_items=False) -> None:
         dpg.delete_item(parent, children_only=True)
 
-        items = [
-            item
-            for item in cat.registered_items
-            if not self.manager.is_item_loaned(item) or all_items
-        ]
-
         def _set_items(s, d, u):
             self.build_object_table(cat, obj_num, parent, d)
 
@@ -162,61 +153,42 @@ class LoanPanel(Panel):
             default_value=all_items,
         )
 
-        if items:
-            table_id = dpg.generate_uuid()
-            with dpg.table(
-                header_row=True,
-                row_background=True,
-                borders_innerH=True,
-                borders_outerH=True,
-                borders_innerV=True,
-                borders_outerV=True,
-                resizable=True,
-                scrollY=True,
-                scrollX=True,
-                delay_search=True,
-                parent=parent,
-                sortable=True,
-                callback=_sort_callback,
-                policy=dpg.mvTable_SizingStretchProp,
-                height=self.generate_height(len(items)),
-                tag=table_id,
-            ):
-                props = list(cat.properties_order)
-
-                dpg.add_table_column(
-                    label="Action",
-                    no_sort=True,
-                    width=50,
-                    width_fixed=True,
-                )
-                if all_items:
-                    dpg.add_table_column(
-                        label="Emprunté?", width=70, no_sort=True, width_fixed=True
-                    )
-                for prop in props:
-                    dpg.add_table_column(label=prop.name)
+        # Kept so that the table follows the changes of the items (see on_events)
+        self.memory["tables"][obj_num] = dict(
+            cat=cat, all_items=all_items, parent=parent, table=None
+        )
 
-                for item in items:
-                    if item in self.memory["chosen_items"]:
-                        continue
-                    with dpg.table_row():
-                        dpg.add_button(
-                            label="Choisir",
-                            callback=lambda *args, item=item: self.choose_item(obj_num, item),
-                        )
-                        if all_items:
-                            if self.manager.is_item_loaned(item):
-                                dpg.add_text("Oui")
-                            else:
-                                dpg.add_text("Non")
-                        for prop in props:
-                            if not prop in item._properties:
-                                item.add_property(prop)
-                            dpg.add_text(item._properties[prop].value)
+        rows = self._object_rows(cat, all_items)
+        if rows:
+            props = list(cat.properties_order)
+            columns = [prop.name for prop in props]
+            types = [prop.value_type() for prop in props]
+            if all_items:
+                columns.insert(0, "Emprunté?")
+                types.insert(0, str)
+
+            table = VirtualTable(
+                parent,
+                columns,
+                visible_rows=_visible_rows,
+                action=("Choisir", lambda item: self.choose_item(obj_num, item)),
+                types=types,
+            )
+            table.set_rows(rows)
+            self.memory["tables"][obj_num]["table"] = table
         else:
             dpg.add_text("Pas d'objets disponible", parent=parent)
 
+    def update_object_table(self, obj_num) -> None:
+        """Updates the rows of the table of items obj_num after the items changed"""
+        entry = self.memory["tables"][obj_num]
+        rows = self._object_rows(entry["cat"], entry["all_items"])
+        if entry["table"] is not None and rows:
+            entry["table"].set_rows(rows)
+        else:
+            # The table appears or disappears
+            self.build_object_table(entry["cat"], obj_num, entry["parent"], entry["all_items"])
+
     def new_object(self, parent) -> None:
         cat_names = {cat.description: cat for cat in self.manager.categories.values()}
 
@@ -253,6 +225,7 @@ class LoanPanel(Panel):
             note_uuid=dpg.generate_uuid(),
         )
         dpg.delete_item(self.memory["loan_info_uuid"], children_only=True)
+        self.memory["person_table"] = None
         self.memory["person"] = person
 
         if person:
@@ -306,17 +279,23 @@ class LoanPanel(Panel):
                     tag=self.memory["note_uuid"],
                 )
 
-    def reset(self):
-        dpg.configure_item(self.memory["save_modal"], show=False)
-        self.memory = dict(objects=dict(), loan_date=datetime.today(), chosen_items=set())
+    def build_main_window(self):
+        self.memory = dict(
+            objects=dict(), tables=dict(), loan_date=datetime.today(), chosen_items=set()
+        )
         dpg.delete_item(self.parent, children_only=True)
         self.main_window(self.parent)
 
+    def reset(self):
+        dpg.configure_item(self.memory["save_modal"], show=False)
+        self.build_main_window()
+
     def save_loan(self):
         tag = self.memory["save_modal"]
         dpg.configure_item(tag, show=False)
         dpg.delete_item(tag, children_only=True)
         loan_date = ProtectedDatetime(self.memory["loan_date_widget"].get_date())
+        due_date = self.memory["due_date_widget"].get_date()
 
         person = self.memory["person"]
         if not person:
@@ -345,11 +324,13 @@ class LoanPanel(Panel):
                 parent=tag,
             )
             dpg.add_button(label="Ok", parent=tag, callback=lambda *args: self.reset())
-            for item in items:
-                if item in self.manager.loans:
-                    if self.manager.loans[item]:
-                        self.manager.give_back(item, loan_date)
-                self.manager.create_loan(item, loan_date, person)
+            # One batch of events, so that the other panels update their tables once
+            with self.manager.lock, self.manager.events.batch():
+                for item in items:
+                    if item in self.manager.loans:
+                        if self.manager.loans[item]:
+                            self.manager.give_back(item, loan_date)
+                    self.manager.create_loan(item, loan_date, person, due_date=due_date)
 
             # Save the state of the loans
             workspace.save()
@@ -431,6 +412,11 @@ class LoanPanel(Panel):
 
                 dpg.add_button(label="OK", callback=_change_date)
 
+        with dpg.group(parent=parent, horizontal=True) as g_uid:
+            subtitle("Date de retour prévue: ", g_uid)
+            self.memory["due_date_widget"] = DateWidget(g_uid)
+            help("Laissez vide si l'objet n'a pas de date de retour prévue.", g_uid)
+
         subtitle("Objet(s)", parent)
 
         new_obj_uuid = dpg.generate_uuid()
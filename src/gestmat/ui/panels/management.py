@@ -10,9 +10,20 @@ from ...item.workspace import Workspace
 
 from ...item.representation import Item, ItemCategory, ItemProperty, forbidden_property_names
 
+from ...item.columns import TableModel, property_value
+from ...item.events import ManagerEvent, ManagerChanged, PersonEdited, LoanCreated, LoanReturned
 from ...item.manager import ItemManager
 from ..panel import Panel
-from ..widgets import colored_button, error, modal, subtitle, title, help, ressources
+from ..widgets import (
+    colored_button,
+    error,
+    modal,
+    subtitle,
+    title,
+    help,
+    ressources,
+    table_sort_specs,
+)
 
 
 def factory(fct, *args, **kwargs):
@@ -24,6 +35,16 @@ def factory(fct, *args, **kwargs):
 
 workspace = Workspace()
 
+# Number of rows of the tables of items shown at once
+_max_visible_rows = 25
+
+
+def _changes_items(event: ManagerEvent) -> bool:
+    """Whether event changes the items, properties or categories shown by the panel"""
+    if isinstance(event, (PersonEdited, LoanCreated, LoanReturned)):
+        return False
+    return not (isinstance(event, ManagerChanged) and event.op == "set_due_date")
+
 
 class ManagementPanel(Panel):
     def __init__(self, manager: ItemManager) -> None:
@@ -39,6 +60,12 @@ class ManagementPanel(Panel):
         self.cells = {}
         self.short_memory = copy.deepcopy(self.clean_memory_dict)
 
+    def on_events(self, events: list[ManagerEvent]) -> None:
+        # The changes made with the panel already update its widgets, and the loans and persons
+        # are not shown
+        if not self.visible and any(_changes_items(event) for event in events):
+            self.stale = True
+
     def load_subpanel(self, name, no_back_button, *args):
         dpg.delete_item(self.parent, children_only=True)
         if not no_back_button:
@@ -360,11 +387,14 @@ class ManagementPanel(Panel):
                     choices = [choice.strip() for choice in choices.split(";;")]
                     if not choices:
                         return
-                prop.name = name
-                prop.special_name = strip_special_chars(name).upper()
-                prop.select = choices
                 radio = True if radio == "oui" else False
-                prop.mandatory = radio
+                self.manager.edit_property(
+                    prop,
+                    name=name,
+                    special_name=strip_special_chars(name).upper(),
+                    select=choices,
+                    mandatory=radio,
+                )
                 dpg.configure_item(popup_uuid, show=False)
 
                 workspace.save()
@@ -386,7 +416,13 @@ class ManagementPanel(Panel):
                     if not choices:
                         return
 
-                prop = self.manager.create_property(name, str, mandatory=mandatory, select=choices)
+                try:
+                    self.manager.create_property(name, str, mandatory=mandatory, select=choices)
+                except ValueError:
+                    # Defined differently by another save under the same special name
+                    dpg.set_item_label(name_uuid, "Nom (déjà existant)")
+                    dpg.set_item_label(save_uuid, "")
+                    return
                 dpg.configure_item(popup_uuid, show=False)
 
                 workspace.save()
@@ -447,45 +483,38 @@ class ManagementPanel(Panel):
         self.main_window(self.parent)
 
     def table(self, cat: ItemCategory, items: list[Item], table_id, parent):
-        def _sort_callback(sender, sort_specs):
+        props = list(cat.properties_order)
+        # Columns of the values of the items, if the manager keeps them
+        columns = self.manager.category_columns(cat)
 
-            # sort_specs scenarios:
-            #   1. no sorting -> sort_specs == None
-            #   2. single sorting -> sort_specs == [[column_id, direction]]
-            #   3. multi sorting -> sort_specs == [[column_id, direction], [column_id, direction], ...]
-            #
-            # notes:
-            #   1. direction is ascending if == 1
-            #   2. direction is ascending if == -1
+        # Model sorting the saved items, rebuilt when the items changed since the last sort
+        getters = [(lambda item, prop=prop: property_value(item, prop)) for prop in props]
+        types = [prop.value_type() for prop in props]
+        model = None
+        model_version = None
 
-            # no sorting case
+        def _sort_callback(sender, sort_specs):
+            nonlocal model, model_version
 
-            if sort_specs is None:
+            # sort_specs is None (no sorting) or a list of [column_id, direction] pairs, the
+            # first column (checkboxes) is not sorted
+            specs = table_sort_specs(sender, sort_specs, 1)
+            if not specs:
                 return
 
-            headers = {num: i for i, num in enumerate(dpg.get_item_children(sender, 0))}
-
-            rows = dpg.get_item_children(sender, 1)
-
-            # create a list that can be sorted based on first cell
-            # value, keeping track of row and value used to sort
-            sortable_list = []
-            for row in rows:
-                # print(row)
-                cell = dpg.get_item_children(row, 1)[headers[sort_specs[0][0]]]
-                cell = dpg.get_item_children(cell, 1)[0]
-                sortable_list.append([row, dpg.get_value(cell)])
-
-            def _sorter(e):
-                return e[1]
-
-            sortable_list.sort(key=_sorter, reverse=sort_specs[0][1] < 0)
-
-            # create list of just sorted row ids
-            new_order = []
-            for pair in sortable_list:
-                new_order.append(pair[0])
-
+            with self.manager.lock:
+                version = self.manager.versions["items"]
+                if model is None or version != model_version:
+                    rows = columns.rows if columns is not None else cat.registered_items
+                    model = TableModel(rows, getters, types)
+                    model_version = version
+                order = model.sorted_rows(specs)
+
+            cells = self.cells[cat]["items"]
+            new_order = [cells[item]["row_id"] for item in order if item in cells]
+            # The new items are not in the model until they are saved, they stay at the end
+            sorted_rows = set(new_order)
+            new_order += [row for row in dpg.get_item_children(sender, 1) if row not in sorted_rows]
             dpg.reorder_items(sender, 1, new_order)
 
         select_tag = dpg.generate_uuid()
@@ -519,21 +548,36 @@ class ManagementPanel(Panel):
             delay_search=True,
             parent=parent,
             sortable=True,
+            sort_multi=True,
             callback=_sort_callback,
             policy=dpg.mvTable_SizingStretchProp,
+            clipper=True,
             tag=table_id,
         ) as table_id:
-            props = list(cat.properties_order)
             dpg.add_table_column(label="", no_sort=True, width=10, width_fixed=True, no_resize=True)
 
             for prop in props:
                 addamentum = "*" if prop.mandatory else ""
                 dpg.add_table_column(label=f"{prop.name}{addamentum}")
 
-            for i, item in enumerate(items):
-                self.add_row(cat, item, props)
-
-    def add_row(self, cat: ItemCategory, item: Item, props, default_value=False, is_new=False):
+            if columns is not None:
+                with self.manager.lock:
+                    rows = list(columns.iter_rows(props))
+                for item, values in rows:
+                    self.add_row(cat, item, props, values=values)
+            else:
+                for i, item in enumerate(items):
+                    self.add_row(cat, item, props)
+
+    def add_row(
+        self,
+        cat: ItemCategory,
+        item: Item,
+        props,
+        default_value=False,
+        is_new=False,
+        values: tuple = None,
+    ):
         row_id = dpg.generate_uuid()
         with dpg.table_row(parent=self.cells[cat]["table_id"], tag=row_id):
             checkbox_uuid = dpg.generate_uuid()
@@ -544,10 +588,10 @@ class ManagementPanel(Panel):
             self.cells[cat]["items"][item]["checkbox"] = checkbox_uuid
             self.cells[cat]["items"][item]["is_new"] = is_new
 
-            for prop in list(cat.properties_order):
+            for i, prop in enumerate(list(cat.properties_order)):
                 if not prop in item._properties:
                     item.add_property(prop)
-                txt = item._properties[prop].value
+                txt = values[i] if values is not None else item._properties[prop].value
                 with dpg.group():
                     tag = dpg.last_item()
                     dpg.add_text(txt)
@@ -563,17 +607,18 @@ class ManagementPanel(Panel):
 
     def delete_items_in_cat(self, cat: ItemCategory):
         to_remove = []
-        for item in self.cells[cat]["items"].keys():
-            if not dpg.get_value(self.cells[cat]["items"][item]["checkbox"]):
-                continue
+        with self.manager.lock:
+            for item in self.cells[cat]["items"].keys():
+                if not dpg.get_value(self.cells[cat]["items"][item]["checkbox"]):
+                    continue
 
-            to_remove.append(item)
-            self.manager.retire_item(item)
-            cat.unregister_item(item)
-            self.remove_row(item._category, item)
+                to_remove.append(item)
+                self.manager.retire_item(item)
 
         for item in to_remove:
+            dpg.delete_item(self.cells[cat]["items"][item]["row_id"])
             del self.cells[cat]["items"][item]
+        self.set_table_height(cat)
 
         workspace.save()
 
@@ -591,30 +636,34 @@ class ManagementPanel(Panel):
     def save_all(self, cat: ItemCategory, new_item=False) -> None:
         is_okay = True
         items = self.cells[cat]["items"]
-        for item in items:
-            if item not in self.memory["editing_status"]:
-                continue
-
-            tmp_ = True
-            for prop in item._properties:
-                if prop not in cat.properties:
+        with self.manager.lock:
+            for item in items:
+                if item not in self.memory["editing_status"]:
                     continue
-                tag = self.cells[cat]["items"][item][prop]
-                value = dpg.get_value(dpg.get_item_children(tag[0], 1)[0])
 
-                if not value and prop.mandatory:
-                    is_okay = False
-                    tmp_ = False
-                else:
-                    dpg.delete_item(tag[0], children_only=True)
-                    dpg.add_text(value, parent=tag[0])
-                    item._properties[prop].value = value
+                tmp_ = True
+                for prop in item._properties:
+                    if prop not in cat.properties:
+                        continue
+                    tag = self.cells[cat]["items"][item][prop]
+                    value = dpg.get_value(dpg.get_item_children(tag[0], 1)[0])
 
-            if tmp_ and self.cells[cat]["items"][item]["is_new"]:
-                self.manager.add_item(item)
-                dpg.set_value(self.cells[cat]["items"][item]["checkbox"], False)
-                self.cells[cat]["items"][item]["is_new"] = False
-                cat.register_item(item)
+                    if not value and prop.mandatory:
+                        is_okay = False
+                        tmp_ = False
+                    else:
+                        dpg.delete_item(tag[0], children_only=True)
+                        dpg.add_text(value, parent=tag[0])
+                        # Each change is journaled and invalidates the caches of the item, the
+                        # unchanged cells are left alone
+                        if item._properties[prop].value != value:
+                            self.manager.set_item_property(item, prop, value)
+
+                if tmp_ and self.cells[cat]["items"][item]["is_new"]:
+                    self.manager.add_item(item)
+                    dpg.set_value(self.cells[cat]["items"][item]["checkbox"], False)
+                    self.cells[cat]["items"][item]["is_new"] = False
+                    cat.register_item(item)
 
         if is_okay:
             self.reset_edit_button(cat, items)
@@ -654,9 +703,6 @@ class ManagementPanel(Panel):
                 self.set_table_height(cat)
             self.reset_edit_button(cat, items)
 
-        def _set_value(_, value, data):
-            data[0]._properties[data[1]].value = value
-
         num_select = 0
         for item, item_dic in self.cells[cat]["items"].items():
             if not dpg.get_value(item_dic["checkbox"]):
@@ -678,8 +724,6 @@ class ManagementPanel(Panel):
                             label="",
                             default_value=default_value,
                             width=-1,
-                            user_data=(item, prop),
-                            callback=_set_value,
                         )
                     else:
                         dpg.add_input_text(
@@ -687,8 +731,6 @@ class ManagementPanel(Panel):
                             label="",
                             default_value=default_value,
                             width=-1,
-                            user_data=(item, prop),
-                            callback=_set_value,
                         )
                 item_dic[prop] = [tag[0], dpg.last_item()]
 
@@ -728,7 +770,8 @@ class ManagementPanel(Panel):
         self.edit_all(cat, True)
 
     def generate_height(self, num):
-        return 30 * (num + 3)
+        # Above _max_visible_rows rows, the table scrolls instead of growing
+        return 30 * (min(num, _max_visible_rows) + 3)
 
     def set_table_height(self, cat: ItemCategory):
         dpg.configure_item(
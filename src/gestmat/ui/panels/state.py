@@ -5,9 +5,18 @@ import dearpygui.dearpygui as dpg
 from ...ui.panels.management import ManagementPanel
 
 from ...item.workspace import Workspace
-from ..widgets import help, item_info_box, subtitle, title, DateWidget, prepare_modal
+from ..widgets import (
+    help,
+    item_info_box,
+    subtitle,
+    title,
+    DateWidget,
+    prepare_modal,
+    VirtualTable,
+)
+from ...item.events import ManagerEvent, ManagerChanged, LoanCreated, LoanReturned, PersonEdited
 from ...item.manager import ItemManager, Person
-from ...util import strip_accents, factory, ProtectedDatetime
+from ...util import factory, ProtectedDatetime
 from ..panel import Panel
 
 
@@ -20,6 +29,22 @@ def factory(fct, *args, **kwargs):
 
 workspace = Workspace()
 
+# Sub panels of StatePanel and the labels of the buttons showing them
+_views = {
+    "table_view": "Voir liste tous les emprunts",
+    "person_view": "Voir emprunts par personne",
+    "due_view": "Voir retours en retard",
+}
+
+# Number of upcoming returns listed in the due view
+_next_due_count = 20
+
+# Number of rows of the table of the loans shown at once
+_visible_rows = 20
+
+# Mutations of the manager which do not change the table of the loans
+_ignored_ops = ("set_due_date", "create_property", "retire_property", "unretire_property")
+
 
 class StatePanel(Panel):
     def __init__(self, manager: ItemManager) -> None:
@@ -28,78 +53,85 @@ class StatePanel(Panel):
         self.memory = dict()
 
     def load_subpanel(self, name, *args):
+        self.memory.pop("checkbox", None)
+        if "table" in self.memory:
+            self.memory.pop("table").delete()
         dpg.delete_item(self.memory["view_uuid"], children_only=True)
+        self.memory["view"] = name
         self.__getattribute__(f"sub_{name}")(*args)
 
-        dpg.delete_item(self.memory["buttons_uuid"], children_only=True)
+        self.build_buttons(name)
 
-        if name == "table_view":
-            dpg.add_button(
-                label="Voir emprunts par personne",
-                callback=lambda *args: self.load_subpanel("person_view"),
-                parent=self.memory["buttons_uuid"],
-            )
-        else:
-            dpg.add_button(
-                label="Voir liste tous les emprunts",
-                callback=lambda *args: self.load_subpanel("table_view"),
-                parent=self.memory["buttons_uuid"],
-            )
+    def build_buttons(self, current: str):
+        dpg.delete_item(self.memory["buttons_uuid"], children_only=True)
+        for name, label in _views.items():
+            if name != current:
+                dpg.add_button(
+                    label=label,
+                    callback=factory(self.load_subpanel, name),
+                    parent=self.memory["buttons_uuid"],
+                )
 
     def give_back(self):
-        for loan, id in self.memory["checkbox"].items():
-            if dpg.get_value(id):
+        with self.manager.lock, self.manager.events.batch():
+            checkboxes = self.memory.get("checkbox", dict())
+            loans = [loan for loan, id in checkboxes.items() if dpg.get_value(id)]
+            if "table" in self.memory:
+                loans.extend(self.memory["table"].selected)
+            for loan in loans:
                 self.manager.give_back(loan, datetime.today())
 
         workspace.save()
-        self.build_main_window()
+        if "table" in self.memory:
+            # The table of the loans is updated by on_events
+            self.refresh()
+        else:
+            # The view the loans were given back from is built again
+            self.stale = False
+            self.load_subpanel(self.memory["view"])
 
     def build_main_window(self):
         dpg.delete_item(self.parent, children_only=True)
+        self.stale = False
 
         self.memory = dict()
 
         self.main_window(self.parent)
 
-    def sub_table_view(self):
-        def _sort_callback(sender, sort_specs):
-
-            # sort_specs scenarios:
-            #   1. no sorting -> sort_specs == None
-            #   2. single sorting -> sort_specs == [[column_id, direction]]
-            #   3. multi sorting -> sort_specs == [[column_id, direction], [column_id, direction], ...]
-            #
-            # notes:
-            #   1. direction is ascending if == 1
-            #   2. direction is ascending if == -1
-
-            # no sorting case
-            if sort_specs is None:
-                return
-
-            headers = {num: i for i, num in enumerate(dpg.get_item_children(sender, 0))}
-
-            rows = dpg.get_item_children(sender, 1)
-
-            # create a list that can be sorted based on first cell
-            # value, keeping track of row and value used to sort
-            sortable_list = []
-            for row in rows:
-                cell = dpg.get_item_children(row, 1)[headers[sort_specs[0][0]]]
-                sortable_list.append([row, dpg.get_value(cell)])
-
-            def _sorter(e):
-                return e[1]
-
-            sortable_list.sort(key=_sorter, reverse=sort_specs[0][1] < 0)
-
-            # create list of just sorted row ids
-            new_order = []
-            for pair in sortable_list:
-                new_order.append(pair[0])
+    @staticmethod
+    def _loan_row(loan) -> tuple:
+        """Returns the row of loan in the table of the loans"""
+        values = (
+            loan.date.strftime("%Y/%m/%d"),
+            loan.item._category.description,
+            loan.person.surname,
+            loan.person.name,
+            loan.person.birthday.strftime("%Y/%m/%d"),
+            loan.person.place,
+            loan.person.note,
+        )
+        return (loan, values)
+
+    def on_events(self, events: list[ManagerEvent]) -> None:
+        table = self.memory.get("table")
+        if table is None:
+            self.stale = True
+            return
 
-            dpg.reorder_items(sender, 1, new_order)
+        # The loans whose rows changed, applied to the table at once
+        changed = dict()
+        for event in events:
+            if isinstance(event, (LoanCreated, LoanReturned)):
+                changed[event.loan] = None
+            elif isinstance(event, PersonEdited):
+                changed.update(dict.fromkeys(self.manager.grouped_loans.get(event.person, ())))
+            elif not (isinstance(event, ManagerChanged) and event.op in _ignored_ops):
+                self.stale = True
+        if changed:
+            table.remove_rows(changed)
+            table.add_rows([self._loan_row(loan) for loan in changed if not loan.finished])
 
+    def sub_table_view(self):
         parent = self.memory["view_uuid"]
 
         if not self.manager.loans:
@@ -112,20 +144,39 @@ class StatePanel(Panel):
             )
 
         with dpg.group(parent=parent, horizontal=True) as group:
-            _filter_table_id = dpg.generate_uuid()
-            dpg.add_input_text(
-                label="Rechercher",
-                user_data=_filter_table_id,
-                callback=lambda s, a, u: dpg.set_value(u, strip_accents(dpg.get_value(s))),
-            )
+            search_uuid = dpg.add_input_text(label="Rechercher")
             help(
                 "Tapez n'importe quel mot du tableau ou propriété dans le champ de recherche pour trouver une ligne.\n"
                 "Cliquez sur les en-tête de colonnes pour trier.",
                 group,
             )
 
-        self.memory["checkbox"] = dict()
-
+        table = VirtualTable(
+            parent,
+            [
+                "Date d'emprunt",
+                "Type",
+                "Nom",
+                "Prénom",
+                "Date de naissance",
+                "Unité / Chambre",
+                "Remarque",
+            ],
+            visible_rows=_visible_rows,
+            checkbox=True,
+            tooltip=lambda loan, parent: item_info_box(loan.item, parent),
+            # Also matches the values of the properties of the items, which are not shown
+            search_keys=self.manager.loan_search_keys,
+        )
+        self.memory["table"] = table
+        dpg.configure_item(search_uuid, callback=lambda s, a, u: table.set_filter(a))
+
+        rows = []
+        for loans in self.manager.loans.values():
+            rows.extend(self._loan_row(loan) for loan in loans)
+        table.set_rows(rows)
+
+    def _due_table(self, loans: list, parent):
         with dpg.table(
             header_row=True,
             row_background=True,
@@ -133,58 +184,60 @@ class StatePanel(Panel):
             borders_outerH=True,
             borders_innerV=True,
             borders_outerV=True,
-            scrollY=True,
-            scrollX=True,
-            delay_search=True,
             parent=parent,
             resizable=True,
-            sortable=True,
-            callback=_sort_callback,
             policy=dpg.mvTable_SizingStretchProp,
-            tag=_filter_table_id,
-        ) as table_id:
-            # self.items.append("loan_table")
-            dpg.add_table_column(label="", width=35, no_sort=True, width_fixed=True)
+        ):
+            dpg.add_table_column(label="", width=35, width_fixed=True)
+            dpg.add_table_column(label="Retour prévu")
             dpg.add_table_column(label="Date d'emprunt")
             dpg.add_table_column(label="Type")
-            # dpg.add_table_column(label="N°")
             dpg.add_table_column(label="Nom")
             dpg.add_table_column(label="Prénom")
-            dpg.add_table_column(label="Date de naissance")
             dpg.add_table_column(label="Unité / Chambre")
-            dpg.add_table_column(label="Remarque")
-
-            for item, loans in self.manager.loans.items():
-                for loan in loans:
-                    prop_values = "".join(
-                        [item._properties[prop].value for prop in item._properties]
-                    )
-                    strings = [
-                        loan.date.strftime("%Y/%m/%d"),
-                        item._category.description,
-                        # item.n.value,
-                        loan.person.surname,
-                        loan.person.name,
-                        loan.person.birthday.strftime("%Y/%m/%d"),
-                        loan.person.place,
-                        loan.person.note,
-                        prop_values,
-                    ]
-                    strs = [strip_accents(string) for string in strings]
-                    with dpg.table_row(filter_key=" ".join(strs)):
-                        self.memory["checkbox"][loan] = dpg.generate_uuid()
-                        dpg.add_checkbox(label="", tag=self.memory["checkbox"][loan])
-                        dpg.add_text(strings[0])
-                        with dpg.group(horizontal=True):
-                            dpg.add_text("(infos)", color=(125, 125, 125))
-                            with dpg.tooltip(dpg.last_item()) as tooltip_uid:
-                                item_info_box(item, tooltip_uid)
-                            dpg.add_text(strings[1])
-                        dpg.add_text(strings[2])
-                        dpg.add_text(strings[3])
-                        dpg.add_text(strings[4])
-                        dpg.add_text(strings[5])
-                        dpg.add_text(strings[6])
+
+            for loan in loans:
+                with dpg.table_row():
+                    self.memory["checkbox"][loan] = dpg.generate_uuid()
+                    dpg.add_checkbox(label="", tag=self.memory["checkbox"][loan])
+                    dpg.add_text(loan.due_date.strftime("%Y/%m/%d"))
+                    dpg.add_text(loan.date.strftime("%Y/%m/%d"))
+                    with dpg.group(horizontal=True):
+                        dpg.add_text("(infos)", color=(125, 125, 125))
+                        with dpg.tooltip(dpg.last_item()) as tooltip_uid:
+                            item_info_box(loan.item, tooltip_uid)
+                        dpg.add_text(loan.item._category.description)
+                    dpg.add_text(loan.person.surname)
+                    dpg.add_text(loan.person.name)
+                    dpg.add_text(loan.person.place)
+
+    def sub_due_view(self):
+        parent = self.memory["view_uuid"]
+        today = datetime.today()
+
+        with self.manager.lock:
+            overdue = self.manager.overdue_loans(today)
+            next_due = self.manager.next_due_loans(_next_due_count, today)
+
+        self.memory["checkbox"] = dict()
+
+        dpg.add_button(
+            label="Rendre les objets sélectionnés",
+            callback=lambda *args: self.give_back(),
+            parent=parent,
+        )
+
+        subtitle("En retard", parent)
+        if overdue:
+            self._due_table(overdue, parent)
+        else:
+            dpg.add_text("Aucun objet en retard", parent=parent)
+
+        subtitle("Prochains retours", parent)
+        if next_due:
+            self._due_table(next_due, parent)
+        else:
+            dpg.add_text("Aucun retour prévu", parent=parent)
 
     def edit_person(self, person: Person):
         name = person.name
@@ -223,11 +276,14 @@ class StatePanel(Panel):
             )
 
         def _save():
-            person.name = dpg.get_value(name_uuid)
-            person.surname = dpg.get_value(surname_uuid)
-            person.place = dpg.get_value(place_uuid)
-            person.note = dpg.get_value(note_uuid)
-            person.birthday = ProtectedDatetime(date.get_date())
+            self.manager.edit_person(
+                person,
+                name=dpg.get_value(name_uuid),
+                surname=dpg.get_value(surname_uuid),
+                place=dpg.get_value(place_uuid),
+                note=dpg.get_value(note_uuid),
+                birthday=ProtectedDatetime(date.get_date()),
+            )
             workspace.save()
             stop_show()
             self.load_subpanel("person_view")
@@ -241,16 +297,14 @@ class StatePanel(Panel):
     def sub_person_view(self):
         parent = self.memory["view_uuid"]
 
-        persons = list(self.manager.persons)
-        person_names = [person.surname for person in persons]
-        sorted_list = [i[0] for i in sorted(enumerate(person_names), key=lambda x: x[1].lower())]
+        persons = self.manager.sorted_persons()
 
-        for idx in sorted_list:
+        for person in persons:
             with dpg.group(horizontal=True, parent=parent) as g_uid:
-                dpg.add_button(label="Éditer", callback=factory(self.edit_person, persons[idx]))
+                dpg.add_button(label="Éditer", callback=factory(self.edit_person, person))
                 subtitle("Nom, Prénom:", parent=g_uid)
-                surname = persons[idx].surname or "n/a"
-                name = persons[idx].name or "n/a"
+                surname = person.surname or "n/a"
+                name = person.name or "n/a"
                 if name == "n/a" and surname == "n/a":
                     name = ""
                 dpg.add_text(f"{surname}, {name}")
@@ -259,15 +313,15 @@ class StatePanel(Panel):
                 with dpg.tooltip(dpg.last_item()) as tooltip_uid:
                     with dpg.group(parent=tooltip_uid, horizontal=True) as g:
                         subtitle("Date de naissance:", parent=g)
-                        birthday = persons[idx].birthday
+                        birthday = person.birthday
                         dpg.add_text(f"{birthday.strftime('%d/%m/%Y')}")
                     with dpg.group(parent=tooltip_uid, horizontal=True) as g:
                         subtitle("Unité - chambre:", parent=g)
-                        place = persons[idx].place
+                        place = person.place
                         dpg.add_text(f"{place}")
                     with dpg.group(parent=tooltip_uid, horizontal=True) as g:
                         subtitle("Remarque:", parent=g)
-                        note = persons[idx].note
+                        note = person.note
                         dpg.add_text(f"{note}")
 
     def main_window(self, parent) -> None:
@@ -279,13 +333,12 @@ class StatePanel(Panel):
 
         self.memory["buttons_uuid"] = dpg.generate_uuid()
         with dpg.group(tag=self.memory["buttons_uuid"], parent=title_uuid, horizontal=True):
-            dpg.add_button(
-                label="Voir emprunts par personne",
-                callback=lambda *args: self.load_subpanel("person_view"),
-            )
+            pass
+        self.build_buttons("table_view")
 
         self.memory["view_uuid"] = dpg.generate_uuid()
         with dpg.group(tag=self.memory["view_uuid"], parent=parent):
             pass
 
+        self.memory["view"] = "table_view"
         self.sub_table_view()
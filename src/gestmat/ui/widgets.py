@@ -1,7 +1,10 @@
 import colorsys
 from datetime import datetime
+from typing import Callable, Optional
 import dearpygui.dearpygui as dpg
 
+from ..item.columns import TableModel
+from ..item.search import SearchKeys, search_key
 from ..item.representation import Item
 from .res import Ressources
 
@@ -207,3 +210,265 @@ def item_info_box(item: Item, parent: int):
         with dpg.group(horizontal=True, parent=parent) as g_uid:
             subtitle(f"{item._properties[prop].name}", g_uid)
             dpg.add_text(f"{item._properties[prop].value}")
+
+
+def table_sort_specs(table, sort_specs, skip: int = 0) -> list[tuple[int, bool]]:
+    """
+    Converts the sort specs of a table callback ([column_id, direction] pairs, the direction
+    being -1 for a descending order) to (column, reverse) pairs, the columns being counted
+    without the skip first ones
+    """
+    if not sort_specs:
+        return []
+    columns = dpg.get_item_children(table, 0)
+    specs = []
+    for column_id, direction in sort_specs:
+        column = columns.index(column_id) - skip
+        if column >= 0:
+            specs.append((column, direction < 0))
+    return specs
+
+
+class VirtualTable:
+    def __init__(
+        self,
+        parent,
+        columns: list[str],
+        visible_rows: int = 15,
+        checkbox: bool = False,
+        action: Optional[tuple[str, Callable]] = None,
+        tooltip: Optional[Callable] = None,
+        types: Optional[list[Optional[type]]] = None,
+        search_keys: Optional[SearchKeys] = None,
+        row_height: int = 25,
+    ) -> None:
+        """
+        Table only creating the widgets of its visible rows
+
+        The rows are (key, values) pairs, key being the object shown on the row (item, loan,
+        person, ...) and values the texts of the columns. Scrolling (with the mouse wheel or the
+        slider on the right of the table) writes the values of other rows in the same widgets,
+        so the number of widgets does not depend on the number of rows.
+
+        Arguments
+        ---------
+        parent
+            parent of the table
+        columns : list[str]
+            labels of the columns of the values
+        visible_rows : int
+            number of rows shown at once
+        checkbox : bool
+            if True, the first column holds a checkbox, the keys of the checked rows are in
+            self.selected
+        action : tuple[str, Callable]
+            if given, (label, callback) of a button added to each row, callback is called with
+            the key of the row
+        tooltip : Callable
+            if given, tooltip(key, parent) fills the tooltip of the first value of a row
+        types : list[type]
+            types of the values of the columns, used to sort them (see TableModel)
+        search_keys : SearchKeys
+            if given, search keys of the keys of the rows matched by the filter, instead of the
+            values of the rows
+        """
+        self.columns = list(columns)
+        self.visible_rows = visible_rows
+        self.row_height = row_height
+        self.action = action
+        self.tooltip = tooltip
+        self.search_keys = search_keys
+        self.model = TableModel(
+            [], [(lambda row, index=index: row[1][index]) for index in range(len(columns))], types
+        )
+        self.sort_specs = []
+        self.all_rows = []
+        self.rows = []
+        self.selected = set()
+        self.offset = 0
+        self._words = []
+        self._search = dict()
+        self._cells = []
+        self._leading = int(checkbox) + int(action is not None)
+
+        height = self._height(visible_rows)
+        with dpg.group(horizontal=True, parent=parent) as self.group:
+            with dpg.table(
+                header_row=True,
+                row_background=True,
+                borders_innerH=True,
+                borders_outerH=True,
+                borders_innerV=True,
+                borders_outerV=True,
+                resizable=True,
+                sortable=True,
+                sort_multi=True,
+                callback=self._sort_callback,
+                policy=dpg.mvTable_SizingStretchProp,
+                width=-30,
+                height=height,
+            ) as self.table:
+                if checkbox:
+                    dpg.add_table_column(label="", width=35, no_sort=True, width_fixed=True)
+                if action is not None:
+                    dpg.add_table_column(label=action[0], width=60, no_sort=True, width_fixed=True)
+                for label in self.columns:
+                    dpg.add_table_column(label=label)
+
+                for index in range(visible_rows):
+                    with dpg.table_row(show=False) as row:
+                        cells = dict(row=row)
+                        if checkbox:
+                            cells["checkbox"] = dpg.add_checkbox(
+                                label="", callback=self._check_callback, user_data=index
+                            )
+                        if action is not None:
+                            dpg.add_button(
+                                label=action[0], callback=self._action_callback, user_data=index
+                            )
+                        cells["texts"] = [dpg.add_text("") for label in self.columns]
+                        if tooltip is not None and self.columns:
+                            cells["tooltip"] = dpg.add_tooltip(cells["texts"][0])
+                    self._cells.append(cells)
+
+            self.slider = dpg.add_slider_int(
+                vertical=True,
+                height=height,
+                width=20,
+                min_value=0,
+                max_value=0,
+                format="",
+                callback=self._slider_callback,
+            )
+
+        with dpg.handler_registry() as self._handlers:
+            dpg.add_mouse_wheel_handler(callback=self._wheel_callback)
+
+    def _height(self, rows: int) -> int:
+        return self.row_height * (rows + 1) + 5
+
+    def _max_offset(self) -> int:
+        return max(0, len(self.rows) - self.visible_rows)
+
+    def _row_key(self, index: int):
+        index += self.offset
+        return self.rows[index][0] if index < len(self.rows) else None
+
+    def _search_text(self, row: tuple) -> str:
+        if self.search_keys is not None:
+            return self.search_keys.get(row[0])
+        text = self._search.get(row[0])
+        if text is None:
+            text = search_key(row[1])
+            self._search[row[0]] = text
+        return text
+
+    def set_rows(self, rows: list[tuple]) -> None:
+        """Replaces the rows of the table"""
+        self.model.set_rows(rows)
+        self.all_rows = self.model.sorted_rows(self.sort_specs)
+        self._search.clear()
+        self.selected &= {key for key, values in self.all_rows}
+        self._filter_rows()
+
+    def add_rows(self, rows: list[tuple]) -> None:
+        """Adds rows to the table, keeping its sort, filter and scroll position"""
+        self.model.set_rows(self.model.rows + list(rows))
+        self.all_rows = self.model.sorted_rows(self.sort_specs)
+        self._filter_rows(self.offset)
+
+    def remove_rows(self, keys) -> None:
+        """Removes the rows of keys from the table, keeping its sort, filter and scroll position"""
+        keys = set(keys)
+        self.model.set_rows(row for row in self.model.rows if row[0] not in keys)
+        self.all_rows = self.model.sorted_rows(self.sort_specs)
+        self.selected -= keys
+        for key in keys:
+            self._search.pop(key, None)
+        self._filter_rows(self.offset)
+
+    def set_filter(self, text: str) -> None:
+        """Only shows the rows containing every word of text (accents and case are ignored)"""
+        self._words = search_key([text or ""]).split()
+        self._filter_rows()
+
+    def _filter_rows(self, offset: int = 0) -> None:
+        if self._words:
+            self.rows = [
+                row
+                for row in self.all_rows
+                if all(word in self._search_text(row) for word in self._words)
+            ]
+        else:
+            self.rows = self.all_rows
+        shown = min(len(self.rows), self.visible_rows)
+        dpg.configure_item(self.table, height=self._height(shown))
+        dpg.configure_item(
+            self.slider,
+            height=self._height(shown),
+            max_value=self._max_offset(),
+            show=len(self.rows) > self.visible_rows,
+        )
+        self.scroll_to(offset)
+
+    def sort(self, specs: list[tuple[int, bool]]) -> None:
+        """Sorts the rows by specs, a list of (column, reverse) pairs (see TableModel)"""
+        self.sort_specs = list(specs)
+        self.all_rows = self.model.sorted_rows(self.sort_specs)
+        self._filter_rows()
+
+    def scroll_to(self, offset: int) -> None:
+        """Shows the rows from the offset-th one"""
+        self.offset = min(max(0, offset), self._max_offset())
+        dpg.set_value(self.slider, self._max_offset() - self.offset)
+        self.refresh()
+
+    def refresh(self) -> None:
+        """Writes the values of the visible rows in the row widgets"""
+        for index, cells in enumerate(self._cells):
+            if self.offset + index >= len(self.rows):
+                dpg.configure_item(cells["row"], show=False)
+                continue
+            key, values = self.rows[self.offset + index]
+            dpg.configure_item(cells["row"], show=True)
+            if "checkbox" in cells:
+                dpg.set_value(cells["checkbox"], key in self.selected)
+            for text, value in zip(cells["texts"], values):
+                dpg.set_value(text, value)
+            if "tooltip" in cells:
+                dpg.delete_item(cells["tooltip"], children_only=True)
+                self.tooltip(key, cells["tooltip"])
+
+    def delete(self) -> None:
+        dpg.delete_item(self._handlers)
+        dpg.delete_item(self.group)
+
+    def _sort_callback(self, sender, sort_specs):
+        if sort_specs is None:
+            return
+        self.sort(table_sort_specs(sender, sort_specs, self._leading))
+
+    def _check_callback(self, sender, value, index):
+        key = self._row_key(index)
+        if key is None:
+            return
+        if value:
+            self.selected.add(key)
+        else:
+            self.selected.discard(key)
+
+    def _action_callback(self, sender, app_data, index):
+        key = self._row_key(index)
+        if key is not None:
+            self.action[1](key)
+
+    def _slider_callback(self, sender, value):
+        self.scroll_to(self._max_offset() - value)
+
+    def _wheel_callback(self, sender, delta):
+        if not dpg.does_item_exist(self.table):
+            # The table was deleted with its parent
+            dpg.delete_item(self._handlers)
+            return
+        if dpg.is_item_hovered(self.table) or dpg.is_item_hovered(self.slider):
+            self.scroll_to(self.offset - 3 * int(delta))
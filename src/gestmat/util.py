@@ -2,6 +2,8 @@
 #
 # MatGest
 
+import functools
+import re
 import unicodedata
 from datetime import date, datetime
 
@@ -49,18 +51,22 @@ def to_date(date: str, split="/", order_reverse=False):
     return date
 
 
-def strip_accents(text):
-    try:
-        text = unicode(text, "utf-8")
-    except NameError:  # unicode is a default on python 3
-        pass
+_special_chars = re.compile(r"[^A-Za-z0-9_]")
 
-    text = unicodedata.normalize("NFD", text).encode("ascii", "ignore").decode("utf-8")
 
-    return str(text)
+def strip_accents(text):
+    """Returns text without its accents, and without the other non ASCII characters"""
+    # Most texts (IDs, numbers, dates) have nothing to strip
+    if text.isascii():
+        return text
+    return unicodedata.normalize("NFD", text).encode("ascii", "ignore").decode("ascii")
 
 
+@functools.lru_cache(maxsize=1024)
 def strip_special_chars(text):
+    """Returns text with only its letters, digits and underscores, without accents"""
+    if text.isascii():
+        return _special_chars.sub("", text)
     text = "".join([char for char in text if char.isalnum() or char == "_"])
     return strip_accents(text)
 
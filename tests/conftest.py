@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+#
+# MatGest
+
+import os
+import sys
+import datetime
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), "src"))
+
+from gestmat.item.manager import ItemManager, Person  # noqa: E402
+from gestmat.item import representation  # noqa: E402
+from gestmat.item.representation import Item, ItemProperty  # noqa: E402
+from gestmat.item.serialization import item_to_dict, person_to_dict, loan_to_dict  # noqa: E402
+from gestmat.item.workspace import Workspace  # noqa: E402
+
+
+def build_manager(manager: ItemManager) -> list[Item]:
+    """Fills manager with a few properties, categories and items, returns the items"""
+    manager.create_property("ID", mandatory=True, no_edit=True)
+    manager.create_property("largeur", unit="cm")
+    manager.create_property("Côté", select=["gauche", "droite"])
+    manager.add_category("FR", "Fauteuil roulant", ["ID", "largeur"])
+    manager.add_category("PE", "Planche", ["id", "Côté"])
+    items = [
+        Item(manager.categories["FR"], id=f"FR {i}", largeur=str(40 + i % 10)) for i in range(20)
+    ]
+    items += [Item(manager.categories["PE"], id=f"PE {i}", cote="gauche") for i in range(5)]
+    manager.add_items(items)
+    return items
+
+
+def state(manager: ItemManager) -> dict:
+    """Returns the content of manager (active and archived) in a form which can be compared"""
+    manager.load_archive()
+
+    def _item(item):
+        data = item_to_dict(item)
+        return dict(data, properties=sorted(map(str, data["properties"])))
+
+    def _person(person):
+        data = person_to_dict(person)
+        return dict(data, loans=sorted(data["loans"]))
+
+    def _loans(loans):
+        return {
+            loan.uuid: (item._uuid, loan_to_dict(loan))
+            for item, item_loans in loans.items()
+            for loan in item_loans
+        }
+
+    return {
+        "items": {item._uuid: _item(item) for item in manager.items},
+        "retired_items": {item._uuid: _item(item) for item in manager.retired_items},
+        "persons": {person.uuid: _person(person) for person in manager.persons},
+        "retired_persons": {person.uuid: _person(person) for person in manager.retired_persons},
+        "loans": _loans(manager.loans),
+        "retired_loans": _loans(manager.retired_loans),
+    }
+
+
+@pytest.fixture(autouse=True)
+def property_registries():
+    """The classes of the properties are shared by all the managers, each test gets its own"""
+    classes = dict(representation._property_classes)
+    types = dict(ItemProperty._property_types)
+    yield
+    representation._property_classes.clear()
+    representation._property_classes.update(classes)
+    ItemProperty._property_types.clear()
+    ItemProperty._property_types.update(types)
+
+
+@pytest.fixture
+def home(tmp_path, monkeypatch):
+    """Folder holding the saves, also used as home folder (for the backup saves)"""
+    os.makedirs(tmp_path / "Documents")
+    monkeypatch.setenv("HOME", str(tmp_path))
+    return tmp_path
+
+
+@pytest.fixture
+def new_workspace(home):
+    """Returns a function creating a Workspace (Workspace() being a singleton) in home"""
+
+    def _new_workspace(**options) -> Workspace:
+        workspace = Workspace.__new__(Workspace)
+        workspace.init(ItemManager(), str(home), **options)
+        return workspace
+
+    return _new_workspace
+
+
+@pytest.fixture
+def persons() -> list[Person]:
+    return [
+        Person("John", "Smith", datetime.datetime(1974, 4, 5), "J13"),
+        Person("Bob", "Martin", datetime.datetime(1956, 9, 12), "H34"),
+    ]
@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+#
+# MatGest
+
+import os
+import datetime
+
+import pytest
+
+from gestmat.item.backup import BackupStore
+
+
+def _snapshot(day: datetime.date, archive: str = "") -> dict:
+    # Each snapshot shares a part of its content with the others and has a part of its own
+    return {
+        "data": {"shared": {"value": 1}, f"entry {day}": {"value": day.isoformat()}},
+        "empty": {},
+        "archive": {"file": archive} if archive else {},
+    }
+
+
+def _save(store: BackupStore, day: datetime.date, archive: bool = False) -> str:
+    name = f"{day.strftime('%Y_%m_%d')}_save.json"
+    archive_name = ""
+    if archive:
+        archive_name = f"{day.strftime('%Y_%m_%d')}_archive.json"
+        store.write_snapshot(archive_name, {"retired": {str(day): {"day": 1}}}, None)
+    store.write_snapshot(name, _snapshot(day, archive_name), None)
+    return name
+
+
+def _chunks(store: BackupStore) -> set:
+    chunks_dir = os.path.join(store.path, "chunks")
+    return {
+        digest
+        for prefix in os.listdir(chunks_dir)
+        for digest in os.listdir(os.path.join(chunks_dir, prefix))
+    }
+
+
+def _check_readable(store: BackupStore) -> None:
+    """Every remaining manifest can be read, and every remaining chunk is used by one of them"""
+    used = set()
+    for name in store.snapshots():
+        for _, digests in store._read_manifest(name)["sections"]:
+            used.update(digests)
+        for _, entries in store.iter_sections(name):
+            list(entries)
+    assert _chunks(store) == used
+
+
+@pytest.fixture
+def store(tmp_path):
+    return BackupStore(str(tmp_path / "store"), chunk_entries=1)
+
+
+def _saves(store: BackupStore) -> list[str]:
+    return [name for name in store.snapshots() if name.endswith("_save.json")]
+
+
+def _days(start: datetime.date, count: int, step: int = 1) -> list[datetime.date]:
+    return [start + datetime.timedelta(days=i * step) for i in range(count)]
+
+
+def test_keep_daily(store):
+    names = [_save(store, day) for day in _days(datetime.date(2024, 1, 1), 10)]
+    store.keep_daily = 3
+    store.prune()
+    assert _saves(store) == names[-3:]
+    _check_readable(store)
+
+
+def test_keep_monthly(store):
+    # Two saves per month, from January to June
+    days = [datetime.date(2024, month, day) for month in range(1, 7) for day in (5, 20)]
+    names = [_save(store, day) for day in days]
+    store.keep_monthly = 3
+    store.prune()
+    # The last save of each of the last three months
+    assert _saves(store) == [names[7], names[9], names[11]]
+    _check_readable(store)
+
+
+def test_keep_yearly(store):
+    days = [datetime.date(year, month, 1) for year in (2020, 2021, 2022, 2023) for month in (3, 9)]
+    names = [_save(store, day) for day in days]
+    store.keep_yearly = 2
+    store.prune()
+    assert _saves(store) == [names[5], names[7]]
+    _check_readable(store)
+
+
+def test_rules_combined(store):
+    days = _days(datetime.date(2023, 11, 1), 100, step=3)
+    names = [_save(store, day) for day in days]
+    store.keep_daily = 2
+    store.keep_monthly = 2
+    store.keep_yearly = 2
+    store.prune()
+
+    last_of_month = dict()
+    last_of_year = dict()
+    for day, name in zip(days, names):
+        last_of_month[day.year, day.month] = name
+        last_of_year[day.year] = name
+    expected = set(names[-2:])
+    expected.update(list(last_of_month.values())[-2:])
+    expected.update(list(last_of_year.values())[-2:])
+    assert set(_saves(store)) == expected
+    _check_readable(store)
+
+
+def test_no_rule_keeps_latest(store):
+    names = [_save(store, day) for day in _days(datetime.date(2024, 1, 1), 5)]
+    store.prune()
+    assert _saves(store) == names[-1:]
+    _check_readable(store)
+
+
+def test_archives(store):
+    days = _days(datetime.date(2024, 1, 1), 6)
+    # Only the first and the fourth saves have an archive of their own, the others refer to
+    # the previous archive
+    for i, day in enumerate(days):
+        if i in (0, 3):
+            _save(store, day, archive=True)
+        else:
+            archive = "2024_01_01_archive.json" if i < 3 else "2024_01_04_archive.json"
+            store.write_snapshot(
+                f"{day.strftime('%Y_%m_%d')}_save.json", _snapshot(day, archive), None
+            )
+
+    store.keep_daily = 2
+    store.prune()
+    # The archive of the first save is not referenced anymore
+    assert store.snapshots() == [
+        "2024_01_04_archive.json",
+        "2024_01_05_save.json",
+        "2024_01_06_save.json",
+    ]
+    _check_readable(store)
+
+
+def test_shared_chunks_survive(store):
+    names = [_save(store, day) for day in _days(datetime.date(2024, 1, 1), 4)]
+    shared = set(store._read_manifest(names[0])["sections"][0][1]) & set(
+        store._read_manifest(names[-1])["sections"][0][1]
+    )
+    assert shared
+    store.keep_daily = 1
+    store.prune()
+    assert _saves(store) == names[-1:]
+    assert shared <= _chunks(store)
+    assert store.latest() == store.manifest_path(names[-1])
+    _check_readable(store)
+
+
+def test_prune_on_save(tmp_path):
+    store = BackupStore(str(tmp_path / "store"), keep_daily=2)
+    names = [_save(store, day) for day in _days(datetime.date(2024, 1, 1), 5)]
+    assert _saves(store) == names[-2:]
+    _check_readable(store)
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+#
+# MatGest
+
+import os
+import gzip
+import json
+import types
+import struct
+import datetime
+from array import array
+
+import pytest
+
+from conftest import build_manager, state
+from gestmat.item import binary
+
+codecs = [binary.CODEC_NONE, binary.CODEC_GZIP]
+if binary.zstandard is not None:
+    codecs.append(binary.CODEC_ZSTD)
+
+
+@pytest.fixture
+def mega_dict() -> dict:
+    """A snapshot using every kind of section and value of the binary format"""
+    return {
+        "properties": {"ID": {"name": "ID", "unit": "", "select": [], "mandatory": True}},
+        "categories": {"FR": {"description": "Fauteuil", "registered_items": ["i1", "i2"]}},
+        "items": {
+            "i1": {"category": "FR", "properties": [{"ID": "FR 1"}, {"largeur": 42}], "notes": {}},
+            "i2": {
+                "category": "FR",
+                "properties": [{"ID": "Fauteuil électrique"}, {"poids": 12.5}, {"vide": None}],
+                "notes": {"2024/01/02": "réparé"},
+            },
+            "i3": {"category": "PE", "properties": [], "notes": {}},
+        },
+        "persons": {
+            "p1": {
+                "name": "Émile",
+                "surname": "Zoé",
+                "birthday": "1970/01/01",
+                "place": "A1",
+                "note": "",
+                "loans": ["l1", "l2"],
+            },
+            "p2": {
+                "name": "Bob",
+                "surname": "Martin",
+                "birthday": "",
+                "place": "",
+                "note": "n",
+                "loans": [],
+            },
+        },
+        "loans": {
+            "i1": [
+                {
+                    "uuid": "l1",
+                    "person": "p1",
+                    "date": "2024/02/01",
+                    "loan_back": "",
+                    "due_date": "2024/03/01",
+                    "note": "",
+                    "timestamp": 1706745600.25,
+                },
+                {
+                    "uuid": "l2",
+                    "person": "p1",
+                    "date": "2024/02/01",
+                    "loan_back": "2024/02/03",
+                    "due_date": "",
+                    "note": "rendu",
+                    "timestamp": 1706745601.5,
+                },
+            ],
+            "i2": [],
+        },
+        "archive": {"file": "2024_02_03_archive.gms"},
+        "generation": {"id": "0123456789abcdef"},
+        "empty": {},
+    }
+
+
+def _decode(data: bytes) -> dict:
+    return {section: dict(entries) for section, entries in binary.iter_sections(data)}
+
+
+@pytest.mark.parametrize("codec", codecs)
+def test_round_trip(mega_dict, codec):
+    data = binary.encode(mega_dict, codec)
+    assert data.startswith(binary.MAGIC)
+    assert _decode(data) == mega_dict
+
+
+def test_round_trip_big_endian(mega_dict, monkeypatch):
+    expected = binary.encode(mega_dict, binary.CODEC_NONE)
+    # On a big-endian machine, the columns are swapped when written and when read
+    monkeypatch.setattr(binary, "sys", types.SimpleNamespace(byteorder="big"))
+    data = binary.encode(mega_dict, binary.CODEC_NONE)
+    assert data != expected
+    assert _decode(data) == mega_dict
+
+
+def test_columns_are_little_endian():
+    data = binary._pack_fields((array(binary._uint32, [1, 2]), array("d", [0.5]), ["a"]))
+    assert data == b"".join(
+        [
+            binary._field.pack(binary._FIELD_UINT32, 8),
+            struct.pack("<II", 1, 2),
+            binary._field.pack(binary._FIELD_FLOAT64, 8),
+            struct.pack("<d", 0.5),
+            binary._field.pack(binary._FIELD_JSON, 5),
+            b'["a"]',
+        ]
+    )
+
+
+def test_unsupported_version(mega_dict):
+    data = bytearray(binary.encode(mega_dict, binary.CODEC_NONE))
+    data[len(binary.MAGIC)] = 2
+    with pytest.raises(ValueError):
+        list(binary.iter_sections(bytes(data)))
+
+
+def test_convert(mega_dict, tmp_path):
+    json_file = str(tmp_path / "2024_02_03_save.json")
+    mega_dict["archive"]["file"] = "2024_02_03_archive.json"
+    with gzip.open(json_file, "wt", encoding="utf-8") as fout:
+        json.dump(mega_dict, fout)
+
+    binary_file = binary.convert(json_file)
+    assert binary_file == str(tmp_path / "2024_02_03_save.gms")
+    assert sorted(os.listdir(tmp_path)) == ["2024_02_03_save.gms", "2024_02_03_save.json"]
+    assert binary.is_binary(binary_file)
+    converted = {section: dict(entries) for section, entries in binary.read_file(binary_file)}
+    assert converted["archive"] == {"file": "2024_02_03_archive.gms"}
+    assert converted["loans"] == mega_dict["loans"]
+
+
+def test_workspace(new_workspace, persons):
+    workspace = new_workspace(snapshot_format="binary")
+    _, manager = workspace.loan_most_recent()
+    items = build_manager(manager)
+    manager.create_loan(items[0], datetime.datetime(2024, 2, 1), persons[0])
+    loan = manager.create_loan(items[1], datetime.datetime(2024, 2, 2), persons[1], "note")
+    manager.set_due_date(loan, datetime.datetime(2024, 3, 1))
+    manager.give_back(items[0], datetime.datetime(2024, 2, 5))
+    manager.retire_item(items[2])
+    assert workspace.save()
+
+    saves = os.listdir(os.path.join(workspace.path, "sauvegardes"))
+    assert any(name.endswith("_save.gms") for name in saves)
+    success, loaded = new_workspace(snapshot_format="binary").loan_most_recent()
+    assert success
+    assert state(loaded) == state(manager)
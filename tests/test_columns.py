@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+#
+# MatGest
+
+import random
+import datetime
+
+from conftest import build_manager
+from gestmat.item.columns import TableModel, property_value
+from gestmat.item.manager import ItemManager
+from gestmat.item.representation import Item
+
+
+def _check_columns(manager: ItemManager) -> None:
+    """Compares the columns of each category with a scan of its active items"""
+    for category in manager.categories.values():
+        columns = manager.category_columns(category)
+        items = {item for item in manager.items if item._category is category}
+        assert set(columns.rows) == items
+        assert len(columns) == len(items)
+        for item, values in columns.iter_rows():
+            assert columns.row_of[item] == columns.rows.index(item)
+            expected = tuple(property_value(item, prop) for prop in category.properties_order)
+            assert values == expected
+        for prop in category.properties_order:
+            assert columns.column(prop) == [property_value(item, prop) for item in columns.rows]
+
+
+def test_columns():
+    manager = ItemManager()
+    items = build_manager(manager)
+    manager.enable_columns()
+    _check_columns(manager)
+    rng = random.Random(17)
+    fr = manager.categories["FR"]
+    largeur = fr.property_type("largeur")
+
+    for step in range(200):
+        item = rng.choice(items)
+        op = rng.choice(["set", "set", "retire", "unretire", "add"])
+        if op == "set" and largeur in item._properties:
+            manager.set_item_property(item, largeur, str(rng.randrange(30, 60)))
+        elif op == "retire":
+            manager.retire_item(item)
+        elif op == "unretire":
+            manager.unretire_item(item)
+        elif op == "add":
+            new_item = Item(fr, id=f"FR new {step}", largeur="50")
+            manager.add_item(new_item)
+            items.append(new_item)
+        _check_columns(manager)
+
+    for item in rng.sample(items, 10):
+        manager.delete_item(item)
+    _check_columns(manager)
+
+    # A property added to the category gets its column
+    cote = manager.categories["PE"].property_type("cote")
+    manager.update_properties(fr, list(fr.properties_order) + [cote])
+    _check_columns(manager)
+    assert cote in manager.category_columns(fr).columns
+
+
+def test_disabled():
+    manager = ItemManager()
+    build_manager(manager)
+    assert manager.category_columns(manager.categories["FR"]) is None
+
+
+def test_table_model():
+    rows = [
+        ("FR 10", "b", datetime.datetime(2024, 3, 1)),
+        ("FR 9", "a", datetime.datetime(2023, 12, 31)),
+        ("FR 100", "b", None),
+        ("", "a", datetime.datetime(2024, 1, 15)),
+        ("12", "B", datetime.datetime(2024, 1, 15)),
+        ("3,5", "a", datetime.datetime(2022, 6, 1)),
+    ]
+    getters = [lambda row, index=index: row[index] for index in range(3)]
+    model = TableModel(rows, getters, [str, str, datetime.datetime])
+
+    def firsts(specs):
+        return [row[0] for row in model.sorted_rows(specs)]
+
+    # The numbers are sorted as numbers, before the texts
+    assert firsts([(0, False)]) == ["3,5", "12", "", "FR 10", "FR 100", "FR 9"]
+    assert firsts([(0, True)]) == ["FR 9", "FR 100", "FR 10", "", "12", "3,5"]
+    # The dates in chronological order, the rows without date last
+    assert firsts([(2, False)]) == ["3,5", "FR 9", "", "12", "FR 10", "FR 100"]
+    # Several columns, the first one being the main one, the case being ignored (in reverse
+    # order, the rows without date come first)
+    assert firsts([(1, False), (2, True)]) == ["", "FR 9", "3,5", "FR 100", "FR 10", "12"]
+    assert firsts([]) == [row[0] for row in rows]
+    assert model.order(0) is model.order(0)
+
+    # The values of a row changed
+    model.rows[0] = ("1", "b", None)
+    model.invalidate()
+    assert firsts([(0, False)])[:2] == ["1", "3,5"]
+    model.set_rows(rows[:2])
+    assert firsts([(0, False)]) == ["FR 10", "FR 9"]
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+#
+# MatGest
+
+import datetime
+
+import pytest
+
+from conftest import build_manager, state
+from gestmat.item.database import SQLiteStore
+from gestmat.item.manager import ItemManager
+from gestmat.item.representation import Item
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SQLiteStore(str(tmp_path / "gestmat.sqlite3"))
+    yield store
+    store.close()
+
+
+def test_mutations(store, persons):
+    manager = ItemManager()
+    items = build_manager(manager)
+    store.import_manager(manager)
+    store.attach(manager)
+
+    loan = manager.create_loan(items[0], datetime.datetime(2024, 2, 1), persons[0])
+    manager.create_loan(items[1], datetime.datetime(2024, 2, 2), persons[1])
+    manager.set_due_date(loan, datetime.datetime(2024, 3, 1))
+    manager.give_back(items[1], datetime.datetime(2024, 2, 5))
+    manager.edit_person(persons[0], note="edited")
+    manager.retire_item(items[2])
+    manager.delete_item(items[3])
+
+    assert state(store.load()) == state(manager)
+
+
+def test_rename_property(store):
+    manager = ItemManager()
+    couleur = manager.create_property("Couleur", select=["rouge", "bleu"])
+    manager.add_category("CO", "Coussin", ["Couleur"])
+    items = [Item(manager.categories["CO"], couleur="rouge") for _ in range(3)]
+    manager.add_items(items)
+    store.import_manager(manager)
+    store.attach(manager)
+
+    manager.edit_property(couleur, name="Teinte", special_name="TEINTE")
+    manager.set_item_property(items[0], couleur, "bleu")
+
+    loaded = store.load()
+    values = sorted(
+        prop.value for item in loaded.items for prop in item._properties.values() if prop.value
+    )
+    assert values == ["bleu", "rouge", "rouge"]
+    assert {prop.special_name.lower() for prop in loaded.properties} == {"teinte"}
+    assert len(store.find_items(couleur, "rouge")) == 2
+
+
+def test_rename_category(store, persons):
+    manager = ItemManager()
+    items = build_manager(manager)
+    manager.create_loan(items[0], datetime.datetime(2024, 2, 1), persons[0])
+    store.import_manager(manager)
+    store.attach(manager)
+
+    category = manager.categories["FR"]
+    category.name = "FRX"
+    manager.update_category_key(category, "FR")
+    manager.retire_item(items[1])
+
+    loaded = store.load()
+    assert sorted(loaded.categories) == ["FRX", "PE"]
+    assert state(loaded) == state(manager)
+    assert len(loaded.categories["FRX"].registered_items) == 19
+    assert store.available_items(category) and store.loaned_items(category) == [items[0]]
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+#
+# MatGest
+
+import random
+import datetime
+
+from conftest import build_manager
+from gestmat.item.due import DueTracker
+from gestmat.item.manager import ItemManager
+
+
+def test_tracker():
+    tracker = DueTracker()
+    rng = random.Random(15)
+    due = dict()
+    pushed = []
+    for loan in range(200):
+        due[loan] = datetime.date(2024, 1, 1) + datetime.timedelta(days=rng.randrange(60))
+        tracker.push(loan, due[loan])
+        pushed.append(loan)
+    # Given back, due date changed or removed
+    for loan in rng.sample(range(200), 120):
+        if rng.random() < 0.5:
+            tracker.discard(loan)
+            del due[loan]
+        elif rng.random() < 0.5:
+            due[loan] = datetime.date(2024, 1, 1) + datetime.timedelta(days=rng.randrange(60))
+            tracker.push(loan, due[loan])
+            pushed.append(loan)
+        else:
+            tracker.push(loan, None)
+            del due[loan]
+
+    # The loans due on a same day are in the order their due dates were set
+    last_push = {loan: i for i, loan in enumerate(pushed)}
+    order = sorted(due, key=lambda loan: (due[loan], last_push[loan]))
+    assert len(tracker) == len(due)
+    assert tracker.next_due(len(due) + 5) == order
+    limit = datetime.date(2024, 1, 20)
+    assert tracker.overdue(limit) == [loan for loan in order if due[loan] < limit]
+    assert tracker.next_due(10, limit) == [loan for loan in order if due[loan] >= limit][:10]
+    # The stale entries do not pile up
+    assert len(tracker.heap) <= 2 * len(tracker) + 16
+
+
+def test_order_after_give_back():
+    manager = ItemManager()
+    items = build_manager(manager)
+    today = datetime.date(2024, 3, 10)
+    loans = []
+    for i, item in enumerate(items[:6]):
+        loan = manager.create_loan(item, datetime.datetime(2024, 2, 1), manager.empty_person)
+        # Due from March 7th to March 12th, in reverse order of creation
+        manager.set_due_date(loan, datetime.datetime(2024, 3, 12 - i))
+        loans.append(loan)
+
+    assert manager.overdue_loans(today) == [loans[5], loans[4], loans[3]]
+    assert manager.next_due_loans(2, today) == [loans[2], loans[1]]
+
+    manager.give_back(loans[4], datetime.datetime(2024, 3, 9))
+    manager.give_back(items[1], datetime.datetime(2024, 3, 9))
+    manager.retire_item(items[5])
+    assert manager.overdue_loans(today) == [loans[3]]
+    assert manager.next_due_loans(5, today) == [loans[2], loans[0]]
+
+    manager.set_due_date(loans[0], datetime.datetime(2024, 3, 1))
+    manager.set_due_date(loans[3], None)
+    assert manager.overdue_loans(today) == [loans[0]]
+    assert manager.next_due_loans(5, datetime.date(2024, 1, 1)) == [loans[0], loans[2]]
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+#
+# MatGest
+
+import json
+import datetime
+
+from conftest import build_manager, state
+from gestmat.item import workspace as workspace_module
+from gestmat.item.fragments import FragmentCache
+from gestmat.item.serialization import item_to_dict
+
+
+def test_cache():
+    serialized = []
+
+    def to_dict(obj):
+        serialized.append(obj)
+        return {"value": obj}
+
+    cache = FragmentCache()
+    objects = {"a": 1, "b": 2, "c": 3}
+    versions = {"a": 0, "b": 0, "c": 0}
+
+    def entries():
+        return ((key, versions[key], objects[key]) for key in objects)
+
+    def section(version):
+        return cache.section("data", version, entries, to_dict)
+
+    first = section(0)
+    assert serialized == [1, 2, 3]
+    # Same version: the cached content itself
+    assert section(0) is first
+    assert serialized == [1, 2, 3]
+
+    objects["b"] = 20
+    versions["b"] = 1
+    del objects["c"]
+    second = section(1)
+    assert serialized == [1, 2, 3, 20]
+    assert second == {"a": {"value": 1}, "b": {"value": 20}}
+    assert second["a"] is first["a"]
+
+    mega_dict = {"data": second, "other": {"x": [1, "é"]}}
+    assert json.loads(cache.to_json(mega_dict)) == mega_dict
+    assert cache.to_json(mega_dict) == json.dumps(mega_dict)
+
+
+def test_unchanged_save_skipped(new_workspace, monkeypatch):
+    workspace = new_workspace()
+    _, manager = workspace.loan_most_recent()
+    build_manager(manager)
+    assert workspace.save()
+
+    written = []
+    monkeypatch.setattr(workspace, "_write_to_targets", lambda *args: written.append(args) or {})
+    assert workspace.save()
+    assert written == []
+
+
+def test_only_changes_serialized(new_workspace, persons, monkeypatch):
+    workspace = new_workspace()
+    _, manager = workspace.loan_most_recent()
+    items = build_manager(manager)
+    assert workspace.save()
+
+    serialized = []
+
+    def counting_item_to_dict(item):
+        serialized.append(item)
+        return item_to_dict(item)
+
+    monkeypatch.setattr(workspace_module, "item_to_dict", counting_item_to_dict)
+    largeur = manager.categories["FR"].property_type("largeur")
+    manager.set_item_property(items[3], largeur, "60")
+    manager.create_loan(items[4], datetime.datetime(2024, 2, 1), persons[0])
+    assert workspace.save()
+    assert serialized == [items[3]]
+
+    success, loaded = new_workspace().loan_most_recent()
+    assert success
+    assert state(loaded) == state(manager)
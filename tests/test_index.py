@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+#
+# MatGest
+
+import math
+import random
+
+import pytest
+
+from conftest import build_manager
+from gestmat.item.columns import sort_key
+from gestmat.item.index import to_number
+from gestmat.item.manager import ItemManager
+
+odd_values = ["nan", "NaN", "inf", "-inf", "Infinity", float("nan"), float("inf"), "", "abc"]
+
+
+@pytest.mark.parametrize(
+    "value, number",
+    [("40", 40.0), (" 40,5 ", 40.5), (3, 3), (2.5, 2.5), (10**400, 10**400), (True, None)]
+    + [(value, None) for value in odd_values],
+)
+def test_to_number(value, number):
+    assert to_number(value) == number
+
+
+def test_sort_key():
+    values = ["12", "nan", "3,5", "inf", "b", float("nan"), "A", 7]
+    ordered = sorted(values, key=sort_key)
+    # The values which are not finite numbers are sorted as texts, after the numbers
+    assert ordered[:3] == ["3,5", 7, "12"]
+    assert all(sort_key(value)[0] == 1 for value in ordered[3:])
+
+
+@pytest.fixture
+def manager():
+    manager = ItemManager()
+    items = build_manager(manager)
+    rng = random.Random(4)
+    largeur = manager.categories["FR"].properties_order[1]
+    for item in items[:20]:
+        manager.set_item_property(item, largeur, rng.choice(odd_values + ["40", "41,5", 42]))
+    return manager
+
+
+def _check(manager: ItemManager) -> None:
+    """Compares the results of the index with a scan of the active items"""
+    largeur = manager.categories["FR"].properties_order[1]
+    values = [item._properties[prop].value for item in manager.items for prop in item._properties]
+    for value in values + ["40", 42, "nan", "inf", "missing"]:
+        expected = {
+            item
+            for item in manager.items
+            if largeur in item._properties and item._properties[largeur].value == value
+        }
+        # nan is never equal to itself
+        if isinstance(value, float) and math.isnan(value):
+            continue
+        assert manager.find(largeur, value) == expected
+
+    for low, high in [(None, None), (40, 41.5), (41, None), (None, 41), (-math.inf, math.inf)]:
+        expected = set()
+        for item in manager.items:
+            if largeur not in item._properties:
+                continue
+            number = to_number(item._properties[largeur].value)
+            if number is None:
+                continue
+            if (low is None or number >= low) and (high is None or number <= high):
+                expected.add(item)
+        found = manager.find_range(largeur, low, high)
+        assert found == expected
+        assert all(math.isfinite(float(to_number(i._properties[largeur].value))) for i in found)
+    sorted_numbers = manager.index.sorted_numbers.get(largeur, [])
+    assert sorted_numbers == sorted(set(sorted_numbers))
+
+
+def test_find_consistent(manager):
+    _check(manager)
+    largeur = manager.categories["FR"].properties_order[1]
+    items = sorted(manager.items, key=lambda item: item._uuid)
+    rng = random.Random(7)
+
+    for item in items[:6]:
+        manager.retire_item(item)
+        _check(manager)
+    for item in items[:3]:
+        manager.unretire_item(item)
+        _check(manager)
+    for item in items[6:12]:
+        manager.delete_item(item)
+        _check(manager)
+    for item in items[12:]:
+        if largeur in item._properties:
+            manager.set_item_property(item, largeur, rng.choice(odd_values + ["40", "43"]))
+            _check(manager)
+            manager.set_item_property(item, largeur, "41,5")
+            _check(manager)
+
+    for item in list(manager.items):
+        manager.delete_item(item)
+    _check(manager)
+    assert not manager.find_range(largeur)
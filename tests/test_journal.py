@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+#
+# MatGest
+
+import os
+import datetime
+
+import pytest
+
+from conftest import build_manager, state
+from gestmat.item.manager import Person
+from gestmat.item.journal import Journal
+
+
+def _create_loan(manager, items, persons, loans):
+    person = Person("Alice", "Durand", datetime.datetime(1990, 1, 2), "A1", "new")
+    manager.create_loan(items[5], datetime.datetime(2024, 3, 1), person, "loan note")
+
+
+def _give_back(manager, items, persons, loans):
+    manager.give_back(loans[0], datetime.datetime(2024, 3, 2))
+
+
+def _retire_item(manager, items, persons, loans):
+    manager.retire_item(items[1], date=datetime.datetime(2024, 3, 3))
+
+
+def _set_property(manager, items, persons, loans):
+    prop = next(p for p in items[3]._properties if p.special_name == "largeur")
+    manager.set_item_property(items[3], prop, "99")
+
+
+def _edit_person(manager, items, persons, loans):
+    manager.edit_person(persons[0], note="edited", place="K2")
+
+
+def _set_due_date(manager, items, persons, loans):
+    manager.set_due_date(loans[2], datetime.datetime(2024, 4, 1))
+
+
+operations = [_create_loan, _give_back, _retire_item, _set_property, _edit_person, _set_due_date]
+
+
+@pytest.fixture
+def saved(new_workspace, persons):
+    """A workspace with a journal whose snapshot holds a few items and loans"""
+    workspace = new_workspace(journal=True)
+    _, manager = workspace.loan_most_recent()
+    items = build_manager(manager)
+    loans = [
+        manager.create_loan(items[0], datetime.datetime(2024, 2, 1), persons[0]),
+        manager.create_loan(items[1], datetime.datetime(2024, 2, 2), persons[0], "note"),
+        manager.create_loan(items[2], datetime.datetime(2024, 2, 3), persons[1]),
+    ]
+    assert workspace.save()
+    assert workspace.journal.count == 0
+    return workspace, manager, items, loans
+
+
+def _reload(new_workspace):
+    workspace = new_workspace(journal=True)
+    success, manager = workspace.loan_most_recent()
+    assert success
+    return workspace, manager
+
+
+@pytest.mark.parametrize("operation", operations, ids=lambda op: op.__name__.strip("_"))
+def test_replay(saved, persons, new_workspace, operation):
+    workspace, manager, items, loans = saved
+    operation(manager, items, persons, loans)
+    assert workspace.save()
+    # The mutation was appended to the journal, not written in a new snapshot
+    assert workspace.journal.count > 0
+
+    _, loaded = _reload(new_workspace)
+    assert state(loaded) == state(manager)
+
+
+def test_replay_all(saved, persons, new_workspace):
+    workspace, manager, items, loans = saved
+    for operation in operations:
+        operation(manager, items, persons, loans)
+        assert workspace.save()
+    assert workspace.journal.count >= len(operations)
+
+    reloaded, loaded = _reload(new_workspace)
+    assert state(loaded) == state(manager)
+    assert reloaded.journal.count == workspace.journal.count
+
+
+def test_torn_last_line(saved, persons, new_workspace):
+    workspace, manager, items, loans = saved
+    _create_loan(manager, items, persons, loans)
+    _edit_person(manager, items, persons, loans)
+    assert workspace.save()
+    expected = state(manager)
+
+    # The program stopped while a record was being appended
+    with open(workspace.journal.path, "a", encoding="utf-8") as fout:
+        fout.write('{"op": "give_back", "loan": "')
+
+    _, loaded = _reload(new_workspace)
+    assert state(loaded) == expected
+
+
+def test_crash_before_reset(saved, persons, new_workspace, monkeypatch):
+    workspace, manager, items, loans = saved
+    _create_loan(manager, items, persons, loans)
+    _give_back(manager, items, persons, loans)
+    _set_property(manager, items, persons, loans)
+    assert workspace.save()
+    assert workspace.journal.count == 3
+
+    # The journal is compacted into a new snapshot of the same day, and the program stops
+    # before the journal is reset: the journal still holds the records of the new snapshot
+    _set_due_date(manager, items, persons, loans)
+    workspace.journal.needs_snapshot = True
+    monkeypatch.setattr(Journal, "reset", lambda self, base, generation=None: True)
+    assert workspace.save()
+    monkeypatch.undo()
+    base, _, records = workspace.journal.read()
+    assert len(records) == 3
+
+    reloaded, loaded = _reload(new_workspace)
+    assert state(loaded) == state(manager)
+    active_loans = [loan for item_loans in loaded.loans.values() for loan in item_loans]
+    assert len(active_loans) == len({loan.uuid for loan in active_loans})
+
+    # The journal is not trusted anymore, the next save writes a snapshot
+    assert reloaded.journal.needs_compaction(base)
+    assert reloaded.save()
+    _, loaded = _reload(new_workspace)
+    assert state(loaded) == state(manager)
+
+
+def test_foreign_journal_ignored(saved, persons, new_workspace):
+    workspace, manager, items, loans = saved
+    _create_loan(manager, items, persons, loans)
+    assert workspace.save()
+    expected = state(manager)
+
+    # A journal written after another snapshot (e.g. restored from a backup) is not replayed
+    base, generation, records = workspace.journal.read()
+    workspace.journal.reset(base, "other")
+    workspace.journal.append(records)
+
+    _, loaded = _reload(new_workspace)
+    assert state(loaded) != expected
+    assert len(loaded.loans) == 3
+    assert os.path.exists(workspace.journal.path)
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+#
+# MatGest
+
+import datetime
+
+import pytest
+
+from conftest import build_manager, state
+from gestmat.item import workspace as workspace_module
+from gestmat.item.loader import SnapshotBuilder
+
+
+class RecordingBuilder(SnapshotBuilder):
+    """SnapshotBuilder recording the sections which had to be kept aside"""
+
+    deferred = []
+
+    def feed(self, section, entries):
+        super().feed(section, entries)
+        RecordingBuilder.deferred += list(self._deferred)
+
+
+@pytest.fixture
+def recording(monkeypatch):
+    RecordingBuilder.deferred = []
+    monkeypatch.setattr(workspace_module, "SnapshotBuilder", RecordingBuilder)
+    return RecordingBuilder
+
+
+def _fill(manager, persons):
+    items = build_manager(manager)
+    manager.create_loan(items[0], datetime.datetime(2024, 2, 1), persons[0])
+    manager.create_loan(items[1], datetime.datetime(2024, 2, 2), persons[1])
+    manager.give_back(items[1], datetime.datetime(2024, 2, 3))
+    manager.retire_item(items[2])
+
+
+@pytest.mark.parametrize(
+    "options",
+    [{}, {"snapshot_format": "binary"}, {"backup_store": True}],
+    ids=["json", "binary", "backup_store"],
+)
+def test_nothing_deferred(new_workspace, persons, recording, options):
+    workspace = new_workspace(**options)
+    _, manager = workspace.loan_most_recent()
+    _fill(manager, persons)
+    assert workspace.save()
+
+    success, loaded = new_workspace(**options).loan_most_recent()
+    assert success
+    assert not loaded.archive_loaded
+    # The archive is read by another builder when it is needed
+    assert state(loaded) == state(manager)
+    assert loaded.archive_loaded
+    assert recording.deferred == []
+
+
+def test_sections_out_of_order(new_workspace, persons):
+    workspace = new_workspace()
+    _, manager = workspace.loan_most_recent()
+    _fill(manager, persons)
+    manager.load_archive()
+    mega_dict = workspace._snapshot()
+    mega_dict.update(workspace._archive_snapshot())
+
+    builder = SnapshotBuilder()
+    for section in reversed(list(mega_dict)):
+        builder.feed(section, mega_dict[section].items())
+        if section == "loans":
+            assert "loans" in builder._deferred
+    loaded = builder.finish()
+    assert not builder._deferred
+    assert state(loaded) == state(manager)
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+#
+# MatGest
+
+import random
+import datetime
+
+from conftest import build_manager
+from gestmat.item.manager import ItemManager, Person
+
+
+def _check_availability(manager: ItemManager) -> None:
+    """Compares the available and loaned sets with a scan of the active items"""
+    for category in manager.categories.values():
+        items = {item for item in manager.items if item._category is category}
+        loaned = {item for item in items if manager.loans.get(item)}
+        assert manager.loaned_items(category) == loaned
+        assert manager.available_items(category) == items - loaned
+
+
+def test_availability():
+    manager = ItemManager()
+    items = build_manager(manager)
+    _check_availability(manager)
+    rng = random.Random(12)
+    date = datetime.datetime(2024, 1, 1)
+
+    for step in range(300):
+        date += datetime.timedelta(hours=6)
+        item = rng.choice(items)
+        op = rng.choice(["lend", "lend", "give_back", "retire", "unretire"])
+        if op == "lend" and item in manager.items:
+            manager.create_loan(item, date, Person(f"N{step % 7}", "S", date))
+        elif op == "give_back" and manager.loans.get(item):
+            manager.give_back(rng.choice(list(manager.loans[item])), date)
+        elif op == "retire":
+            manager.retire_item(item, date=date)
+        elif op == "unretire":
+            manager.unretire_item(item)
+        _check_availability(manager)
+
+    for item in items[:5]:
+        manager.delete_item(item)
+    _check_availability(manager)
+    # The retired and deleted items are neither available nor loaned
+    for category in manager.categories.values():
+        listed = manager.available_items(category) | manager.loaned_items(category)
+        assert listed <= manager.items
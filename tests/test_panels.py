@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+#
+# MatGest
+
+import datetime
+
+import pytest
+
+dpg = pytest.importorskip("dearpygui.dearpygui")
+
+from conftest import build_manager  # noqa: E402
+from gestmat.item.manager import Person  # noqa: E402
+from gestmat.ui.panels import state as state_module  # noqa: E402
+from gestmat.ui.panels.state import StatePanel  # noqa: E402
+
+
+@pytest.fixture
+def panel(new_workspace, monkeypatch):
+    dpg.create_context()
+    workspace = new_workspace()
+    _, manager = workspace.loan_most_recent()
+    monkeypatch.setattr(state_module, "workspace", workspace)
+    panel = StatePanel(manager)
+    panel.show(dpg.add_window())
+    yield panel
+    dpg.destroy_context()
+
+
+def _surnames(panel: StatePanel) -> list[str]:
+    return sorted(values[2] for _, values in panel.memory["table"].rows)
+
+
+def test_table_follows_events(panel, persons):
+    manager = panel.manager
+    items = build_manager(manager)
+    first = manager.create_loan(items[0], datetime.datetime(2024, 2, 1), persons[0])
+    # Built again on the table of the loans, the panel being stale since it was shown
+    panel.refresh()
+    table = panel.memory["table"]
+    assert _surnames(panel) == ["Smith"]
+
+    with manager.events.batch():
+        manager.create_loan(items[1], datetime.datetime(2024, 2, 2), persons[1])
+        manager.create_loan(items[2], datetime.datetime(2024, 2, 3), persons[1])
+    manager.edit_person(persons[1], surname="Dupont")
+    manager.give_back(first, datetime.datetime(2024, 2, 4))
+
+    # The rows were updated in place, the table was not built again
+    assert panel.memory["table"] is table
+    assert not panel.stale
+    assert _surnames(panel) == ["Dupont", "Dupont"]
+
+
+def test_give_back_from_due_view(panel, persons):
+    manager = panel.manager
+    items = build_manager(manager)
+    loans = []
+    for i, item in enumerate(items[:3]):
+        loan = manager.create_loan(item, datetime.datetime(2024, 2, 1), Person(f"N{i}", "S"))
+        manager.set_due_date(loan, datetime.datetime(2024, 3, 1 + i))
+        loans.append(loan)
+
+    panel.load_subpanel("due_view")
+    dpg.set_value(panel.memory["checkbox"][loans[1]], True)
+    panel.give_back()
+
+    # The due view is built again without the loan given back
+    assert loans[1].finished
+    assert panel.memory["view"] == "due_view"
+    assert "table" not in panel.memory
+    assert set(panel.memory["checkbox"]) == {loans[0], loans[2]}
@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+#
+# MatGest
+
+import datetime
+
+import pytest
+
+from conftest import build_manager
+from gestmat.item.database import SQLiteStore
+from gestmat.item.manager import ItemManager, Person
+from gestmat.item.persons import PersonRegistry
+from gestmat.util import ProtectedDatetime
+
+
+def test_registry():
+    registry = PersonRegistry()
+    zoe = Person("Zoé", "Lefèvre", datetime.datetime(1970, 1, 1))
+    others = [
+        Person("Bob", "Martin"),
+        Person("Alice", "Martin", datetime.datetime(1980, 5, 6)),
+        Person("Éric", "lefebvre"),
+        Person("", ""),
+    ]
+    for person in [zoe] + others:
+        registry.add(person)
+    registry.add(zoe)
+
+    # Case, accents and spaces are ignored, and so is the type of the birthday
+    assert registry.find("  LEFEVRE ", "zoe", datetime.date(1970, 1, 1)) is zoe
+    birthday = ProtectedDatetime(datetime.datetime(1970, 1, 1))
+    assert registry.find("Lefèvre", "Zoé", birthday) is zoe
+    assert registry.find("Lefèvre", "Zoé", None) is None
+    assert registry.find("Martin", "Bob", ProtectedDatetime("")) is others[0]
+    assert registry.find("", "", None) is None
+
+    assert registry.search("LEF") == [others[2], zoe]
+    assert registry.search("mart") == [others[1], others[0]]
+    assert registry.search("x") == []
+    assert len(registry.sorted()) == 5
+
+    zoe.surname = "Durand"
+    registry.update(zoe)
+    assert registry.find("Lefèvre", "Zoé", datetime.date(1970, 1, 1)) is None
+    assert registry.search("lef") == [others[2]]
+    assert registry.search("d") == [zoe]
+    registry.remove(zoe)
+    assert zoe not in registry
+    assert registry.search("d") == []
+
+
+def test_merged_on_loan(persons):
+    manager = ItemManager()
+    items = build_manager(manager)
+    manager.create_loan(items[0], datetime.datetime(2024, 2, 1), persons[0])
+    same = Person("john", "SMITH", datetime.datetime(1974, 4, 5), "J14")
+    loan = manager.create_loan(items[1], datetime.datetime(2024, 2, 2), same)
+    assert loan.person is persons[0]
+    assert manager.person_loans(persons[0]) == manager.loans[items[0]] | {loan}
+
+    # Another birthday, another person, also when merge_person is False
+    other = Person("John", "Smith", datetime.datetime(1975, 4, 5))
+    assert manager.create_loan(items[2], datetime.datetime(2024, 2, 3), other).person is other
+    again = Person("John", "Smith", datetime.datetime(1974, 4, 5))
+    loan = manager.create_loan(items[3], datetime.datetime(2024, 2, 4), again, merge_person=False)
+    assert loan.person is again
+    assert manager.persons == {persons[0], other, again}
+
+    manager.edit_person(persons[0], surname="Smyth")
+    assert manager.find_person("Smith", "John", datetime.datetime(1974, 4, 5)) is again
+    assert manager.search_persons("smy") == [persons[0]]
+
+
+def _fill(manager, persons):
+    """Lends two items, Bob Martin (persons[1]) being retired once his item is given back"""
+    items = build_manager(manager)
+    manager.create_loan(items[0], datetime.datetime(2024, 2, 1), persons[0])
+    manager.create_loan(items[1], datetime.datetime(2024, 2, 2), persons[1])
+    manager.give_back(items[1], datetime.datetime(2024, 2, 3))
+    return items
+
+
+def _load_saved(new_workspace, persons, options):
+    if options.get("database"):
+        store = SQLiteStore(options["database"])
+        manager = ItemManager()
+        store.attach(manager)
+        _fill(manager, persons)
+        store.import_manager(manager)
+        return store.load()
+    workspace = new_workspace(**options)
+    _, manager = workspace.loan_most_recent()
+    _fill(manager, persons)
+    assert workspace.save()
+    success, loaded = new_workspace(**options).loan_most_recent()
+    assert success
+    return loaded
+
+
+def _available(manager):
+    return sorted(manager.items - set(manager.loans), key=lambda item: item._uuid)
+
+
+@pytest.fixture(params=["json", "binary", "database"])
+def options(request, tmp_path):
+    if request.param == "binary":
+        return {"snapshot_format": "binary"}
+    if request.param == "database":
+        return {"database": str(tmp_path / "gestmat.sqlite3")}
+    return {}
+
+
+def test_new_borrower_keeps_archive(new_workspace, persons, options):
+    loaded = _load_saved(new_workspace, persons, options)
+    assert not loaded.archive_loaded
+
+    newcomer = Person("Alice", "Durand", datetime.datetime(1980, 1, 2), "B2")
+    loan = loaded.create_loan(_available(loaded)[0], datetime.datetime(2024, 3, 1), newcomer)
+    assert loan.person is newcomer
+    # Nobody of the archive has this name, there is no need to read it
+    assert not loaded.archive_loaded
+
+
+def test_archived_borrower_merged(new_workspace, persons, options):
+    loaded = _load_saved(new_workspace, persons, options)
+    again = Person("BOB", "martin", datetime.datetime(1956, 9, 12), "H34")
+    loan = loaded.create_loan(_available(loaded)[0], datetime.datetime(2024, 3, 1), again)
+    assert loaded.archive_loaded
+    assert loan.person is not again
+    assert loan.person.uuid == persons[1].uuid
+    assert loan.person in loaded.persons
+
+
+def test_keys_saved_without_archive(new_workspace, persons):
+    workspace = new_workspace()
+    _, manager = workspace.loan_most_recent()
+    _fill(manager, persons)
+    assert workspace.save()
+
+    workspace = new_workspace()
+    _, loaded = workspace.loan_most_recent()
+    newcomer = Person("Alice", "Durand", datetime.datetime(1980, 1, 2), "B2")
+    loaded.create_loan(_available(loaded)[0], datetime.datetime(2024, 3, 1), newcomer)
+    # The snapshot written without the archive still knows its persons
+    mega_dict = workspace._snapshot()
+    assert not loaded.archive_loaded
+    assert workspace._archived_persons() == {persons[1].uuid: ("martin", "bob", (1956, 9, 12))}
+    assert "retired_persons" not in mega_dict
+
+
+def test_without_keys(persons):
+    # Saves written without the keys of the archived persons: the archive is always searched
+    manager = ItemManager()
+    _fill(manager, persons)
+    archived = []
+    manager.set_archive_loader(archived.append)
+    assert manager.archived_person_keys is None
+    manager.find_person("Durand", "Alice", None)
+    assert archived == [manager]
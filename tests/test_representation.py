@@ -0,0 +1,249 @@
+# -*- coding: utf-8 -*-
+#
+# MatGest
+
+import gc
+import os
+import gzip
+import uuid
+import datetime
+
+import pytest
+
+from conftest import build_manager
+from gestmat.item.manager import ItemManager, ItemLoan
+from gestmat.item.representation import Item, ItemProperty, define_new_property
+from gestmat.item.representation import uuid_to_int, uuid_to_str
+from gestmat.item.representation import restore_property_classes
+
+
+def test_rename_property():
+    manager = ItemManager()
+    couleur = manager.create_property("Couleur", select=["rouge", "bleu"])
+    manager.add_category("CO", "Coussin", ["Couleur"])
+    item = Item(manager.categories["CO"], couleur="rouge")
+    manager.add_item(item)
+
+    manager.edit_property(couleur, name="Teinte", special_name="TEINTE")
+    assert ItemProperty.get("teinte") is couleur
+    assert ItemProperty.get("couleur") is None
+
+    # The old name is free for a new property, which does not change the renamed one
+    new = manager.create_property("Couleur", unit="cm")
+    assert new is not couleur
+    assert (new.name, new.special_name, new.unit) == ("Couleur", "Couleur", "cm")
+    assert (couleur.name, couleur.special_name, couleur.unit) == ("Teinte", "TEINTE", "")
+    assert ItemProperty.get("couleur") is new
+    assert ItemProperty.get("teinte") is couleur
+    assert manager.find("teinte", "rouge") == {item}
+    assert Item(manager.categories["CO"], teinte="bleu")._properties[couleur].value == "bleu"
+    # A save refers to the property by its new name
+    teinte = define_new_property("Teinte", str, select=["rouge", "bleu"], special_name="TEINTE")
+    assert teinte is couleur
+
+
+def test_property_conflict():
+    manager = ItemManager()
+    largeur = manager.create_property("largeur", unit="cm", select=["40", "42"])
+    # Defined again the same way (e.g. when a save is loaded), the class is reused
+    assert manager.create_property("largeur", unit="cm", select=["40", "42"]) is largeur
+
+    other = ItemManager()
+    for attributes in (
+        dict(unit="mm", select=["40", "42"]),
+        dict(unit="cm", select=[]),
+        dict(unit="cm", select=["40", "42"], mandatory=True),
+        dict(unit="cm", select=["40", "42"], value_type=int),
+    ):
+        with pytest.raises(ValueError):
+            other.create_property("largeur", **attributes)
+    assert not other.properties
+    # The class used by the first manager is left as it was
+    assert (largeur.unit, largeur.select, largeur.mandatory) == ("cm", ["40", "42"], False)
+    assert largeur.__annotations__["value"] is str
+
+
+def test_property_conflict_damaged_save(new_workspace):
+    workspace = new_workspace()
+    _, manager = workspace.loan_most_recent()
+    build_manager(manager)
+    assert workspace.save()
+    # A more recent save, damaged after the definition of a property which changed since
+    damaged = os.path.join(workspace.path, "sauvegardes", "2099_01_01_save.json")
+    with gzip.open(damaged, "wt", encoding="utf-8") as fout:
+        fout.write('{"properties": {"largeur": {"name": "largeur", "unit": "mm"}}, "items": {')
+
+    # As in a new process, where the first save loaded defines the properties
+    restore_property_classes(({}, {}))
+    success, loaded = new_workspace().loan_most_recent()
+    assert success
+    assert len(loaded.items) == 25
+    assert loaded.categories["FR"].property_type("largeur").unit == "cm"
+
+
+def test_rename_property_case():
+    manager = ItemManager()
+    largeur = manager.create_property("largeur", unit="cm")
+    manager.edit_property(largeur, name="Largeur", special_name="LARGEUR")
+    assert ItemProperty.get("largeur") is largeur
+    assert manager.create_property("Largeur", unit="cm") is largeur
+
+
+def test_uuids():
+    for _ in range(20):
+        text = str(uuid.uuid4())
+        assert isinstance(uuid_to_int(text), int)
+        assert uuid_to_str(uuid_to_int(text)) == text
+    # The ids which are not uuids (e.g. in old saves) are kept as they are
+    for text in ["", "item 12", "0"]:
+        assert uuid_to_int(text) == text
+        assert uuid_to_str(text) == text
+
+
+def test_uuids_saved(new_workspace, persons):
+    workspace = new_workspace()
+    _, manager = workspace.loan_most_recent()
+    items = build_manager(manager)
+    items[0]._uuid = "item 0"
+    persons[0].uuid = "person 0"
+    loan = manager.create_loan(items[0], datetime.datetime(2024, 2, 1), persons[0])
+    manager.create_loan(items[1], datetime.datetime(2024, 2, 1), persons[1])
+    assert workspace.save()
+
+    success, loaded = new_workspace().loan_most_recent()
+    assert success
+    assert {item._uuid for item in loaded.items} == {item._uuid for item in manager.items}
+    assert {person.uuid for person in loaded.persons} == {"person 0", persons[1].uuid}
+    (loaded_loan,) = next(loans for item, loans in loaded.loans.items() if item._uuid == "item 0")
+    assert loaded_loan.uuid == loan.uuid
+    assert loaded_loan.person.uuid == "person 0"
+
+
+def test_slots(persons):
+    manager = ItemManager()
+    items = build_manager(manager)
+    loan = ItemLoan(items[0], datetime.datetime(2024, 2, 1), persons[0], "")
+    largeur = manager.categories["FR"].property_type("largeur")
+    # No dict per object
+    for obj in (items[0], persons[0], loan, items[0]._properties[largeur]):
+        assert not hasattr(obj, "__dict__")
+    for obj in (persons[0], loan, items[0]._properties[largeur]):
+        with pytest.raises(AttributeError):
+            obj.misspelled = 1
+
+
+def test_registries():
+    manager = ItemManager()
+    items = build_manager(manager)
+    fr = manager.categories["FR"]
+    largeur = fr.property_type("largeur")
+    assert set(largeur.registered_items) == set(items[:20])
+
+    # An item which is dropped (here, one not registered in its category) leaves the
+    # registries of its properties
+    Item(fr, __no_registration__=True, id="dropped", largeur="40")
+    gc.collect()
+    assert len(largeur.registered_items) == 20
+
+    manager.retire_item(items[0])
+    assert items[0] not in fr.registered_items
+    assert items[0] in largeur.registered_items
+    manager.unretire_item(items[0])
+    assert items[0] in fr.registered_items
+
+    manager.delete_item(items[1])
+    assert items[1] not in fr.registered_items
+    assert items[1] not in largeur.registered_items
+    items[2].remove_property(largeur)
+    assert items[2] not in largeur.registered_items
+    assert len(largeur.registered_items) == 18
+
+
+def test_getattr():
+    manager = ItemManager()
+    items = build_manager(manager)
+    largeur = manager.categories["FR"].property_type("largeur")
+    assert items[0].largeur is items[0]._properties[largeur]
+    assert items[0].LARGEUR is items[0].largeur
+    assert items[0].id.value == "FR 0"
+    # The special name of "Côté" has no accent
+    assert items[20].cote.value == "gauche"
+    with pytest.raises(AttributeError):
+        items[0].cote
+    with pytest.raises(AttributeError):
+        items[0].missing
+    assert getattr(items[0], "missing", None) is None
+
+
+def test_getattr_renamed():
+    manager = ItemManager()
+    items = build_manager(manager)
+    largeur = manager.categories["FR"].property_type("largeur")
+    manager.edit_property(largeur, name="Largeur assise", special_name="LARGEURASSISE")
+    assert items[0].largeurassise is items[0]._properties[largeur]
+    assert items[0].LargeurAssise.value == "40"
+    with pytest.raises(AttributeError):
+        items[0].largeur
+
+
+def test_getattr_removed():
+    manager = ItemManager()
+    items = build_manager(manager)
+    category = manager.categories["FR"]
+    largeur = category.property_type("largeur")
+    identifier = category.property_type("id")
+
+    # Still a property of the item, but no longer of its category
+    manager.update_properties(category, [identifier])
+    assert category.property_type("largeur") is None
+    assert items[1].largeur.value == "41"
+
+    items[1].remove_property(largeur)
+    with pytest.raises(AttributeError):
+        items[1].largeur
+    assert items[2].largeur.value == "42"
+
+    # Removed from the category and from its items
+    manager.categories["PE"].remove_property("cote")
+    with pytest.raises(AttributeError):
+        items[20].cote
+
+
+class _CountedSet(set):
+    """Set counting the scans of its elements"""
+
+    scans = 0
+
+    def __iter__(self):
+        self.scans += 1
+        return super().__iter__()
+
+
+def test_getattr_lookup(monkeypatch):
+    """item.<name> is a lookup in the names of the category, built once, not a scan"""
+    manager = ItemManager()
+    names = [f"prop{i}" for i in range(200)]
+    for name in names:
+        manager.create_property(name)
+    manager.add_category("C", "Category", names)
+    category = manager.categories["C"]
+    category.properties = _CountedSet(category.properties)
+    category.properties_changed()
+    items = [Item(category, **{name: f"{i}-{j}" for j, name in enumerate(names)}) for i in range(3)]
+
+    def fail(name):
+        raise AssertionError(f"{name} looked up in all the properties")
+
+    monkeypatch.setattr(ItemProperty, "get", fail)
+    category.properties.scans = 0
+    for i, item in enumerate(items):
+        for j, name in enumerate(names):
+            assert getattr(item, name).value == f"{i}-{j}"
+            assert getattr(item, name.upper()) is getattr(item, name)
+    # The properties were scanned once, for the names of the category
+    assert category.properties.scans == 1
+
+    # Built again once the names changed
+    manager.edit_property(category.property_type("prop7"), special_name="LARGEUR")
+    assert items[0].largeur.value == "0-7"
+    assert category.properties.scans == 2
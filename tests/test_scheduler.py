@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+#
+# MatGest
+
+import datetime
+import threading
+
+from conftest import build_manager, state
+from gestmat.item.scheduler import SaveScheduler
+
+
+def test_requests_coalesced():
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def save():
+        calls.append(len(calls))
+        started.set()
+        release.wait(5)
+        return True
+
+    scheduler = SaveScheduler(save)
+    scheduler.request()
+    assert started.wait(5)
+    # Requested while the first save is running: a single save follows
+    for _ in range(5):
+        scheduler.request()
+    release.set()
+    assert scheduler.flush(5)
+    assert len(calls) == 2
+    assert scheduler.stop(5)
+
+
+def test_failed_save():
+    def save():
+        raise OSError("disk full")
+
+    scheduler = SaveScheduler(save)
+    scheduler.request()
+    assert not scheduler.flush(5)
+    assert not scheduler.stop(5)
+
+
+def test_stop_writes_pending():
+    release = threading.Event()
+    calls = []
+
+    def save():
+        release.wait(5)
+        calls.append(len(calls))
+        return True
+
+    scheduler = SaveScheduler(save)
+    scheduler.request()
+    scheduler.request()
+    release.set()
+    assert scheduler.stop(5)
+    assert calls
+    assert not scheduler._thread.is_alive()
+
+
+def test_workspace_close(new_workspace, persons):
+    workspace = new_workspace(background=True)
+    _, manager = workspace.loan_most_recent()
+    items = build_manager(manager)
+    manager.create_loan(items[0], datetime.datetime(2024, 2, 1), persons[0])
+    # Only scheduled, the save is written by the writer thread at the latest when closing
+    assert workspace.save()
+    assert workspace.close(5)
+    assert workspace.scheduler is None
+
+    success, loaded = new_workspace().loan_most_recent()
+    assert success
+    assert state(loaded) == state(manager)
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+#
+# MatGest
+
+import datetime
+
+import pytest
+
+from conftest import build_manager
+from gestmat.item.manager import ItemManager
+from gestmat.item.search import SearchKeys, person_texts, search_key
+from gestmat.util import strip_accents
+
+
+@pytest.mark.parametrize(
+    "text, stripped",
+    [
+        ("FR 12", "FR 12"),
+        ("Élève à l'école", "Eleve a l'ecole"),
+        ("Côté GAUCHE", "Cote GAUCHE"),
+        ("Noël Müller", "Noel Muller"),
+        # The other non ASCII characters are dropped
+        ("Straße ½", "Strae "),
+        ("", ""),
+    ],
+)
+def test_strip_accents(text, stripped):
+    assert strip_accents(text) == stripped
+
+
+def test_search_key():
+    assert search_key(["Zoé", "LEFÈVRE", 12, None]) == "zoe lefevre 12 none"
+
+
+def test_keys_cached(persons):
+    computed = []
+
+    def texts(person):
+        computed.append(person)
+        return person_texts(person)
+
+    manager = ItemManager()
+    items = build_manager(manager)
+    keys = SearchKeys(texts)
+    manager.create_loan(items[0], datetime.datetime(2024, 2, 1), persons[0])
+    assert keys.get(persons[0]) == "smith john 1974/04/05 j13 "
+    assert keys.get(persons[0]) == keys.get(persons[0])
+    assert computed == [persons[0]]
+
+    # Computed again once the person is edited through the manager
+    manager.edit_person(persons[0], surname="Smïth-Dupré")
+    assert keys.get(persons[0]).startswith("smith-dupre john")
+    assert computed == [persons[0]] * 2
+    keys.discard(persons[0])
+    assert len(keys) == 0
+
+
+def test_loan_keys(persons):
+    manager = ItemManager()
+    items = build_manager(manager)
+    loan = manager.create_loan(items[0], datetime.datetime(2024, 2, 1), persons[0])
+    assert "fauteuil roulant" in manager.loan_search_keys.get(loan)
+    assert " 40" in manager.loan_search_keys.get(loan)
+
+    # The key of a loan follows its item and its person
+    largeur = manager.categories["FR"].property_type("largeur")
+    manager.set_item_property(items[0], largeur, "Étroit")
+    assert "etroit" in manager.loan_search_keys.get(loan)
+    manager.edit_person(persons[0], place="Chambre 7")
+    assert "chambre 7" in manager.loan_search_keys.get(loan)
+
+    manager.give_back(loan, datetime.datetime(2024, 2, 2))
+    assert len(manager.loan_search_keys) == 0
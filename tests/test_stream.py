@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+#
+# MatGest
+
+import io
+import json
+
+import pytest
+
+from gestmat.item.stream import iter_sections
+
+snapshot = {
+    "properties": {"ID": {"name": "ID", "select": ["a", "b"], "mandatory": True}},
+    "items": {
+        f"i{i}": {"category": "FR", "properties": [{"largeur": 40 + i * 0.125}], "notes": {}}
+        for i in range(50)
+    },
+    "persons": {"p1": {"name": "Émile", "surname": "Zoé \"Z\" {}", "birthday": ""}},
+    "empty": {},
+    "version": 3,
+    "loans": {"i1": [{"uuid": "l1", "person": "p1", "timestamp": 1706745600.25}]},
+}
+
+
+def _read(text: str, chunk_size: int) -> dict:
+    return {
+        section: dict(entries)
+        for section, entries in iter_sections(io.StringIO(text), chunk_size)
+    }
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 7, 1 << 16])
+@pytest.mark.parametrize("indent", [None, 2])
+def test_sections(chunk_size, indent):
+    sections = _read(json.dumps(snapshot, indent=indent, ensure_ascii=False), chunk_size)
+    # The sections which are not objects are yielded empty
+    assert sections == dict(snapshot, version={})
+
+
+def test_skipped_entries():
+    sections = []
+    for section, entries in iter_sections(io.StringIO(json.dumps(snapshot)), 5):
+        sections.append(section)
+        if section == "items":
+            next(entries)
+    assert sections == list(snapshot)
+
+
+def test_incremental():
+    text = json.dumps(snapshot)
+    fin = io.StringIO(text)
+    sections = iter_sections(fin, 64)
+    section, entries = next(sections)
+    assert section == "properties"
+    section, entries = next(sections)
+    assert next(entries) == ("i0", snapshot["items"]["i0"])
+    # Only the beginning of the stream has been read
+    assert fin.tell() < len(text) // 4
+
+
+def test_truncated():
+    text = json.dumps(snapshot)
+    sections = iter_sections(io.StringIO(text[: len(text) // 2]), 16)
+    assert next(sections)[0] == "properties"
+    with pytest.raises(ValueError):
+        for _, entries in sections:
+            list(entries)
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+#
+# MatGest
+
+import os
+import gzip
+import datetime
+
+import pytest
+
+from conftest import build_manager, state
+from gestmat.item import targets as targets_module
+from gestmat.item import workspace as workspace_module
+from gestmat.item.targets import SaveTarget, write_atomic
+
+
+class RecordingTarget(SaveTarget):
+    def __init__(self, name: str, error: Exception = None) -> None:
+        super().__init__(name)
+        self.files = dict()
+        self.error = error
+
+    def write(self, file_name: str, data: bytes) -> None:
+        if self.error is not None:
+            raise self.error
+        self.files[file_name] = data
+
+
+def test_compressed_once(new_workspace, monkeypatch):
+    compressed = []
+    gzip_compress = gzip.compress
+
+    def compress(data, *args, **kwargs):
+        compressed.append(data)
+        return gzip_compress(data, *args, **kwargs)
+
+    monkeypatch.setattr(workspace_module.gzip, "compress", compress)
+    workspace = new_workspace()
+    _, manager = workspace.loan_most_recent()
+    build_manager(manager)
+    targets = [RecordingTarget("first"), RecordingTarget("second")]
+    for target in targets:
+        workspace.add_target(target)
+    compressed.clear()
+    assert workspace.save()
+
+    # One compression for the snapshot and one for its archive, whatever the number of targets
+    files = targets[0].files
+    assert sorted(files) == sorted(name for name in os.listdir(workspace.targets[0].path))
+    assert len(compressed) == len(files) == 2
+    for name, data in files.items():
+        assert targets[1].files[name] is data
+        with open(os.path.join(workspace.targets[0].path, name), "rb") as fin:
+            assert fin.read() == data
+
+
+def test_failed_target(new_workspace):
+    workspace = new_workspace()
+    _, manager = workspace.loan_most_recent()
+    build_manager(manager)
+    failing = RecordingTarget("failing", OSError("disconnected"))
+    recording = RecordingTarget("recording")
+    workspace.add_target(failing)
+    workspace.add_target(recording)
+
+    # The other targets are still written, the failure is reported
+    assert not workspace.save()
+    assert list(workspace.last_errors) == ["failing"]
+    assert len(recording.files) == 2
+    assert workspace.snapshot_name in recording.files
+
+
+def test_write_atomic(tmp_path):
+    file = str(tmp_path / "save.json")
+    write_atomic(file, b"first")
+    write_atomic(file, b"second")
+    with open(file, "rb") as fin:
+        assert fin.read() == b"second"
+    assert os.listdir(tmp_path) == ["save.json"]
+
+
+def test_write_atomic_failure(tmp_path, monkeypatch):
+    file = str(tmp_path / "save.json")
+    write_atomic(file, b"previous")
+
+    def fsync(fd):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(targets_module.os, "fsync", fsync)
+    with pytest.raises(OSError):
+        write_atomic(file, b"new content")
+    # The previous content is left as it was, without temporary file
+    with open(file, "rb") as fin:
+        assert fin.read() == b"previous"
+    assert os.listdir(tmp_path) == ["save.json"]
+
+
+@pytest.mark.parametrize("snapshot_format", ["json", "binary"])
+def test_fallback_to_readable_save(new_workspace, persons, snapshot_format):
+    workspace = new_workspace(snapshot_format=snapshot_format)
+    _, manager = workspace.loan_most_recent()
+    items = build_manager(manager)
+    manager.create_loan(items[0], datetime.datetime(2024, 2, 1), persons[0])
+    assert workspace.save()
+
+    # More recent saves, damaged: truncated, and not even compressed
+    folder = os.path.join(workspace.path, "sauvegardes")
+    with open(os.path.join(folder, workspace.snapshot_name), "rb") as fin:
+        data = fin.read()
+    with open(os.path.join(folder, f"2099_01_01_save{workspace.extension}"), "wb") as fout:
+        fout.write(data[: len(data) // 2])
+    with open(os.path.join(folder, f"2099_01_02_save{workspace.extension}"), "wb") as fout:
+        fout.write(b"garbage")
+
+    success, loaded = new_workspace(snapshot_format=snapshot_format).loan_most_recent()
+    assert success
+    assert state(loaded) == state(manager)
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+#
+# MatGest
+
+import datetime
+
+from conftest import build_manager
+from gestmat.item.timeline import LOAN_RETURN, LOAN_START, LoanTimeline
+from gestmat.util import ProtectedDatetime
+
+
+def _day(day: int) -> datetime.date:
+    return datetime.date(2024, 1, day)
+
+
+def test_timeline():
+    timeline = LoanTimeline()
+    # Out of order, as when a save is loaded
+    for day, kind, loan in [
+        (5, LOAN_START, "b"),
+        (2, LOAN_START, "a"),
+        (9, LOAN_RETURN, "a"),
+        (5, LOAN_RETURN, "c"),
+        (7, LOAN_START, "d"),
+    ]:
+        timeline.add(datetime.datetime(2024, 1, day), kind, loan)
+    timeline.add(ProtectedDatetime(""), LOAN_RETURN, "e")
+    timeline.add(None, LOAN_START, "e")
+
+    assert timeline.between() == [
+        (_day(2), LOAN_START, "a"),
+        (_day(5), LOAN_START, "b"),
+        (_day(5), LOAN_RETURN, "c"),
+        (_day(7), LOAN_START, "d"),
+        (_day(9), LOAN_RETURN, "a"),
+    ]
+    # Both bounds are included
+    assert [loan for _, _, loan in timeline.between(_day(5), _day(7))] == ["b", "c", "d"]
+    assert [loan for _, _, loan in timeline.between(start=_day(6))] == ["d", "a"]
+    assert [loan for _, _, loan in timeline.between(end=_day(4))] == ["a"]
+    assert [loan for _, _, loan in timeline.between(kind=LOAN_RETURN)] == ["c", "a"]
+
+    timeline.add(datetime.datetime(2024, 1, 10), LOAN_START, "f")
+    assert timeline.between(_day(10)) == [(_day(10), LOAN_START, "f")]
+
+
+def test_person_loans(new_workspace, persons):
+    workspace = new_workspace()
+    _, manager = workspace.loan_most_recent()
+    items = build_manager(manager)
+    first = manager.create_loan(items[0], datetime.datetime(2024, 1, 2), persons[0])
+    second = manager.create_loan(items[1], datetime.datetime(2024, 1, 5), persons[0])
+    other = manager.create_loan(items[2], datetime.datetime(2024, 1, 6), persons[1])
+    manager.give_back(first, datetime.datetime(2024, 1, 8))
+
+    assert manager.person_loans(persons[0]) == {second}
+    assert manager.person_loans(persons[0], history=True) == {first}
+    assert manager.person_loans(persons[1]) == {other}
+    assert manager.loans_since(datetime.date(2024, 1, 5)) == [second, other]
+    assert manager.loan_events(kind=LOAN_RETURN) == [(_day(8), LOAN_RETURN, first)]
+    assert [loan for _, _, loan in manager.loan_events(_day(6), _day(8))] == [other, first]
+
+    # The same indexes once the save is loaded, the history with the archive
+    assert workspace.save()
+    success, loaded = new_workspace().loan_most_recent()
+    assert success
+    person = next(person for person in loaded.persons if person.uuid == persons[0].uuid)
+    assert {loan.uuid for loan in loaded.person_loans(person)} == {second.uuid}
+    assert {loan.uuid for loan in loaded.person_loans(person, history=True)} == {first.uuid}
+    assert [loan.uuid for loan in loaded.loans_since(_day(1))] == [
+        first.uuid,
+        second.uuid,
+        other.uuid,
+    ]
+    assert [(date, kind) for date, kind, _ in loaded.loan_events(kind=LOAN_RETURN)] == [
+        (_day(8), LOAN_RETURN)
+    ]
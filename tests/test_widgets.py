@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+#
+# MatGest
+
+import pytest
+
+dpg = pytest.importorskip("dearpygui.dearpygui")
+
+from gestmat.ui.widgets import VirtualTable  # noqa: E402
+
+
+@pytest.fixture
+def parent():
+    dpg.create_context()
+    yield dpg.add_window()
+    dpg.destroy_context()
+
+
+def _rows(count: int) -> list[tuple]:
+    # The key of a row is its number, the second column has accents
+    return [(i, (str(i), f"Élément {'abc'[i % 3]}")) for i in range(count)]
+
+
+def _shown(table: VirtualTable) -> list[str]:
+    """Returns the first value of each row shown"""
+    shown = []
+    for index, cells in enumerate(table._cells):
+        if table.offset + index < len(table.rows):
+            shown.append(dpg.get_value(cells["texts"][0]))
+    return shown
+
+
+def test_windowed(parent):
+    table = VirtualTable(parent, ["Numéro", "Nom"], visible_rows=5)
+    table.set_rows(_rows(1000))
+    # The widgets of the visible rows only
+    assert len(table._cells) == 5
+    assert _shown(table) == ["0", "1", "2", "3", "4"]
+
+    table.scroll_to(10)
+    assert _shown(table) == ["10", "11", "12", "13", "14"]
+    table.scroll_to(5000)
+    assert table.offset == 995
+    assert _shown(table) == ["995", "996", "997", "998", "999"]
+    # The slider is at the top when the first row is shown
+    table._slider_callback(table.slider, 995)
+    assert table.offset == 0
+    table._slider_callback(table.slider, 0)
+    assert table.offset == 995
+
+
+def test_sort_and_filter(parent):
+    table = VirtualTable(parent, ["Numéro", "Nom"], visible_rows=5)
+    table.set_rows(_rows(30))
+    table.sort([(0, True)])
+    assert _shown(table) == ["29", "28", "27", "26", "25"]
+
+    # Case and accents are ignored
+    table.set_filter("element c")
+    assert [key for key, _ in table.rows] == list(range(29, 0, -3))
+    table.set_filter("ÉLÉMENT C 17")
+    assert _shown(table) == ["17"]
+    table.set_filter("")
+    assert len(table.rows) == 30
+
+
+def test_rows_updated(parent):
+    table = VirtualTable(parent, ["Numéro", "Nom"], visible_rows=5, checkbox=True)
+    table.set_rows(_rows(20))
+    table.scroll_to(10)
+    table._check_callback(None, True, 2)
+    assert table.selected == {12}
+
+    # The scroll position and the sort are kept
+    table.remove_rows([0, 1])
+    table.add_rows([(100, ("100", "Nouveau"))])
+    assert table.offset == 10
+    assert _shown(table) == ["12", "13", "14", "15", "16"]
+    assert [key for key, _ in table.rows][-1] == 100
+    table.remove_rows([12])
+    assert table.selected == set()
+
+
+def test_action(parent):
+    clicked = []
+    table = VirtualTable(parent, ["Numéro"], visible_rows=3, action=("Voir", clicked.append))
+    table.set_rows([(f"key {i}", (str(i),)) for i in range(2)])
+    table._action_callback(None, None, 1)
+    # The rows without key do nothing
+    table._action_callback(None, None, 2)
+    assert clicked == ["key 1"]